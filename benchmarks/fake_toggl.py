@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the part of Toggl's API v8 that is used by giTrack's TogglProvider.
+
+It keeps all the state in memory and it is meant for benchmarking and tuning of the provider's code path without
+touching the real service. Latency, error rate and rate limiting can be configured to simulate real-world conditions.
+
+Run it and point giTrack to it using the GITRACK_TOGGL_URL environment variable:
+
+    $ python benchmarks/fake_toggl.py --port 8765 --latency 0.05
+    $ GITRACK_TOGGL_URL=http://localhost:8765/api/v8 gitrack start
+"""
+import argparse
+import base64
+import collections
+import datetime
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+API_PREFIX = '/api/v8'
+WORKSPACE_ID = 1
+STATS_PATH = '/__stats'
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0).isoformat()
+
+
+class TogglState:
+    """
+    In-memory data of one Toggl account (eq. one API token). All access is guarded by the server's lock.
+    """
+
+    def __init__(self, api_token, ids, limiter, projects=None, tasks=None):
+        self.ids = ids
+        self.limiter = limiter
+        self.entries = {}
+        self.running_id = None
+
+        self.user = {
+            'id': 1, 'api_token': api_token, 'default_wid': WORKSPACE_ID, 'fullname': 'Fake User',
+            'email': 'fake@example.com', 'timezone': 'UTC',
+        }
+        self.workspace = {'id': WORKSPACE_ID, 'name': 'Fake workspace', 'premium': True, 'admin': True}
+        self.projects = [{'id': 100 + i, 'wid': WORKSPACE_ID, 'name': name, 'active': True}
+                         for i, name in enumerate(projects or ('gitrack',))]
+        self.tasks = [{'id': 200 + i, 'wid': WORKSPACE_ID, 'pid': self.projects[0]['id'], 'name': name, 'active': True}
+                      for i, name in enumerate(tasks or ('task',))]
+
+    def start_entry(self, data):
+        entry = dict(data)
+        entry.update({
+            'id': next(self.ids),
+            'wid': data.get('wid', WORKSPACE_ID),
+            'start': data.get('start') or _now(),
+            'duration': -int(time.time()),
+            'at': _now(),
+        })
+        entry.pop('stop', None)
+
+        # Same as Toggl, starting new entry stops the running one
+        if self.running_id is not None:
+            self.stop_entry(self.running_id)
+
+        self.entries[entry['id']] = entry
+        self.running_id = entry['id']
+        return entry
+
+    def stop_entry(self, entry_id, stop=None):
+        entry = self.entries[entry_id]
+        entry['stop'] = stop or _now()
+        entry['duration'] = int(time.time()) + entry['duration'] if entry['duration'] < 0 else entry['duration']
+
+        if self.running_id == entry_id:
+            self.running_id = None
+
+        return entry
+
+    def update_entry(self, entry_id, data):
+        entry = self.entries[entry_id]
+        stop = data.pop('stop', None)
+        data.pop('duration', None)
+        entry.update(data)
+
+        if stop is not None and entry_id == self.running_id:
+            self.stop_entry(entry_id, stop)
+
+        return entry
+
+
+class RateLimiter:
+    """
+    Simple token bucket used to simulate Toggl's per-token throttling.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):  # type: () -> float
+        """
+        :return: 0 if the request can proceed, otherwise number of seconds after which the client should retry.
+        """
+        if not self.rate:
+            return 0
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+
+            return (1 - self.tokens) / self.rate
+
+
+class FakeTogglHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeToggl/1.0'
+
+    ROUTES = (
+        ('GET', r'/me', 'get_me'),
+        ('GET', r'/workspaces', 'get_workspaces'),
+        ('GET', r'/workspaces/(?P<wid>\d+)', 'get_workspace'),
+        ('GET', r'/workspaces/(?P<wid>\d+)/projects', 'get_projects'),
+        ('GET', r'/workspaces/(?P<wid>\d+)/tasks', 'get_tasks'),
+        ('GET', r'/projects/(?P<id>\d+)', 'get_project'),
+        ('GET', r'/tasks/(?P<id>\d+)', 'get_task'),
+        ('GET', r'/time_entries/current', 'get_current'),
+        ('GET', r'/time_entries/(?P<id>\d+)', 'get_entry'),
+        ('POST', r'/time_entries', 'post_entry'),
+        ('POST', r'/time_entries/start', 'post_entry'),
+        ('PUT', r'/time_entries/(?P<id>\d+)', 'put_entry'),
+        ('PUT', r'/time_entries/(?P<id>\d+)/stop', 'put_stop'),
+        ('DELETE', r'/time_entries/(?P<id>\d+)', 'delete_entry'),
+    )
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _send(self, status, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _api_token(self):
+        """
+        Toggl uses basic auth with the API token as username and 'api_token' as password.
+        """
+        auth = self.headers.get('Authorization') or ''
+        if not auth.startswith('Basic '):
+            return ''
+
+        try:
+            return base64.b64decode(auth[6:]).decode().split(':', 1)[0]
+        except ValueError:
+            return ''
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+
+        return json.loads(self.rfile.read(length).decode() or '{}')
+
+    def _dispatch(self, method):
+        server = self.server  # type: FakeTogglServer
+        path = self.path.split('?', 1)[0]
+
+        if path == STATS_PATH:
+            with server.lock:
+                return self._send(200, server.stats())
+
+        if not path.startswith(API_PREFIX):
+            return self._send(404, {'error': 'unknown path'})
+        path = path[len(API_PREFIX):]
+
+        for route_method, pattern, handler_name in self.ROUTES:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                break
+        else:
+            return self._send(404, {'error': 'unknown endpoint'})
+
+        with server.lock:
+            server.calls['{} {}'.format(method, pattern)] += 1
+            state = server.get_state(self._api_token())
+
+        if server.latency:
+            time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+
+        retry_after = state.limiter.acquire()
+        if retry_after:
+            return self._send(429, {'error': 'throttled'}, {'Retry-After': str(max(1, round(retry_after)))})
+
+        if server.error_rate and random.random() < server.error_rate:
+            return self._send(500, {'error': 'injected failure'})
+
+        data = self._read_json() if method in {'POST', 'PUT'} else {}
+        with server.lock:
+            status, body = getattr(self, handler_name)(state, data, **match.groupdict())
+
+        self._send(status, body)
+
+    # Endpoints' implementations, each returns tuple (status, body)
+
+    def get_me(self, state, data):
+        return 200, {'data': state.user}
+
+    def get_workspaces(self, state, data):
+        return 200, [state.workspace]
+
+    def get_workspace(self, state, data, wid):
+        return 200, {'data': state.workspace}
+
+    def get_projects(self, state, data, wid):
+        return 200, state.projects
+
+    def get_tasks(self, state, data, wid):
+        return 200, state.tasks
+
+    def get_project(self, state, data, id):
+        for project in state.projects:
+            if project['id'] == int(id):
+                return 200, {'data': project}
+        return 404, None
+
+    def get_task(self, state, data, id):
+        for task in state.tasks:
+            if task['id'] == int(id):
+                return 200, {'data': task}
+        return 404, None
+
+    def get_current(self, state, data):
+        return 200, {'data': state.entries.get(state.running_id)}
+
+    def get_entry(self, state, data, id):
+        if int(id) not in state.entries:
+            return 404, None
+        return 200, {'data': state.entries[int(id)]}
+
+    def post_entry(self, state, data):
+        return 200, {'data': state.start_entry(data.get('time_entry', {}))}
+
+    def put_entry(self, state, data, id):
+        if int(id) not in state.entries:
+            return 404, None
+        return 200, {'data': state.update_entry(int(id), data.get('time_entry', {}))}
+
+    def put_stop(self, state, data, id):
+        if int(id) not in state.entries:
+            return 404, None
+        return 200, {'data': state.stop_entry(int(id))}
+
+    def delete_entry(self, state, data, id):
+        if state.entries.pop(int(id), None) is None:
+            return 404, None
+
+        if state.running_id == int(id):
+            state.running_id = None
+
+        return 200, None
+
+
+class FakeTogglServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=0.0, burst=1,
+                 verbose=False):
+        super().__init__(address, FakeTogglHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.verbose = verbose
+
+        self.lock = threading.Lock()
+        self.calls = collections.Counter()
+        self._ids = itertools.count(1000)
+        self._states = {}
+
+    def get_state(self, api_token):  # type: (str) -> TogglState
+        if api_token not in self._states:
+            self._states[api_token] = TogglState(api_token, self._ids, RateLimiter(self.rate_limit, self.burst))
+
+        return self._states[api_token]
+
+    def stats(self):
+        return {
+            'calls': dict(self.calls),
+            'total_calls': sum(self.calls.values()),
+            'accounts': len(self._states),
+            'entries': sum(len(state.entries) for state in self._states.values()),
+        }
+
+    @property
+    def url(self):
+        return 'http://{}:{}{}'.format(self.server_address[0], self.server_address[1], API_PREFIX)
+
+    @property
+    def stats_url(self):
+        return 'http://{}:{}{}'.format(self.server_address[0], self.server_address[1], STATS_PATH)
+
+    def start_background(self):  # type: () -> threading.Thread
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def add_server_arguments(parser):  # type: (argparse.ArgumentParser) -> None
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0, help='Port to listen on, 0 picks a free one.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Mean latency of each response in seconds.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Standard deviation of the latency in seconds.')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Probability (0-1) that a request ends with HTTP 500.')
+    parser.add_argument('--rate-limit', type=float, default=0.0,
+                        help='Allowed requests per second per API token, 0 disables the rate limiting. '
+                             'Throttled requests get HTTP 429 with Retry-After header.')
+    parser.add_argument('--burst', type=int, default=1, help='Size of the rate limiter\'s bucket.')
+
+
+def server_from_arguments(args, verbose=False):  # type: (argparse.Namespace, bool) -> FakeTogglServer
+    return FakeTogglServer((args.host, args.port), latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, rate_limit=args.rate_limit, burst=args.burst,
+                           verbose=verbose)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_server_arguments(parser)
+    parser.add_argument('--verbose', '-v', action='store_true', help='Log every request.')
+    args = parser.parse_args()
+
+    server = server_from_arguments(args, verbose=args.verbose)
+    print('Fake Toggl API listening on {}'.format(server.url))
+    print('Statistics available on {}'.format(server.stats_url))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Load harness for giTrack's hooks.
+
+It creates N temporary Git repositories, initializes them with giTrack (using the installed `gitrack` command),
+starts tracking and then fires commits concurrently across the repositories. After each commit the installed
+post-commit executable (`.git/hooks/post-commit.gitrack`) is run synchronously, so its wall-clock time is
+the hook's latency. The Toggl provider is pointed to the fake Toggl server (see fake_toggl.py) which is started
+in-process unless --url is given.
+
+    $ python benchmarks/load.py --repos 20 --commits 10 --concurrency 8 --latency 0.05
+
+With --replay the API is not called at all, the responses are served from the cassette recorded with
+GITRACK_RECORD (see gitrack.cassette), with the recorded latencies scaled by --replay-scale.
+
+    $ python benchmarks/load.py --repos 20 --commits 10 --replay user-cassette.jsonl
+
+Reported are throughput, hook latency percentiles and number of API calls per commit.
+"""
+import argparse
+import json
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import fake_toggl
+from gitrack.metrics import percentile
+
+LOCAL_CONFIG = """[gitrack]
+provider = toggl
+update_check = False
+project_support = False
+tasks_support = False
+
+[toggl]
+api_token = {token}
+"""
+
+GIT_IDENTITY = {
+    'GIT_AUTHOR_NAME': 'giTrack benchmark',
+    'GIT_AUTHOR_EMAIL': 'benchmark@example.com',
+    'GIT_COMMITTER_NAME': 'giTrack benchmark',
+    'GIT_COMMITTER_EMAIL': 'benchmark@example.com',
+}
+
+
+def run(args, cwd, env, check=True):
+    return subprocess.run(args, cwd=str(cwd), env=env, check=check,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def fetch_stats(stats_url):  # type: (str) -> dict
+    with urllib.request.urlopen(stats_url) as response:
+        return json.loads(response.read().decode())
+
+
+class Harness:
+    def __init__(self, workdir, env, gitrack_binary, shared_token):
+        self.workdir = workdir
+        self.env = env
+        self.gitrack = gitrack_binary
+        self.shared_token = shared_token
+        self.no_hooks_dir = workdir / 'no-hooks'
+        self.no_hooks_dir.mkdir()
+
+        self.latencies = []
+        self.failures = []
+        self._lock = threading.Lock()
+
+    def create_repo(self, index):  # type: (int) -> pathlib.Path
+        repo_dir = self.workdir / 'repo-{}'.format(index)
+        repo_dir.mkdir()
+        token = 'shared-token' if self.shared_token else 'token-{}'.format(index)
+
+        run(['git', 'init', '-q'], repo_dir, self.env)
+        (repo_dir / '.gitrack').write_text(LOCAL_CONFIG.format(token=token))
+        run([self.gitrack, 'init'], repo_dir, self.env)
+        run([self.gitrack, 'start', '--force'], repo_dir, self.env)
+
+        return repo_dir
+
+    def commit(self, repo_dir, number):  # type: (pathlib.Path, int) -> None
+        (repo_dir / 'file.txt').write_text('Change number {}\n'.format(number))
+        run(['git', 'add', 'file.txt'], repo_dir, self.env)
+
+        # Git itself is not allowed to run the hooks, so they can be timed synchronously bellow
+        run(['git', '-c', 'core.hooksPath={}'.format(self.no_hooks_dir), 'commit', '-q',
+             '-m', 'Benchmark commit {}'.format(number)], repo_dir, self.env)
+
+        hook = repo_dir / '.git' / 'hooks' / 'post-commit.gitrack'
+        start = time.perf_counter()
+        result = run([str(hook)], repo_dir, self.env, check=False)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.latencies.append(elapsed)
+            if result.returncode != 0:
+                self.failures.append((repo_dir.name, number, result.stderr.decode().strip()))
+
+    def commit_series(self, repo_dir, commits, pause):
+        for number in range(commits):
+            self.commit(repo_dir, number)
+            if pause:
+                time.sleep(pause)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repos', type=int, default=10, help='Number of temporary repositories.')
+    parser.add_argument('--commits', type=int, default=5, help='Number of commits per repository.')
+    parser.add_argument('--concurrency', type=int, default=4, help='Number of repositories committing at once.')
+    parser.add_argument('--pause', type=float, default=0.0, help='Pause between commits in one repository.')
+    parser.add_argument('--shared-token', action='store_true',
+                        help='All repositories use the same API token (eq. one Toggl account).')
+    parser.add_argument('--url', help='Use already running (fake) Toggl API instead of starting one.')
+    parser.add_argument('--stats-url', help='Statistics endpoint of the server given by --url.')
+    parser.add_argument('--replay', help='Serve the API responses from the cassette instead of the fake Toggl API.')
+    parser.add_argument('--replay-scale', type=float, default=1.0, help='Scale of the replayed latencies.')
+    parser.add_argument('--keep', action='store_true', help='Don\'t remove the temporary directory.')
+    fake_toggl.add_server_arguments(parser)
+    args = parser.parse_args()
+
+    gitrack_binary = shutil.which('gitrack')
+    if gitrack_binary is None:
+        sys.exit('gitrack command was not found on $PATH; install the package first.')
+
+    replay_env = {}
+    if args.replay:
+        # Nothing listens there, all the requests are served from the cassette
+        api_url, stats_url = 'http://127.0.0.1:9/api/v8', None
+        replay_env = {'GITRACK_REPLAY': str(pathlib.Path(args.replay).resolve()),
+                      'GITRACK_REPLAY_SCALE': str(args.replay_scale)}
+    elif args.url:
+        api_url, stats_url = args.url, args.stats_url
+    else:
+        server = fake_toggl.server_from_arguments(args)
+        server.start_background()
+        api_url, stats_url = server.url, server.stats_url
+
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix='gitrack-load-'))
+    env = dict(os.environ, GITRACK_STORAGE=str(workdir / 'storage'), GITRACK_TOGGL_URL=api_url, **GIT_IDENTITY)
+    env.update(replay_env)
+    harness = Harness(workdir, env, gitrack_binary, args.shared_token)
+
+    try:
+        print('Setting up {} repositories in {}'.format(args.repos, workdir))
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            repos = list(executor.map(harness.create_repo, range(args.repos)))
+
+        calls_before = fetch_stats(stats_url)['total_calls'] if stats_url else None
+
+        print('Firing {} commits per repository'.format(args.commits))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            futures = [executor.submit(harness.commit_series, repo, args.commits, args.pause) for repo in repos]
+            for future in futures:
+                future.result()
+        duration = time.perf_counter() - start
+
+        total_commits = len(harness.latencies)
+        latencies = sorted(harness.latencies)
+
+        print('\nCommits: {}, failed hooks: {}'.format(total_commits, len(harness.failures)))
+        print('Throughput: {:.2f} commits/s (wall time {:.2f} s)'.format(total_commits / duration, duration))
+        print('Hook latency: p50 {:.3f} s, p90 {:.3f} s, p95 {:.3f} s, p99 {:.3f} s, max {:.3f} s'.format(
+            percentile(latencies, 50), percentile(latencies, 90), percentile(latencies, 95),
+            percentile(latencies, 99), latencies[-1] if latencies else 0.0))
+
+        if stats_url:
+            calls = fetch_stats(stats_url)['total_calls'] - calls_before
+            print('API calls: {} total, {:.2f} per commit'.format(calls, calls / max(total_commits, 1)))
+
+        for repo, number, error in harness.failures[:10]:
+            print('  {} commit {}: {}'.format(repo, number, error.splitlines()[-1] if error else 'no output'))
+    finally:
+        if args.keep:
+            print('Temporary data kept in {}'.format(workdir))
+        else:
+            shutil.rmtree(str(workdir), ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Startup benchmark comparing the release archive built with `python setup.py build_release` with the pip-installed
+package (the `gitrack` command on $PATH by default).
+
+Every command is run repeatedly in a fresh process, so the measured time is the cold start of the interpreter,
+the imports and the command itself, which is what every hook's invocation pays.
+
+    $ python benchmarks/startup.py --release dist/gitrack.linux-x86_64.python37.tar.gz --runs 30
+
+With --max-ratio the benchmark fails when the release's median is slower than the installed package's median
+multiplied by the ratio.
+"""
+import argparse
+import os
+import pathlib
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+from gitrack.metrics import percentile
+
+COMMANDS = (
+    ('--version',),
+    ('--help',),
+)
+
+
+def release_launcher(release, workdir):  # type: (pathlib.Path, pathlib.Path) -> pathlib.Path
+    """
+    Returns the launcher of the release given either as the archive or as already extracted folder.
+    """
+    if release.is_file() and tarfile.is_tarfile(str(release)):
+        with tarfile.open(str(release)) as tar:
+            tar.extractall(str(workdir))
+        release = workdir / 'gitrack'
+
+    launcher = release / 'bin' / 'gitrack'
+    if not launcher.exists():
+        sys.exit('{} is not the release archive nor the extracted release.'.format(release))
+
+    return launcher
+
+
+def measure(binary, command, runs, warmup, env):  # type: (str, tuple, int, int, dict) -> list
+    durations = []
+
+    for number in range(warmup + runs):
+        start = time.perf_counter()
+        subprocess.run((binary,) + command, env=env, check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+
+        if number >= warmup:
+            durations.append(elapsed)
+
+    return sorted(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--release', type=pathlib.Path, required=True,
+                        help='Release archive or the folder where it was extracted.')
+    parser.add_argument('--installed', help='The pip-installed gitrack command. Default: gitrack on $PATH.')
+    parser.add_argument('--runs', type=int, default=20, help='Number of measured runs per command.')
+    parser.add_argument('--warmup', type=int, default=3, help='Number of unmeasured runs, which warm up the caches.')
+    parser.add_argument('--max-ratio', type=float,
+                        help='Fail when the release\'s median is slower than the installed one times this ratio.')
+    args = parser.parse_args()
+
+    installed = args.installed or shutil.which('gitrack')
+    if installed is None:
+        sys.exit('gitrack command was not found on $PATH; install the package first.')
+
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix='gitrack-startup-'))
+    env = dict(os.environ, GITRACK_STORAGE=str(workdir / 'storage'))
+    failed = False
+
+    try:
+        variants = (('installed', installed), ('release', str(release_launcher(args.release, workdir))))
+
+        for command in COMMANDS:
+            print('gitrack {}'.format(' '.join(command)))
+
+            medians = {}
+            for name, binary in variants:
+                durations = measure(binary, command, args.runs, args.warmup, env)
+                medians[name] = statistics.median(durations)
+                print('  {:<10} p50 {:.3f} s, p95 {:.3f} s, min {:.3f} s'.format(
+                    name, medians[name], percentile(durations, 95), durations[0]))
+
+            ratio = medians['release'] / medians['installed']
+            print('  release/installed: {:.2f}'.format(ratio))
+
+            if args.max_ratio is not None and ratio > args.max_ratio:
+                print('  FAILED: the ratio exceeds {:.2f}'.format(args.max_ratio))
+                failed = True
+    finally:
+        shutil.rmtree(str(workdir), ignore_errors=True)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,11 @@
 #!/usr/bin/env bash
 
-# Installer script v1.0
+# Installer script v1.1
 # =====================
 # Script that will install command from repo hosted on GitHub and its latest release.
 # It will take the build command that is attached as Asset to the GitHub's release,
-# download it and store it to the configured destination
+# download it and store it to the configured destination. The release archive built for the local
+# Python's version is preferred, PEX build is used when there is none.
 
 set -e
 
@@ -23,6 +24,9 @@ DOWNLOAD_FILE_NAME_BASE=${CMD_NAME}
 # Place where the command will be installed
 DESTINATION="/usr/local/bin"
 
+# Place where the release archive with the vendored dependencies is extracted, the command is symlinked from it
+LIB_DESTINATION="/usr/local/lib/${CMD_NAME}"
+
 #####################
 ## Helpers
 
@@ -34,42 +38,82 @@ get_latest_release() {
     sed -E 's/.*"([^"]+)".*/\1/'
 }
 
-fetch_pex(){
-    platform=""
+get_platform(){
     unamestr=$(uname)
     if [[ "$unamestr" == "Linux" ]]; then
-       platform="linux"
+       echo "linux-x86_64"
     elif [[ "$unamestr" == "Darwin" ]]; then
-       platform="macosx"
+       echo "macosx-x86_64"
     else
         echoerr "Unsupported platform!"
         exit 1
     fi
-    platform="${platform}-x86_64"
+}
+
+# Prints the name of the Python interpreter for which is the release archive built (eq. python37)
+get_python(){
+    for python in python3.7 python3.6 python3.5; do
+        if command -v ${python} > /dev/null; then
+            echo ${python//./}
+            return
+        fi
+    done
+}
+
+fetch(){
+    url="https://github.com/${REPO_NAME}/releases/download/$1/$2"
+    curl --silent --fail -L ${url} > $3
+}
+
+install_release(){
+    version=$1
+    archive=$2
+    tmp_destination="/tmp/${CMD_NAME}.tar.gz"
+
+    fetch ${version} ${archive} ${tmp_destination} || return 1
+
+    echo "Installing it to: ${LIB_DESTINATION}"
+    if [[ -e "${LIB_DESTINATION}" ]] || [[ -e "${DESTINATION}/${CMD_NAME}" ]]; then
+        echo "Detected previous version; it will be rewritten."
+    fi
 
+    sudo rm -rf "${LIB_DESTINATION}" "${DESTINATION}/${CMD_NAME}"
+    sudo mkdir -p "${LIB_DESTINATION}"
+    sudo tar -xzf ${tmp_destination} -C "${LIB_DESTINATION}" --strip-components 1
+    sudo ln -s "${LIB_DESTINATION}/bin/${CMD_NAME}" "${DESTINATION}/${CMD_NAME}"
+    rm ${tmp_destination}
+}
+
+install_pex(){
     version=$1
-    destination=$2
+    tmp_destination="/tmp/${CMD_NAME}"
+
+    fetch ${version} "${DOWNLOAD_FILE_NAME_BASE}.$2" ${tmp_destination}
+    chmod +x ${tmp_destination}
 
-    url="https://github.com/${REPO_NAME}/releases/download/${version}/${DOWNLOAD_FILE_NAME_BASE}.${platform}"
-    curl --silent -L ${url} > ${destination}
+    echo "Installing it to: ${DESTINATION}"
+    if [[ -e "${DESTINATION}/${CMD_NAME}" ]]; then
+        echo "Detected previous version; it will be rewritten."
+    fi
+
+    sudo rm -rf "${LIB_DESTINATION}" "${DESTINATION}/${CMD_NAME}"
+    sudo cp ${tmp_destination} "${DESTINATION}/${CMD_NAME}"
+    rm ${tmp_destination}
 }
 
 #####################
 ## Main code
 
 version=$(get_latest_release ${REPO_NAME})
-tmp_destination="/tmp/${CMD_NAME}"
+platform=$(get_platform)
+python=$(get_python)
 
 echo "Downloading '${CMD_NAME}' in latest version ${version}"
-fetch_pex ${version} ${tmp_destination}
-chmod +x ${tmp_destination}
 
-echo "Installing it to: ${DESTINATION}"
-
-if [[ -e "${DESTINATION}/${CMD_NAME}" ]]; then
-    echo "Detected previous version; it will be rewritten."
+# The release archive starts faster than PEX, but it is built only for specific Python versions
+if [[ -z "${python}" ]] || ! install_release ${version} "${DOWNLOAD_FILE_NAME_BASE}.${platform}.${python}.tar.gz"; then
+    echo "Release archive for your Python is not available, installing PEX build."
+    install_pex ${version} ${platform}
 fi
 
-sudo cp ${tmp_destination} "${DESTINATION}/${CMD_NAME}"
-
-echo "Successfully installed!"
\ No newline at end of file
+echo "Successfully installed!"
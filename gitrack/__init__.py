@@ -1,31 +1,97 @@
+import typing
 from enum import Enum
-from pbr.version import VersionInfo
-
-VERSION = VersionInfo('gitrack').semantic_version()
-__version__ = VERSION.release_string()
 
 GITHUB_REPO_NAME = 'auhau/gitrack'
 APP_NAME = 'gitrack'
 LOCAL_CONFIG_NAME = '.gitrack'
 GITRACK_POST_COMMIT_EXECUTABLE_FILENAME = 'post-commit.gitrack'
+GITRACK_POST_REWRITE_EXECUTABLE_FILENAME = 'post-rewrite.gitrack'
+GITRACK_POST_CHECKOUT_EXECUTABLE_FILENAME = 'post-checkout.gitrack'
 SUPPORTED_SHELLS = ('bash', 'zsh', 'fish')
 
+_version = None
+
+
+def get_version():  # type: () -> str
+    """
+    Returns giTrack's version. It is stamped into gitrack/_version.py during the build. When running from
+    the source tree, it is resolved by pbr, which is slow as it needs pkg_resources, hence it is done
+    only when the version is really needed.
+    """
+    global _version
+
+    if _version is None:
+        try:
+            from gitrack._version import version
+        except ImportError:
+            from pbr.version import VersionInfo
+            version = VersionInfo('gitrack').semantic_version().release_string()
+
+        _version = version
+
+    return _version
+
+
+class _ProvidersMeta(type):
+    def __iter__(cls):
+        from gitrack import plugins
+        return iter([cls(name) for name in sorted(plugins.get_registry())])
+
+
+class Providers(metaclass=_ProvidersMeta):
+    """
+    Identifier of a provider, which behaves like Enum's member (former implementation of this class).
+
+    Providers are registered through the 'gitrack.providers' entry points. The registry and the provider's
+    module are loaded only when the provider's class is actually needed, see gitrack.plugins.
 
-class Providers(Enum):
+    The value can be also comma-separated list of providers, to which are the time entries mirrored,
+    see gitrack.providers.multi.
+    """
 
-    TOGGL = 'toggl'
+    TOGGL = None  # type: Providers
+
+    def __init__(self, value):  # type: (typing.Union[str, Providers]) -> None
+        self.value = ', '.join(name.strip() for name in str(value).split(','))
+
+    @property
+    def name(self):  # type: () -> str
+        return self.value.upper()
+
+    @property
+    def names(self):  # type: () -> typing.List[str]
+        return self.value.split(', ')
 
     def klass(self):
-        if self == self.TOGGL:
-            from .providers.toggl import TogglProvider
-            return TogglProvider
+        from gitrack import plugins
+
+        names = self.names
+        if len(names) == 1:
+            return plugins.load_provider(self.value)
+
+        if len(set(names)) != len(names):
+            from gitrack import exceptions
+            raise exceptions.ConfigException('Provider can not be listed more times: {}'.format(self.value))
 
-        raise RuntimeError('Unknown provider!')
+        from gitrack.providers import multi
+        return multi.MultiProvider.bind(self.value, [plugins.load_provider(name) for name in names])
+
+    def __eq__(self, other):
+        return isinstance(other, Providers) and other.value == self.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self):
+        return '<Providers.{}: \'{}\'>'.format(self.name, self.value)
 
     def __str__(self):
         return self.value
 
 
+Providers.TOGGL = Providers('toggl')
+
+
 class TaskParsingModes(Enum):
     STATIC = 'static'
     DYNAMIC_BRANCH = 'dynamic_branch'
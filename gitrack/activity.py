@@ -0,0 +1,368 @@
+"""
+Detection of user's activity in the working tree of Git repo, used for automatic pausing of the tracking
+when the user is idle.
+"""
+import collections
+import datetime
+import errno
+import logging
+import os
+import pathlib
+import re
+import time
+import typing
+
+from gitrack import commits, events as events_module, inotify, exceptions, helpers
+
+logger = logging.getLogger('gitrack.activity')
+
+WATCH_MASK = inotify.IN_MODIFY | inotify.IN_CLOSE_WRITE | inotify.IN_CREATE | inotify.IN_DELETE | \
+             inotify.IN_MOVED_FROM | inotify.IN_MOVED_TO | inotify.IN_ONLYDIR
+
+# Events closer to each other than this are coalesced into one activity interval
+COALESCE_GAP = 5
+
+# When activity was registered less than this number of seconds ago, the events are not matched against
+# the ignore rules, as they could not change anything. This keeps the CPU usage low during bursts of events.
+ACTIVITY_RESOLUTION = 1
+
+# Fallback limit of watches when the system's limit can't be determined
+DEFAULT_MAX_WATCHES = 8192
+
+# How often is the Store reloaded, to pick up changes done by other gitrack's invocations
+STORE_POLL_INTERVAL = 30
+
+
+def _translate_glob(pattern):  # type: (str) -> str
+    """
+    Translates glob pattern used in .gitignore files into regex (without anchors).
+    """
+    result = []
+    i, length = 0, len(pattern)
+
+    while i < length:
+        char = pattern[i]
+
+        if char == '*':
+            if pattern.startswith('**/', i):
+                result.append('(?:.*/)?')
+                i += 3
+                continue
+
+            if pattern.startswith('**', i):
+                result.append('.*')
+                i += 2
+                continue
+
+            result.append('[^/]*')
+        elif char == '?':
+            result.append('[^/]')
+        elif char == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                result.append(re.escape(char))
+            else:
+                content = pattern[i + 1:end].replace('\\', '\\\\')
+                if content.startswith('!'):
+                    content = '^' + content[1:]
+                result.append('[{}]'.format(content))
+                i = end + 1
+                continue
+        elif char == '\\' and i + 1 < length:
+            result.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        else:
+            result.append(re.escape(char))
+
+        i += 1
+
+    return ''.join(result)
+
+
+class IgnoreMatcher:
+    """
+    Matcher of paths ignored by Git. All the patterns are compiled into a few regexes, so matching a path
+    is single regex search no matter how many patterns there are.
+
+    The paths are relative to the repo's root and use '/' as separator.
+
+    It approximates the Git's rules: negated patterns ('!pattern') take precedence over the ignoring ones
+    regardless of their order.
+    """
+
+    def __init__(self):
+        self._patterns = {
+            # (negated, is_dir) -> list of regexes
+            (False, False): [], (False, True): [], (True, False): [], (True, True): [],
+        }
+        self._compiled = None
+
+    def add_patterns(self, lines, base=''):  # type: (typing.Iterable[str], str) -> None
+        """
+        :param lines: Lines of .gitignore file
+        :param base: Directory, relative to the repo's root, where the .gitignore file is placed
+        """
+        prefix = re.escape(base + '/') if base else ''
+
+        for line in lines:
+            line = line.rstrip('\n').rstrip()
+            if not line or line.startswith('#'):
+                continue
+
+            negated = line.startswith('!')
+            if negated:
+                line = line[1:]
+
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+
+            # Pattern with slash in beginning or middle is relative to the .gitignore location,
+            # otherwise it matches on any level
+            anchored = '/' in line
+            body = _translate_glob(line.lstrip('/'))
+            regex = prefix + body if anchored else prefix + '(?:.*/)?' + body
+
+            self._patterns[(negated, True)].append(regex + '(?:/.*)?')
+            # Files are matched only when they are inside of directory matching the directory-only pattern
+            self._patterns[(negated, False)].append(regex + ('/.*' if dir_only else '(?:/.*)?'))
+
+        self._compiled = None
+
+    def add_file(self, path, base=''):  # type: (pathlib.Path, str) -> None
+        try:
+            self.add_patterns(path.read_text(errors='replace').splitlines(), base)
+        except OSError:
+            pass
+
+    def _compile(self):
+        self._compiled = {
+            key: re.compile('^(?:{})$'.format('|'.join(regexes))) if regexes else None
+            for key, regexes in self._patterns.items()
+        }
+
+    def is_ignored(self, path, is_dir=False):  # type: (str, bool) -> bool
+        if self._compiled is None:
+            self._compile()
+
+        ignoring = self._compiled[(False, is_dir)]
+        if ignoring is None or not ignoring.match(path):
+            return False
+
+        negating = self._compiled[(True, is_dir)]
+        return negating is None or not negating.match(path)
+
+    @classmethod
+    def for_repo(cls, repo_dir):  # type: (pathlib.Path) -> IgnoreMatcher
+        """
+        Matcher with the repo-wide patterns. Patterns from .gitignore files in the repo's folders are added
+        by the ActivityWatcher when it traverses them.
+        """
+        matcher = cls()
+        matcher.add_file(repo_dir / '.git' / 'info' / 'exclude')
+        return matcher
+
+
+class ActivityWatcher:
+    """
+    Watches the working tree of the repo using inotify. The .git folder and the ignored paths are not watched.
+
+    Inotify needs one watch per directory, therefore for huge repos the number of watches is limited (by default
+    to half of the system's limit). The directories are traversed breadth-first, so when the limit is hit, the
+    shallower directories are the ones being watched.
+
+    Events are coalesced into activity intervals, which are consecutive events with gaps shorter than COALESCE_GAP.
+    """
+
+    def __init__(self, repo_dir, max_watches=None):  # type: (pathlib.Path, typing.Optional[int]) -> None
+        self.repo_dir = repo_dir
+        self.matcher = IgnoreMatcher.for_repo(repo_dir)
+
+        system_limit = inotify.max_user_watches()
+        self.max_watches = system_limit // 2 if system_limit else DEFAULT_MAX_WATCHES
+        if max_watches:
+            self.max_watches = min(self.max_watches, max_watches)
+        self.limit_reached = False
+
+        self.last_activity = time.time()
+        self.intervals = collections.deque(maxlen=100)  # type: typing.Deque[typing.Tuple[float, float]]
+        self._interval_start = self.last_activity
+
+        self._inotify = inotify.Inotify()
+        self._watches = {}  # type: typing.Dict[int, str]
+        self._add_tree('')
+
+        logger.info('Watching {} directories in {}'.format(len(self._watches), repo_dir))
+
+    @property
+    def watches_count(self):  # type: () -> int
+        return len(self._watches)
+
+    def _reached_limit(self):
+        if not self.limit_reached:
+            logger.warning('Limit of inotify watches reached, activity in deeper directories of the repo won\'t be '
+                           'detected. You can raise the \'watcher_max_watches\' option or the system\'s limit '
+                           'in {}'.format(inotify.MAX_USER_WATCHES_FILE))
+        self.limit_reached = True
+
+    def _add_tree(self, relative_dir):  # type: (str) -> None
+        queue = collections.deque([relative_dir])
+
+        while queue:
+            if len(self._watches) >= self.max_watches:
+                self._reached_limit()
+                return
+
+            relative_dir = queue.popleft()
+            path = self.repo_dir / relative_dir
+
+            try:
+                wd = self._inotify.add_watch(path, WATCH_MASK)
+                entries = list(os.scandir(str(path)))
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    self._reached_limit()
+                    return
+
+                continue  # Directory vanished in the meantime or it is not accessible
+
+            self._watches[wd] = relative_dir
+
+            # The directory's own .gitignore applies to its children
+            if any(entry.name == '.gitignore' for entry in entries):
+                self.matcher.add_file(path / '.gitignore', relative_dir)
+
+            for entry in entries:
+                try:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                except OSError:
+                    continue
+
+                child = relative_dir + '/' + entry.name if relative_dir else entry.name
+                if child != '.git' and not self.matcher.is_ignored(child, is_dir=True):
+                    queue.append(child)
+
+    def process_events(self, timeout=None):  # type: (typing.Optional[float]) -> bool
+        """
+        Waits at most timeout seconds for filesystem events and processes them.
+
+        :return: True if activity was detected
+        """
+        events = self._inotify.read(timeout)
+        now = time.time()
+        recently_active = now - self.last_activity < ACTIVITY_RESOLUTION
+        active = False
+
+        for event in events:
+            if event.mask & inotify.IN_Q_OVERFLOW:
+                active = True
+                continue
+
+            if event.mask & inotify.IN_IGNORED:
+                self._watches.pop(event.wd, None)
+                continue
+
+            relative_dir = self._watches.get(event.wd)
+            if relative_dir is None:
+                continue
+
+            path = relative_dir + '/' + event.name if relative_dir else event.name
+            is_dir = bool(event.mask & inotify.IN_ISDIR)
+
+            if is_dir and event.mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO) \
+                    and not self.matcher.is_ignored(path, is_dir=True):
+                self._add_tree(path)
+
+            if active or recently_active:
+                continue
+
+            active = not self.matcher.is_ignored(path, is_dir)
+
+        if active:
+            self._register_activity(now)
+
+        return active
+
+    def _register_activity(self, now):  # type: (float) -> None
+        if now - self.last_activity > COALESCE_GAP:
+            self.intervals.append((self._interval_start, self.last_activity))
+            self._interval_start = now
+
+        self.last_activity = now
+
+    def close(self):
+        self._inotify.close()
+
+
+class AutoPauser:
+    """
+    Stops the running time entry when there was no activity in the working tree for idle_timeout seconds
+    and starts new one when the activity is detected again.
+    """
+
+    def __init__(self, config, provider, watcher, idle_timeout):
+        self.config = config
+        self.provider = provider
+        self.watcher = watcher  # type: ActivityWatcher
+        self.idle_timeout = idle_timeout
+
+    def _is_paused(self):  # type: () -> bool
+        return bool(self.config.store['paused']) and not self.config.store['running']
+
+    def _timeout(self):  # type: () -> float
+        if self.config.store['running']:
+            return max(0, min(STORE_POLL_INTERVAL, self.watcher.last_activity + self.idle_timeout - time.time()))
+
+        return STORE_POLL_INTERVAL
+
+    def _renew_network_budget(self):
+        # The invocation's deadline is meant for short-lived processes, here every provider's call gets its own
+        helpers.configure_transport(self.config)
+
+    def pause(self):
+        self._renew_network_budget()
+        last_activity = datetime.datetime.fromtimestamp(self.watcher.last_activity)
+        logger.info('No activity since {}, pausing the tracking'.format(last_activity))
+
+        commits.stop_entry(self.config, self.provider, last_activity=last_activity)
+        self.config.store['paused'] = True
+        self.config.store.save()
+
+    def resume(self):
+        logger.info('Activity detected, resuming the tracking')
+        self._renew_network_budget()
+
+        project = helpers.get_project(self.config)
+
+        try:
+            self.provider.start(project=project)
+        except exceptions.RunningEntry:
+            logger.warning('There is another running time entry, tracking not resumed.')
+            return
+
+        events_module.publish(self.config, events_module.START, project=project)
+
+        self.config.store['paused'] = False
+        self.config.store.save()
+
+    def run_once(self):
+        active = self.watcher.process_events(self._timeout())
+
+        # Other gitrack's invocations might have changed the state in the meantime
+        self.config.store.load()
+
+        if active and self._is_paused():
+            self.resume()
+        elif self.config.store['running'] and time.time() - self.watcher.last_activity >= self.idle_timeout:
+            self.pause()
+
+    def run(self):
+        while True:
+            try:
+                self.run_once()
+            except exceptions.NetworkException as e:
+                # The state is not changed, so the action is retried with the next iteration
+                logger.warning('Provider is not reachable: {}'.format(e))
@@ -0,0 +1,211 @@
+"""
+In-process API for embedding giTrack in other tools, without spawning the 'gitrack' command per action.
+
+    >>> from gitrack import api
+    >>> api.start('/path/to/repo')
+    >>> api.status('/path/to/repo').running
+    True
+    >>> api.stop('/path/to/repo', description='Implemented the feature')
+
+The functions take path to the repo (or to any folder inside of it), return namedtuples and raise
+gitrack.exceptions.GitrackException's subclasses on errors. Configs and providers of the repos are created once and
+reused by the following calls, so one long-lived process can manage many repos cheaply. The functions are
+thread-safe: calls for one repo are serialized, calls for different repos run concurrently.
+
+The repos' state is reloaded on every call, as it can be changed by the Git's hooks or the CLI in the meantime.
+When the repo's configuration is changed, call forget() so it is loaded again.
+"""
+import collections
+import contextlib
+import pathlib
+import threading
+import typing
+
+import git
+
+from gitrack import commits, config as config_module, events, exceptions, helpers
+from gitrack.providers import EntryReference, RemoteEntry
+
+# State of the repo. 'entry' is the provider's running entry, fetched only when requested.
+Status = collections.namedtuple('Status', ['repo_dir', 'running', 'paused', 'since', 'provider', 'entry'])
+
+# Result of stopping the tracking. 'entry' references the stopped time entry, when the provider supports it.
+Stopped = collections.namedtuple('Stopped', ['status', 'entry'])
+
+_Repo = collections.namedtuple('_Repo', ['config', 'provider', 'lock'])
+
+
+class Session:
+    """
+    Cache of the repos' configs and providers. The module-level functions use shared default session.
+    """
+
+    def __init__(self):
+        self._repos = {}  # type: typing.Dict[pathlib.Path, _Repo]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _resolve(repo_dir):  # type: (typing.Union[str, pathlib.Path]) -> pathlib.Path
+        try:
+            return helpers.get_repo_dir(pathlib.Path(repo_dir).expanduser().resolve())
+        except RuntimeError:
+            raise exceptions.GitrackException('{} is not inside of any Git repo!'.format(repo_dir))
+
+    def _get(self, repo_dir):  # type: (typing.Union[str, pathlib.Path]) -> _Repo
+        repo_dir = self._resolve(repo_dir)
+
+        with self._lock:
+            repo = self._repos.get(repo_dir)
+            if repo is not None:
+                return repo
+
+            if not config_module.is_repo_initialized(repo_dir):
+                raise exceptions.UninitializedRepoException('Repo {} has not been initialized!'.format(repo_dir))
+
+            config = config_module.Config(repo_dir)
+            repo = self._repos[repo_dir] = _Repo(config, config.provider.klass()(config), threading.RLock())
+            return repo
+
+    @contextlib.contextmanager
+    def _use(self, repo_dir):  # type: (typing.Union[str, pathlib.Path]) -> typing.Iterator[_Repo]
+        repo = self._get(repo_dir)
+
+        with repo.lock:
+            repo.config.store.load()
+
+            try:
+                # Every call gets its own network deadline, the invocation's one is meant for short-lived processes.
+                # The repos can have different network limits, so they are not set process-wide either.
+                with helpers.network_budget(repo.config):
+                    yield repo
+            finally:
+                # Also changes done by the provider's actions which succeeded before a failure are saved
+                if repo.config.store.modified:
+                    repo.config.store.save()
+
+    @staticmethod
+    def _status(repo, entry=None):  # type: (_Repo, typing.Optional[RemoteEntry]) -> Status
+        store = repo.config.store
+        return Status(repo.config.repo_dir, bool(store['running']), bool(store['paused']), store['since'],
+                      str(repo.config.provider), entry)
+
+    def forget(self, repo_dir=None):  # type: (typing.Union[str, pathlib.Path, None]) -> None
+        """
+        Drops the cached config and provider of the repo, or of all the repos when repo_dir is None.
+        """
+        with self._lock:
+            if repo_dir is None:
+                self._repos.clear()
+            else:
+                self._repos.pop(self._resolve(repo_dir), None)
+
+    def status(self, repo_dir, remote=False):  # type: (typing.Union[str, pathlib.Path], bool) -> Status
+        """
+        :param remote: Fetches also the provider's running entry (served from the short-lived cache,
+                       see 'remote_state_ttl' option).
+        """
+        from gitrack import sync
+
+        with self._use(repo_dir) as repo:
+            entry = sync.get_current_entry(repo.config, repo.provider) if remote else None
+            return self._status(repo, entry)
+
+    def start(self, repo_dir, project=None, force=False):
+        # type: (typing.Union[str, pathlib.Path], typing.Union[str, int, None], bool) -> Status
+        """
+        Starts the tracking, nothing is done when the repo is already tracking.
+
+        :param project: Overrides the project configured for the repo.
+        :param force: Overrides running time entry of the provider.
+        :raises exceptions.RunningEntry: When the provider has running entry and force is not set.
+        """
+        with self._use(repo_dir) as repo:
+            if not repo.config.store['running']:
+                project = project if project is not None else helpers.get_project(repo.config)
+                repo.provider.start(project=project, force=force)
+                events.publish(repo.config, events.START, project=project)
+
+            return self._status(repo)
+
+    def stop(self, repo_dir, description=None, task=None):
+        # type: (typing.Union[str, pathlib.Path], typing.Optional[str], typing.Union[str, int, None]) -> Stopped
+        """
+        Stops the tracking and saves the time entry. Paused tracking is stopped for good.
+        """
+        with self._use(repo_dir) as repo:
+            entry = None  # type: typing.Optional[EntryReference]
+
+            if repo.config.store['running']:
+                entry = commits.stop_entry(repo.config, repo.provider, description, task=task)
+            elif repo.config.store['paused']:
+                repo.config.store['paused'] = False
+
+            return Stopped(self._status(repo), entry)
+
+    def cancel(self, repo_dir):  # type: (typing.Union[str, pathlib.Path]) -> Status
+        """
+        Stops the tracking without saving the time entry.
+        """
+        with self._use(repo_dir) as repo:
+            if repo.config.store['running']:
+                commits.take_pending(repo.config.store)
+                repo.provider.cancel()
+                events.publish(repo.config, events.CANCEL)
+            elif repo.config.store['paused']:
+                repo.config.store['paused'] = False
+
+            return self._status(repo)
+
+    def rotate(self, repo_dir, description=None, task=None):
+        # type: (typing.Union[str, pathlib.Path], typing.Optional[str], typing.Union[str, int, None]) -> Stopped
+        """
+        Saves the running time entry and starts new one right away, the same way as commits do.
+
+        :param task: Task of the saved entry. When not given and the tasks are supported, it is parsed
+                     the same way as for commits.
+        :raises exceptions.NotRunningException: When the repo is not tracking.
+        """
+        with self._use(repo_dir) as repo:
+            if not repo.config.store['running']:
+                raise exceptions.NotRunningException('Repo {} is not tracking!'.format(repo.config.repo_dir))
+
+            if task is None and repo.config.tasks_support:
+                task = helpers.get_task(repo.config, git.Repo(str(repo.config.repo_dir)))
+
+            entry = commits.stop_entry(repo.config, repo.provider, description, task=task)
+
+            project = helpers.get_project(repo.config)
+            repo.provider.start(project=project)
+            events.publish(repo.config, events.START, project=project)
+
+            return Stopped(self._status(repo), entry)
+
+
+_default_session = Session()
+
+
+def forget(repo_dir=None):  # type: (typing.Union[str, pathlib.Path, None]) -> None
+    _default_session.forget(repo_dir)
+
+
+def status(repo_dir, remote=False):  # type: (typing.Union[str, pathlib.Path], bool) -> Status
+    return _default_session.status(repo_dir, remote)
+
+
+def start(repo_dir, project=None, force=False):
+    # type: (typing.Union[str, pathlib.Path], typing.Union[str, int, None], bool) -> Status
+    return _default_session.start(repo_dir, project, force)
+
+
+def stop(repo_dir, description=None, task=None):
+    # type: (typing.Union[str, pathlib.Path], typing.Optional[str], typing.Union[str, int, None]) -> Stopped
+    return _default_session.stop(repo_dir, description, task)
+
+
+def cancel(repo_dir):  # type: (typing.Union[str, pathlib.Path]) -> Status
+    return _default_session.cancel(repo_dir)
+
+
+def rotate(repo_dir, description=None, task=None):
+    # type: (typing.Union[str, pathlib.Path], typing.Optional[str], typing.Union[str, int, None]) -> Stopped
+    return _default_session.rotate(repo_dir, description, task)
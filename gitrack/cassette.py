@@ -0,0 +1,214 @@
+"""
+Recording and replaying of giTrack's HTTP traffic, for reproducing slow or failing invocations and for benchmarking
+against real-world traffic without touching the services.
+
+With GITRACK_RECORD=<file> every request made through the transport layer is appended into the cassette file
+as one JSON line, together with the response, or the error, and the time it took. Credentials of the request,
+sensitive headers and values of the sensitive JSON keys (eq. 'api_token') are redacted. The line is written with
+a single write() call, so the hooks running concurrently can record into the same cassette.
+
+With GITRACK_REPLAY=<file> no request is made, the recorded responses are served instead. Requests are matched
+by the method and the URL's path and query, the host is ignored. Repeated requests get the recorded responses
+in the recorded order, the last one is repeated once they run out. The recorded latencies are reproduced,
+scaled by GITRACK_REPLAY_SCALE (eq. 0 to not wait at all).
+"""
+import collections
+import datetime
+import json
+import os
+import re
+import threading
+import time
+import typing
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from gitrack import exceptions
+
+RECORD_ENV_VARIABLE = 'GITRACK_RECORD'
+REPLAY_ENV_VARIABLE = 'GITRACK_REPLAY'
+REPLAY_SCALE_ENV_VARIABLE = 'GITRACK_REPLAY_SCALE'
+
+REDACTED = '<redacted>'
+SENSITIVE_HEADERS = {'authorization', 'proxy-authorization', 'cookie', 'set-cookie'}
+SENSITIVE_KEY = re.compile(r'token|password|secret|api_?key', re.IGNORECASE)
+
+# Shorter credentials would be replaced also in unrelated places (eq. Toggl's 'api_token' password)
+MIN_SECRET_LENGTH = 12
+
+
+def _credentials(auth):  # type: (typing.Any) -> typing.List[str]
+    if isinstance(auth, (tuple, list)):
+        values = auth
+    elif isinstance(auth, requests.auth.HTTPBasicAuth):
+        values = (auth.username, auth.password)
+    else:
+        values = ()
+
+    return [value for value in values if isinstance(value, str) and len(value) >= MIN_SECRET_LENGTH]
+
+
+def _redact_value(value):  # type: (typing.Any) -> typing.Any
+    if isinstance(value, dict):
+        return {key: REDACTED if SENSITIVE_KEY.search(key) and isinstance(value[key], str) else _redact_value(value[key])
+                for key in value}
+
+    if isinstance(value, list):
+        return [_redact_value(item) for item in value]
+
+    return value
+
+
+def redact(text, secrets):  # type: (typing.Optional[str], typing.Iterable[str]) -> typing.Optional[str]
+    if not text:
+        return text
+
+    for secret in secrets:
+        text = text.replace(secret, REDACTED)
+
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return text
+
+    redacted = _redact_value(data)
+    return text if redacted == data else json.dumps(redacted)
+
+
+def _key(method, url):  # type: (str, str) -> str
+    parts = urlsplit(url)
+    return '{} {}{}'.format(method.upper(), parts.path, '?' + parts.query if parts.query else '')
+
+
+def _body(data):  # type: (typing.Any) -> typing.Optional[str]
+    if data is None or isinstance(data, str):
+        return data
+
+    if isinstance(data, bytes):
+        return data.decode('utf-8', 'replace')
+
+    return json.dumps(data)
+
+
+class Recorder:
+    def __init__(self, path):  # type: (str) -> None
+        self.path = path
+
+    def send(self, method, url, **kwargs):  # type: (str, str, **typing.Any) -> requests.Response
+        secrets = _credentials(kwargs.get('auth'))
+        interaction = {
+            'time': time.time(),
+            'method': method.upper(),
+            'url': redact(url, secrets),
+            'request': {
+                'headers': {name: REDACTED if name.lower() in SENSITIVE_HEADERS else redact(value, secrets)
+                            for name, value in (kwargs.get('headers') or {}).items()},
+                'body': redact(_body(kwargs.get('data', kwargs.get('json'))), secrets),
+            },
+        }
+        started = time.monotonic()
+
+        try:
+            response = requests.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            interaction.update(elapsed=time.monotonic() - started, error=type(e).__name__)
+            self._write(interaction)
+            raise
+
+        interaction.update(elapsed=time.monotonic() - started, status=response.status_code, response={
+            'headers': {name: REDACTED if name.lower() in SENSITIVE_HEADERS else value
+                        for name, value in response.headers.items()},
+            'body': redact(response.text, secrets),
+        })
+        self._write(interaction)
+
+        return response
+
+    def _write(self, interaction):  # type: (typing.Dict) -> None
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(interaction, separators=(',', ':')) + '\n')
+
+
+class Player:
+    def __init__(self, path, scale=1.0):  # type: (str, float) -> None
+        self.scale = scale
+        self._interactions = collections.defaultdict(list)  # type: typing.Dict[str, typing.List[typing.Dict]]
+        self._positions = collections.Counter()  # type: typing.Dict[str, int]
+        self._lock = threading.Lock()
+
+        try:
+            with open(path) as file:
+                for line in file:
+                    interaction = json.loads(line)
+                    self._interactions[_key(interaction['method'], interaction['url'])].append(interaction)
+        except (OSError, ValueError, KeyError) as e:
+            raise exceptions.ConfigException('Cassette {} can not be replayed: {}'.format(path, e))
+
+    def _next(self, key):  # type: (str) -> typing.Dict
+        interactions = self._interactions.get(key)
+        if not interactions:
+            raise exceptions.NetworkException('Cassette has no recorded response for {}'.format(key))
+
+        with self._lock:
+            interaction = interactions[min(self._positions[key], len(interactions) - 1)]
+            self._positions[key] += 1
+
+        return interaction
+
+    def send(self, method, url, timeout=None, **kwargs):  # type: (str, str, typing.Any, **typing.Any) -> requests.Response
+        interaction = self._next(_key(method, url))
+        delay = interaction['elapsed'] * self.scale
+
+        # Slow responses time out the same way the real ones would, with the current timeouts
+        limit = sum(timeout) if isinstance(timeout, tuple) else timeout
+        if limit is not None and delay > limit:
+            time.sleep(limit)
+            raise requests.exceptions.ReadTimeout('Replayed response took {:.2f}s'.format(delay))
+
+        time.sleep(delay)
+
+        if interaction.get('error'):
+            error_class = getattr(requests.exceptions, interaction['error'], requests.exceptions.ConnectionError)
+            raise error_class('Replayed {}'.format(interaction['error']))
+
+        response = requests.Response()
+        response.status_code = interaction['status']
+        response.headers = CaseInsensitiveDict(interaction['response']['headers'])
+        response._content = (interaction['response']['body'] or '').encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = url
+        response.elapsed = datetime.timedelta(seconds=delay)
+        response.request = requests.Request(method, url).prepare()
+
+        return response
+
+
+_sessions = {}  # type: typing.Dict[typing.Tuple, typing.Union[Recorder, Player]]
+
+
+def get_active():  # type: () -> typing.Union[Recorder, Player, None]
+    """
+    :return: Recorder or Player requested by the environmental variables, None when the traffic goes to the network
+    """
+    record = os.environ.get(RECORD_ENV_VARIABLE)
+    replay = os.environ.get(REPLAY_ENV_VARIABLE)
+
+    if not record and not replay:
+        return None
+
+    if record and replay:
+        raise exceptions.ConfigException('{} and {} can not be used together!'.format(RECORD_ENV_VARIABLE,
+                                                                                       REPLAY_ENV_VARIABLE))
+
+    try:
+        scale = float(os.environ.get(REPLAY_SCALE_ENV_VARIABLE) or 1)
+    except ValueError:
+        raise exceptions.ConfigException('{} has to be a number!'.format(REPLAY_SCALE_ENV_VARIABLE))
+
+    key = (record, replay, scale)
+    if key not in _sessions:
+        _sessions[key] = Recorder(os.path.abspath(record)) if record else Player(replay, scale)
+
+    return _sessions[key]
@@ -0,0 +1,152 @@
+"""
+Switching of the time entries when the checked out branch's task changes, driven by Git's post-checkout hook.
+
+Checkouts tend to come in bursts (rebase, bisect, scripts), so every hook's invocation only records that
+the checkout happened into pending file. The invocation which gets the lock then waits until there were no
+checkouts for DEBOUNCE seconds and performs single transition from the branch checked out before the burst
+to the one checked out after it. Other invocations exit right away.
+"""
+import datetime
+import json
+import logging
+import os
+import pathlib
+import re
+import time
+import typing
+
+import git
+
+from gitrack import commits, config as config_module, events, helpers, locking
+
+logger = logging.getLogger('gitrack.checkout')
+
+PENDING_FILENAME = 'checkout.pending'
+LOCK_FILENAME = 'checkout.lock'
+
+# Number of seconds without any checkout after which the burst of checkouts is considered finished
+DEBOUNCE = 3
+
+# Upper limit of the waiting for the end of the burst, so never ending checkouts still get processed
+MAX_WAIT = 30
+
+CHECKOUT_REFLOG_REGEX = re.compile(r'^checkout: moving from (?P<from>\S+) to (?P<to>\S+)$')
+
+
+def is_enabled(config):  # type: (config_module.Config) -> bool
+    return bool(config.tasks_support) and config.tasks_mode == config_module.TaskParsingModes.DYNAMIC_BRANCH
+
+
+def get_previous_branch(git_dir):  # type: (pathlib.Path) -> typing.Optional[str]
+    """
+    Returns name of the branch (or SHA when HEAD was detached) that was checked out before the last checkout.
+    """
+    match = CHECKOUT_REFLOG_REGEX.match(helpers.get_last_reflog_message(git_dir) or '')
+    return match.group('from') if match else None
+
+
+def record_checkout(repo_data_dir, previous_branch):  # type: (pathlib.Path, typing.Optional[str]) -> None
+    """
+    Records the checkout into the pending file. Only the first checkout of the burst is written, the following
+    ones just postpone its processing.
+    """
+    pending_file = repo_data_dir / PENDING_FILENAME
+    tmp_file = repo_data_dir / '{}.tmp{}'.format(PENDING_FILENAME, os.getpid())
+    tmp_file.write_text(json.dumps({'from': previous_branch, 'at': time.time()}))
+
+    try:
+        # Linking is atomic and fails when the file already exists, so the pending file is never partially written
+        os.link(str(tmp_file), str(pending_file))
+    except FileExistsError:
+        os.utime(str(pending_file))
+    finally:
+        tmp_file.unlink()
+
+
+def _take_pending(pending_file):  # type: (pathlib.Path) -> typing.Optional[typing.Dict]
+    processing_file = pending_file.with_suffix('.processing')
+
+    try:
+        pending_file.replace(processing_file)
+    except FileNotFoundError:
+        return None
+
+    try:
+        return json.loads(processing_file.read_text())
+    except ValueError:
+        return None
+    finally:
+        processing_file.unlink()
+
+
+class BranchSwitcher:
+    """
+    Stops the running time entry with the task of previously checked out branch and starts new one,
+    when the task of the checked out branch differs.
+    """
+
+    def __init__(self, config, provider, repo, debounce=None, max_wait=None):
+        self.config = config  # type: config_module.Config
+        self.provider = provider
+        self.repo = repo  # type: git.Repo
+        self.debounce = DEBOUNCE if debounce is None else debounce
+        self.max_wait = MAX_WAIT if max_wait is None else max_wait
+
+        self.pending_file = config.repo_data_dir / PENDING_FILENAME
+        self.lock_file = config.repo_data_dir / LOCK_FILENAME
+
+    def _current_branch(self):  # type: () -> typing.Optional[str]
+        try:
+            return self.repo.active_branch.name
+        except TypeError:  # Detached HEAD (eq. bisect), there is no branch to take the task from
+            return None
+
+    def switch(self, pending):  # type: (typing.Dict) -> bool
+        """
+        :return: True if the time entry was switched
+        """
+        # The hook's process waited for the end of the burst, other invocations might have changed the state
+        self.config.store.load()
+        if not self.config.store['running']:
+            return False
+
+        # The entry was started after the checkout (eq. by commit), so it already belongs to the new branch
+        since = self.config.store['since']
+        if since is not None and since.timestamp() > pending['at']:
+            return False
+
+        branch = self._current_branch()
+        if branch is None:
+            return False
+
+        previous_task = helpers.parse_task(self.config, pending['from']) if pending['from'] else None
+        task = helpers.parse_task(self.config, branch)
+        if task == previous_task:
+            return False
+
+        logger.info('Switching time entry from task {} to task {}'.format(previous_task, task))
+
+        # The invocation's deadline already started to run out while waiting for the end of the burst
+        helpers.configure_transport(self.config)
+
+        commits.stop_entry(self.config, self.provider, task=previous_task)
+
+        project = helpers.get_project(self.config)
+        self.provider.start(project=project)
+        events.publish(self.config, events.START, project=project)
+        self.config.store['since'] = datetime.datetime.now()
+        self.config.store.save()
+        return True
+
+    def _process_pending(self):
+        locking.wait_until_quiet(self.pending_file, self.debounce, self.max_wait)
+        pending = _take_pending(self.pending_file)
+
+        if pending is not None:
+            self.switch(pending)
+
+    def run(self):
+        """
+        Processes the pending checkouts, unless other process is already doing that.
+        """
+        locking.single_flight(self.lock_file, self.pending_file.exists, self._process_pending)
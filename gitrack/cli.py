@@ -1,24 +1,26 @@
+import csv
+import functools
+import json
 import logging
 import os
+import pathlib
 import sys
 import traceback
-from datetime import datetime
+import typing
+from datetime import datetime, timedelta
 
 import click
-import click_completion
 import git
 import inquirer
 
-from gitrack import helpers, prompt, config as config_module, __version__, exceptions
-
-click_completion.init()
+from gitrack import helpers, prompt, profiling, metrics, events, completion as completion_module, \
+    config as config_module, get_version, exceptions
 
 logger = logging.getLogger('gitrack.cli')
 
 
 # Ideas for future
 # TODO: [?] Offline mode
-# TODO: Automatic pausing using file activities (watchdog)
 
 
 #################################################################
@@ -54,10 +56,41 @@ class Mutex(click.Option):
         return super().handle_parse_result(ctx, opts, args)
 
 
+class Group(click.Group):
+    """
+    Group that remembers the full name of the invoked command (eq. 'hooks post-commit') in the context's meta,
+    which is shared across all the nested contexts.
+    """
+
+    COMMAND_NAME_META_KEY = 'gitrack.command_name'
+
+    def resolve_command(self, ctx, args):
+        cmd_name, cmd, args = super().resolve_command(ctx, args)
+
+        if cmd_name is not None:
+            ctx.meta[self.COMMAND_NAME_META_KEY] = ' '.join(
+                filter(None, (ctx.meta.get(self.COMMAND_NAME_META_KEY), cmd_name)))
+
+        return cmd_name, cmd, args
+
+    def group(self, *args, **kwargs):
+        kwargs.setdefault('cls', Group)
+        return super().group(*args, **kwargs)
+
+    @classmethod
+    def get_command_name(cls, ctx):  # type: (click.Context) -> str
+        return ctx.meta.get(cls.COMMAND_NAME_META_KEY, '')
+
+
 def entrypoint(args, obj=None):
     """
     CLI entry point, where exceptions are handled.
     """
+    if '_GITRACK_COMPLETE' in os.environ:
+        # Dynamic completion installed by click_completion invokes gitrack on every Tab press
+        import click_completion
+        click_completion.init()
+
     try:
         cli(args, obj=obj or {})
     except exceptions.GitrackException as e:
@@ -73,12 +106,71 @@ def entrypoint(args, obj=None):
         exit(1)
 
 
-@click.group()
+# click>=7.1 signals exit from the command with its own exception
+_EXIT_EXCEPTIONS = (SystemExit, getattr(click.exceptions, 'Exit', SystemExit))
+
+
+def _finish_invocation(ctx):  # type: (click.Context) -> None
+    """
+    Records the invocation's metrics sample and dumps the profile if profiling is enabled.
+    It is called when the context is closed, hence when an exception is propagating it is available
+    through sys.exc_info().
+    """
+    command_name = Group.get_command_name(ctx)
+
+    if profiling.is_enabled():
+        config = ctx.obj.get('config')
+        data_dir = config.repo_data_dir if config is not None else config_module.get_data_dir()
+        profiling.dump(data_dir / 'profiles', command_name)
+
+    # The handlers' failures are part of the metrics
+    events.drain()
+
+    exc_value = sys.exc_info()[1]
+    if isinstance(exc_value, _EXIT_EXCEPTIONS):
+        exit_code = getattr(exc_value, 'exit_code', getattr(exc_value, 'code', None))
+        outcome = 'exit {}'.format(exit_code) if exit_code else 'ok'
+    elif exc_value is not None:
+        outcome = type(exc_value).__name__
+    else:
+        outcome = 'ok'
+
+    try:
+        sample = metrics.build_sample(command_name, ctx.obj.get('repo_dir'), outcome)
+        metrics.record(config_module.get_data_dir(), sample)
+    except OSError as e:
+        logger.debug('Metrics could not be recorded: {}'.format(e))
+
+    # For the case when more invocations happen in one process
+    profiling.reset()
+    metrics.reset()
+
+
+def _print_version(ctx, param, value):
+    """
+    Replacement of click.version_option(), which needs the version already when the command is defined.
+    """
+    if not value or ctx.resilient_parsing:
+        return
+
+    click.echo('gitrack, version {}'.format(get_version()))
+    ctx.exit()
+
+
+# Commands which don't operate on the current repo
+REPO_INDEPENDENT_COMMANDS = {'stats', 'state', 'sync', 'watch', 'estimate'}
+
+
+@click.group(cls=Group)
 @click.option('--quiet', '-q', is_flag=True, help="Don't print anything")
 @click.option('--verbose', '-v', count=True, help="Prints additional info. More Vs, more info! (-vvv...)")
-@click.version_option(__version__)
+@click.option('--profile', is_flag=True, help="Profiles the invocation and stores the results into the repo's data "
+                                              "folder. Can be also enabled with GITRACK_PROFILE=1 environmental "
+                                              "variable, which works also for the Git's hooks.")
+@click.option('--version', is_flag=True, callback=_print_version, expose_value=False, is_eager=True,
+              help='Show the version and exit.')
 @click.pass_context
-def cli(ctx, quiet, verbose):
+def cli(ctx, quiet, verbose, profile):
     """
     Tool for automating time tracking using Git. It heavily depends on Git hooks.
     Time entries are created based on the commits, their messages and time of creation.
@@ -94,16 +186,37 @@ def cli(ctx, quiet, verbose):
     Before using giTrack you have to initialize the Git's repository: 'gitrack init'.
     Afterwards when you start tracking your work use: 'gitrack start', after your are finished run 'gitrack stop'.
     """
-    repo_dir = helpers.get_repo_dir()
+    if ctx.invoked_subcommand in REPO_INDEPENDENT_COMMANDS:
+        helpers.setup_logging(-1 if quiet else verbose)
+        return
+
+    ctx.call_on_close(functools.partial(_finish_invocation, ctx))
+
+    if (profile or profiling.is_requested()) and ctx.invoked_subcommand != 'profile':
+        profiling.enable()
+
+    with profiling.phase('repo discovery'):
+        try:
+            repo_dir = helpers.get_repo_dir()
+        except RuntimeError:
+            # Bulk initialization can be run from outside of any repo
+            if ctx.invoked_subcommand != 'init':
+                raise
+
+            repo_dir = None
     ctx.obj['repo_dir'] = repo_dir
 
     helpers.setup_logging(-1 if quiet else verbose)
 
     if ctx.invoked_subcommand != 'init':
-        ctx.obj['config'] = config_module.Config(repo_dir)
+        with profiling.phase('config load'):
+            ctx.obj['config'] = config = config_module.Config(repo_dir)
 
-        provider_class = ctx.obj['config'].provider.klass()
-        ctx.obj['provider'] = provider_class(ctx.obj['config'])
+        helpers.configure_transport(config)
+
+        with profiling.phase('provider setup'):
+            provider_class = ctx.obj['config'].provider.klass()
+            ctx.obj['provider'] = provider_class(ctx.obj['config'])
 
 
 @cli.resultcallback()
@@ -112,13 +225,17 @@ def save_store(*args, **kwargs):
 
     if ctx.obj.get('config'):
         config = ctx.obj.get('config')
-        config.store.save()
+
+        # Saving unmodified Store could overwrite changes done by other invocations in the meantime
+        if config.store.modified:
+            config.store.save()
 
         # We don't want to pollute certain invocations
         if ctx.invoked_subcommand not in {'prompt', 'hooks'} \
             and config.update_check:
-            
-            helpers.check_version()
+
+            with profiling.phase('version check'):
+                helpers.check_version()
 
 
 @cli.command(short_help='Starts time tracking')
@@ -133,22 +250,23 @@ def start(ctx, force):
 
     config = ctx.obj['config']
     if not ctx.obj['config'].store['running']:
-        project = None
-        if config.project_support:
-            try:
-                project = int(config.project)
-            except ValueError:
-                project = config.project
+        project = helpers.get_project(config)
 
         try:
-            ctx.obj['provider'].start(project=project, force=force)
+            with profiling.phase('provider.start'):
+                ctx.obj['provider'].start(project=project, force=force)
         except exceptions.RunningEntry:
             overwrite = inquirer.shortcuts.confirm('There is currently running time entry that '
                                                    'will be overwritten, do you want to continue?', default=False)
 
-            if overwrite:
+            if not overwrite:
+                return
+
+            with profiling.phase('provider.start'):
                 ctx.obj['provider'].start(project=project, force=True)
 
+        events.publish(config, events.START, project=project)
+
 
 @cli.command(short_help='Stops time tracking')
 @click.option('--cancel', '-c', is_flag=True,
@@ -159,11 +277,21 @@ def stop(ctx, cancel, description):
     """
     Stops the time tracking with message if provided.
     """
+    from gitrack import commits
+
     if ctx.obj['config'].store['running']:
         if cancel:
-            ctx.obj['provider'].cancel()
+            commits.take_pending(ctx.obj['config'].store)
+            with profiling.phase('provider.cancel'):
+                ctx.obj['provider'].cancel()
+
+            events.publish(ctx.obj['config'], events.CANCEL)
         else:
-            ctx.obj['provider'].stop(description)
+            with profiling.phase('provider.stop'):
+                commits.stop_entry(ctx.obj['config'], ctx.obj['provider'], description)
+    elif ctx.obj['config'].store['paused']:
+        # The session was paused by 'gitrack autopause', stopping it means that it should not be resumed anymore
+        ctx.obj['config'].store['paused'] = False
 
 
 @cli.command(short_help='Display status information for the repo')
@@ -172,19 +300,29 @@ def status(ctx):
     """
     Stops the time tracking with message if provided.
     """
+    from gitrack import sync
+
     config = ctx.obj['config']
     provider = ctx.obj['provider']
 
+    entry = sync.get_current_entry(config, provider)
+
     click.echo("""running: {}
 running since: {}
+paused: {}
 provider: {}
 provider has running entry: {}""".format(
         config.store['running'],
         config.store['since'] or '',
+        bool(config.store['paused']),
         config.provider,
-        provider.is_running(),
+        entry is not None,
     ))
 
+    if entry is not None and entry.start is not None:
+        click.echo('provider\'s entry: {} (started {})'.format(
+            entry.description or '<no description>', datetime.fromtimestamp(entry.start).replace(microsecond=0)))
+
 
 @cli.command(short_help='Initialize Git repo for time tracking')
 @click.option('--check', is_flag=True, help='Instead of initializing the repo, checks whether it has '
@@ -193,13 +331,29 @@ provider has running entry: {}""".format(
 @click.option('--no-hook', is_flag=True, help='If you want to skip Git\'s hook installation. You will be responsible to'
                                               ' set properly the hook to call \'gitrack hooks post-commit\'.'
                                               ' Without that giTrack won\'t function properly.')
+@click.option('--checkout-hook', is_flag=True, help='Installs also post-checkout hook, which switches the time entry '
+                                                    'when the checked out branch has different task. '
+                                                    'Only for the dynamic branch tasks\' mode.')
+@click.option('--global-hook', is_flag=True, help='Instead of initializing the repo, installs dispatcher of the Git\'s '
+                                                  'hooks for all repos using the global core.hooksPath. Repos '
+                                                  'initialized afterwards don\'t get hooks of their own.')
+@click.option('--remove-global-hook', is_flag=True, help='Removes the global dispatcher of the Git\'s hooks.')
+@click.option('--recursive', '-r', type=click.Path(exists=True, file_okay=False, resolve_path=True),
+              help='Initializes all the Git repos found in the given directory tree, using the configuration '
+                   'from --template. Already initialized repos are skipped.')
+@click.option('--template', '-t', type=click.Path(exists=True, dir_okay=False, resolve_path=True),
+              help='.gitrack file which is used as local config of the repos initialized with --recursive. '
+                   'Repos having their own .gitrack file keep it.')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=helpers.BULK_INIT_JOBS, show_default=True,
+              help='Number of repos initialized in parallel with --recursive.')
 @click.option('--config-destination', '-c', type=click.Choice(['local', 'store']),
               default='local',
               help='Specifies where to store the configuration for the initialized repository. '
                    '\'local\' means file in the root of the Git repository. '
                    '\'store\' means giTrack\'s internal storage. Default: local')
 @click.pass_context
-def init(ctx, check, install_hook, no_hook, config_destination):
+def init(ctx, check, install_hook, no_hook, checkout_hook, global_hook, remove_global_hook, recursive, template, jobs,
+         config_destination):
     """
     Initializes the current Git repository.
 
@@ -211,8 +365,30 @@ def init(ctx, check, install_hook, no_hook, config_destination):
     It is possible to initialize giTrack without automatic installation of the Git's hook.
     Then it is your responsibility to ensure that on 'post-commit' hook the giTrack command
     'gitrack hooks post-commit' is called.
+
+    With --recursive all the repos in the directory tree are initialized at once, without any prompts,
+    using the configuration from --template.
+
+    With --global-hook the hooks are handled by single dispatcher set as the global core.hooksPath, which calls
+    giTrack only in the initialized repos and calls the repos' own hooks.
     """
+    if global_hook:
+        helpers.install_global_hook(checkout_hook)
+        click.echo('Global hooks dispatcher installed into {}'.format(helpers.get_global_hooks_dir()))
+        return
+
+    if remove_global_hook:
+        helpers.uninstall_global_hook()
+        click.echo('Global hooks dispatcher removed. Repos initialized with it need \'gitrack init --install-hook\'.')
+        return
+
+    if recursive:
+        _init_recursive(pathlib.Path(recursive), template, checkout_hook, jobs)
+        return
+
     repo_dir = ctx.obj['repo_dir']
+    if repo_dir is None:
+        raise exceptions.GitrackException('No Git repo in the directory tree.')
 
     if check:
         if helpers.is_repo_initialized(repo_dir):
@@ -221,9 +397,32 @@ def init(ctx, check, install_hook, no_hook, config_destination):
             exit(2)
     else:
         if install_hook:
-            helpers.install_hook(repo_dir)
+            helpers.install_hook(repo_dir, checkout_hook)
         else:
-            helpers.init(repo_dir, config_module.ConfigDestination(config_destination), should_install_hook=not no_hook)
+            helpers.init(repo_dir, config_module.ConfigDestination(config_destination), should_install_hook=not no_hook,
+                         checkout_hook=checkout_hook)
+            completion_module.update_values()
+
+
+def _init_recursive(root, template, checkout_hook, jobs):
+    # type: (pathlib.Path, typing.Optional[str], bool, int) -> None
+    if template is None:
+        raise click.UsageError('--recursive requires --template with the configuration for the repos.')
+
+    results = helpers.init_recursive(root, pathlib.Path(template), checkout_hook=checkout_hook, jobs=jobs)
+    completion_module.update_values()
+
+    for result in results:
+        if result.error is not None:
+            click.secho('{}: {}'.format(result.repo_dir, result.error), fg='red')
+
+    initialized = sum(1 for result in results if result.initialized)
+    failed = sum(1 for result in results if result.error is not None)
+    click.echo('Found {} repos: {} initialized, {} already initialized, {} failed.'.format(
+        len(results), initialized, len(results) - initialized - failed, failed))
+
+    if failed:
+        exit(1)
 
 
 @cli.group(short_help='Git hooks invocations')
@@ -241,7 +440,11 @@ def hooks_post_commit(ctx, force):
     """
     Internal command which is being called on Git's post-commit hook.
     It is responsible for creating the new time entries.
+
+    The commit is queued and only one process per repo creates the time entries, for all the queued commits
+    at once, so bursts of commits don't spawn bunch of concurrently running invocations.
     """
+    from gitrack import commits
 
     config = ctx.obj['config']
     if not config.store['running']:
@@ -249,16 +452,130 @@ def hooks_post_commit(ctx, force):
 
     provider = ctx.obj['provider']
     repo = git.Repo(ctx.obj['repo_dir'])
-    commit = repo.head.commit
-    message = commit.message.strip()
 
-    task = None
-    if config.tasks_support:
-        task = helpers.get_task(config, repo)
+    # Amended and rebased commits are handled by the post-rewrite hook, when it is installed
+    git_dir = pathlib.Path(repo.git_dir)
+    if provider.support_rewrite and helpers.is_rewriting_commit(git_dir) \
+            and helpers.is_rewrite_hook_installed(ctx.obj['repo_dir'], git_dir):
+        return
+
+    commits.enqueue(config.repo_data_dir, repo.head.commit.hexsha, force)
+    commits.CommitProcessor(config, provider, repo).run()
+
+
+@hooks.command('post-rewrite', short_help='Post-rewrite git hook')
+@click.argument('rewrite_type', required=False)
+@click.pass_context
+def hooks_post_rewrite(ctx, rewrite_type):
+    """
+    Internal command which is being called on Git's post-rewrite hook, with the list of rewritten
+    commits on the standard input. It updates the time entries of the amended or rebased commits
+    and merges the entries of squashed commits.
+    """
+    config = ctx.obj['config']
+    provider = ctx.obj['provider']
+    commit_entries = config.store[helpers.COMMIT_ENTRIES_STORE_KEY]
+
+    if not provider.support_rewrite or not commit_entries:
+        return
+
+    rewritten = helpers.parse_rewritten_commits(click.get_text_stream('stdin'))
+    repo = git.Repo(ctx.obj['repo_dir'])
+    rewrites = helpers.plan_rewrites(commit_entries, rewritten, lambda sha: repo.commit(sha).message.strip())
+
+    if not rewrites:
+        return
+
+    logger.info('Rewriting {} time entries after {}'.format(len(rewrites), rewrite_type or 'rewrite'))
+    with profiling.phase('provider.rewrite'):
+        provider.rewrite(rewrites)
+
+    config.store[helpers.COMMIT_ENTRIES_STORE_KEY] = commit_entries
+
+
+@hooks.command('post-checkout', short_help='Post-checkout git hook')
+@click.argument('previous_head', required=False)
+@click.argument('new_head', required=False)
+@click.argument('branch_checkout', required=False)
+@click.pass_context
+def hooks_post_checkout(ctx, previous_head, new_head, branch_checkout):
+    """
+    Internal command which is being called on Git's post-checkout hook. When the checked out branch has different
+    task than the previous one, the running time entry is stopped and new one is started.
+    Bursts of checkouts are coalesced into single switch.
+    """
+    from gitrack import checkout
+
+    config = ctx.obj['config']
+    if branch_checkout != '1' or not config.store['running'] or not checkout.is_enabled(config):
+        return
+
+    repo = git.Repo(ctx.obj['repo_dir'])
+    checkout.record_checkout(config.repo_data_dir, checkout.get_previous_branch(pathlib.Path(repo.git_dir)))
+    checkout.BranchSwitcher(config, ctx.obj['provider'], repo).run()
+
+
+@cli.command(short_help='Pauses the tracking when you are idle')
+@click.option('--idle-timeout', '-t', type=int, help='Minutes without activity after which the tracking is paused. '
+                                                     'Overrides the \'idle_timeout\' option.')
+@click.pass_context
+def autopause(ctx, idle_timeout):
+    """
+    Watches the working tree of the repo for changes of files and when there is no activity for
+    the configured time (idle_timeout option, default 15 minutes), the running time entry is stopped
+    at the moment of the last activity. Once an activity is detected again, new time entry is started.
+    Stopping the tracking with 'gitrack stop' while it is paused ends the session for good.
+
+    Files ignored by Git and the .git folder are not watched. The command runs until it is interrupted
+    and only one instance can run per repo. It is available only on Linux.
+    """
+    config = ctx.obj['config']
+    idle_timeout = (idle_timeout or config.idle_timeout) * 60
+
+    # Imported here as it is not needed by the other commands
+    from gitrack import activity, locking
 
-    provider.stop(message, task=task, force=force)
-    provider.start()
-    ctx.obj['config'].store['since'] = datetime.now()
+    with locking.locked(config.repo_data_dir / 'autopause.lock', blocking=False) as acquired:
+        if not acquired:
+            raise exceptions.WatcherException('Autopause is already running for this repo!')
+
+        watcher = activity.ActivityWatcher(ctx.obj['repo_dir'], max_watches=config.watcher_max_watches)
+        click.echo('Watching {} directories, the tracking will be paused after {} minutes of inactivity.'.format(
+            watcher.watches_count, idle_timeout // 60))
+
+        try:
+            activity.AutoPauser(config, ctx.obj['provider'], watcher, idle_timeout).run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+
+
+EXPORT_FIELDS = ('id', 'repo', 'description', 'project', 'task', 'tags', 'start', 'stop')
+
+
+@cli.command(short_help='Exports the time entries')
+@click.option('--since', '-s', type=click.DateTime(), help='Only entries started after this moment.')
+@click.option('--format', '-f', 'output_format', type=click.Choice(['jsonl', 'csv']), default='jsonl',
+              help='Output format. Default: jsonl')
+@click.pass_context
+def export(ctx, since, output_format):
+    """
+    Prints the time entries stored by the provider, for example to import them into other service.
+    Only providers which store the entries locally support it.
+    """
+    records = ctx.obj['provider'].export(since)
+
+    if output_format == 'jsonl':
+        for record in records:
+            click.echo(json.dumps(record))
+        return
+
+    writer = csv.DictWriter(click.get_text_stream('stdout'), fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for record in records:
+        record['tags'] = ','.join(record.get('tags') or ())
+        writer.writerow(record)
 
 
 @cli.command('prompt', short_help='Handles integration to shell\'s prompt')
@@ -287,6 +604,258 @@ def prompt_cmd(activate, deactivate, style):
         prompt.execute(style)
 
 
+@cli.command(short_help='Displays statistics of gitrack\'s invocations')
+@click.option('--repo', '-r', 'repo_filter', help='Only invocations in repos whose path contains this value.')
+@click.option('--prometheus', type=click.Path(dir_okay=False, writable=True),
+              help='Instead of displaying the statistics, export them in Prometheus\' text format into this file, '
+                   'suitable for the node exporter\'s textfile collector.')
+def stats(repo_filter, prometheus):
+    """
+    Displays latency statistics of gitrack's invocations (including the ones from Git's hooks)
+    per command and per repo. Every invocation locally records its duration, provider's calls,
+    number of HTTP requests, retries, time spent waiting for the API's rate limit, peak memory usage
+    and outcome.
+    """
+    samples = metrics.load(config_module.get_data_dir())
+    if repo_filter:
+        samples = [sample for sample in samples if repo_filter in (sample.get('repo') or '')]
+
+    if prometheus:
+        metrics.export_prometheus(samples, pathlib.Path(prometheus))
+        return
+
+    if not samples:
+        click.echo('No invocations recorded yet.')
+        return
+
+    for key, title in (('command', 'Command'), ('repo', 'Repo')):
+        summaries = metrics.summarize(samples, key)
+        width = max(len(title), *(len(name) for name in summaries))
+
+        click.secho('{:<{width}}  {:>6}  {:>6}  {:>8}  {:>8}  {:>8}  {:>9}  {:>7}  {:>9}'.format(
+            title, 'count', 'failed', 'p50', 'p95', 'p99', 'http/inv', 'retries', 'throttled', width=width), bold=True)
+
+        for name, summary in summaries.items():
+            click.echo('{:<{width}}  {:>6}  {:>6}  {:>7.3f}s  {:>7.3f}s  {:>7.3f}s  {:>9.2f}  {:>7}  {:>8.2f}s'.format(
+                name, summary.count, summary.failures, *summary.percentiles,
+                summary.http_requests / summary.count, summary.retries, summary.rate_limit_wait, width=width))
+
+        click.echo()
+
+
+@cli.group('state', short_help='Manages the global state database')
+def state_group():
+    """
+    Group of commands for the global state database, which is enabled with 'state_backend = sqlite'
+    in the global config or with GITRACK_STATE_BACKEND=sqlite environmental variable.
+    """
+    pass
+
+
+@state_group.command('migrate', short_help='Migrates the repos\' state into the state database')
+def state_migrate():
+    """
+    Imports the state of all initialized repos into the global state database. The original files
+    are left untouched, so it is possible to switch back. Repos are also migrated automatically
+    when they are used for the first time with the database enabled.
+    """
+    from gitrack import state
+
+    migrated, unknown = state.migrate_all(state.StateDatabase.get_default())
+
+    for repo_dir in migrated:
+        click.echo('Migrated: {}'.format(repo_dir))
+
+    for folder in unknown:
+        click.secho('Skipped {}: path of its repo could not be determined, it will be migrated when the repo '
+                    'is used next time.'.format(folder), fg='yellow')
+
+    click.echo('Migrated {} repos.'.format(len(migrated)))
+
+
+@state_group.command('list', short_help='Lists the repos in the state database')
+@click.option('--running', '-r', is_flag=True, help='Only repos which are currently tracking.')
+def state_list(running):
+    """
+    Lists the repos in the global state database with their tracking status.
+    """
+    from gitrack import state
+
+    for repo in state.StateDatabase.get_default().repos(running=True if running else None):
+        since = datetime.fromtimestamp(repo.since).strftime('%Y-%m-%d %H:%M') if repo.since else ''
+        click.echo('{:<8} {:<16} {:<8} {}'.format('running' if repo.running else '-', since, repo.provider or '',
+                                                  repo.path))
+
+
+@cli.command(short_help='Synchronizes giTrack\'s state with the providers')
+@click.option('--state', 'sync_state', is_flag=True, help='Fixes repos whose tracking state differs from the '
+                                                          'provider\'s running entry.')
+def sync(sync_state):
+    """
+    Reconciles giTrack's state of all initialized repos with their providers. The running entry is fetched
+    only once for all the repos sharing the provider's account.
+
+    Useful when time entries were started or stopped outside of giTrack, for example in the provider's web UI.
+    """
+    from gitrack import state, sync as sync_module
+
+    if not sync_state:
+        raise click.UsageError('Nothing to synchronize, use \'--state\'.')
+
+    fixes = sync_module.reconcile(state.known_repos())
+
+    for fix in fixes:
+        click.echo('{}: {}'.format(fix.repo_dir, fix.message))
+
+    if not fixes:
+        click.echo('Everything is in sync.')
+
+
+@cli.command(short_help='Streams changes of the repos\' tracking state')
+@click.option('--json', 'as_json', is_flag=True, help='Emits JSON line per event, for editors\' plugins and status bars.')
+@click.option('--heartbeat', type=click.IntRange(min=1), default=60,
+              help='Seconds between heartbeats with the elapsed time of the running repos. Default: 60')
+@click.option('--poll', type=click.FloatRange(min=0.1), help='Polls the status files every given number of seconds, '
+                                                             'instead of watching them with inotify.')
+def watch(as_json, heartbeat, poll):
+    """
+    Prints the tracking state of all the repos and then every change of it, until interrupted.
+    Between the changes heartbeats with the elapsed time of the running repos are printed.
+
+    The state is taken from the repos' status files, so the command sleeps until the tracking starts or stops
+    and never asks the provider.
+    """
+    from gitrack import watch as watch_module
+
+    def emit(event):
+        if as_json:
+            click.echo(json.dumps(event, separators=(',', ':')))
+        elif event['event'] == watch_module.EVENT_HEARTBEAT:
+            for repo in event['running']:
+                click.echo('{}: running for {}'.format(repo['repo'], timedelta(seconds=repo['elapsed'])))
+        elif event['running']:
+            click.echo('{}: running since {}'.format(event['repo'], datetime.fromtimestamp(event['since'])))
+        else:
+            click.echo('{}: stopped'.format(event['repo']))
+
+    try:
+        watch_module.watch(emit, heartbeat=heartbeat, poll_interval=poll)
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        # The consumer went away, Python would fail again when flushing stdout on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+@cli.command(short_help='Estimates the time spent on the repos from their history')
+@click.argument('paths', nargs=-1, type=click.Path(exists=True, file_okay=False, resolve_path=True))
+@click.option('--recursive', '-r', is_flag=True, help='Estimates all the Git repos found in the given directories.')
+@click.option('--period', '-p', type=click.Choice(['day', 'week', 'month', 'total']), default='month',
+              help='Period per which the time is summed. Default: month')
+@click.option('--since', '-s', type=click.DateTime(), help='Only commits made after this day.')
+@click.option('--session-gap', type=click.IntRange(min=1), default=120,
+              help='Minutes between the author\'s commits after which new session starts. Default: 120')
+@click.option('--first-commit', type=click.IntRange(min=0), default=30,
+              help='Minutes counted for the first commit of the session. Default: 30')
+@click.option('--tasks-regex', help='Regex with \'task\' capturing group, which parses the task from the commits\' '
+                                    'messages. By default the repo\'s tasks configuration is used.')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), help='Number of processes. Default: number of CPUs')
+@click.option('--rebuild', is_flag=True, help='Processes whole histories again, instead of only the new commits.')
+@click.option('--format', '-f', 'output_format', type=click.Choice(['table', 'jsonl', 'csv']), default='table',
+              help='Output format. Default: table')
+def estimate(paths, recursive, period, since, session_gap, first_commit, tasks_regex, jobs, rebuild, output_format):
+    """
+    Estimates the time spent on the repos from their Git history, also for the work which was not tracked
+    by giTrack. Without paths the current repo is estimated.
+
+    The author's commits which follow each other within the session gap are considered one session, the time
+    between them is counted together with a fixed time for the session's first commit. The time is summed per
+    author, task (parsed from the commits' messages) and period.
+
+    Results are stored, so the following runs process only the new commits.
+    """
+    from gitrack import estimate as estimate_module
+
+    try:
+        if recursive:
+            repo_dirs = [repo_dir for path in paths for repo_dir in helpers.discover_repos(pathlib.Path(path))]
+        else:
+            repo_dirs = [helpers.get_repo_dir(pathlib.Path(path)) for path in paths] or [helpers.get_repo_dir()]
+    except RuntimeError as e:
+        raise click.UsageError(str(e))
+
+    repos = {repo_dir: estimate_module.get_settings(repo_dir, session_gap, first_commit, tasks_regex)
+             for repo_dir in repo_dirs}
+    authors = estimate_module.estimate(repos, jobs=jobs, rebuild=rebuild)
+    rows = estimate_module.summarize(authors.values(), period, since.date() if since else None)
+
+    if output_format == 'jsonl':
+        for row in rows:
+            click.echo(json.dumps(row._asdict()))
+        return
+
+    if output_format == 'csv':
+        writer = csv.writer(click.get_text_stream('stdout'))
+        writer.writerow(estimate_module.Row._fields)
+        writer.writerows(rows)
+        return
+
+    if not rows:
+        click.echo('No commits found.')
+        return
+
+    author_width = max(len('Author'), *(len(row.author) for row in rows))
+    task_width = max(len('Task'), *(len(row.task or '-') for row in rows))
+
+    click.secho('{:<{aw}}  {:<{tw}}  {:<10}  {:>8}  {:>7}'.format('Author', 'Task', 'Period', 'Hours', 'Commits',
+                                                                 aw=author_width, tw=task_width), bold=True)
+    for row in rows:
+        click.echo('{:<{aw}}  {:<{tw}}  {:<10}  {:>8.2f}  {:>7}'.format(row.author, row.task or '-', row.period,
+                                                                       row.hours, row.commits,
+                                                                       aw=author_width, tw=task_width))
+
+
+@cli.group('profile', short_help='Inspects profiles of previous invocations')
+def profile_group():
+    """
+    Group of commands for inspecting profiles recorded with the '--profile' option
+    or GITRACK_PROFILE=1 environmental variable.
+    """
+    pass
+
+
+@profile_group.command('show', short_help='Summarizes the latest profiled runs')
+@click.option('--limit', '-n', default=5, help='Number of the latest runs to summarize. Default: 5')
+@click.option('--functions', '-f', default=15, help='Number of the most expensive functions displayed for '
+                                                     'the latest run. Default: 15')
+@click.pass_context
+def profile_show(ctx, limit, functions):
+    """
+    Displays per-phase wall-clock breakdown of the latest profiled runs in the current repo
+    and the most expensive functions of the latest one.
+    """
+    runs = profiling.get_runs(ctx.obj['config'].repo_data_dir / 'profiles')
+
+    if not runs:
+        click.echo('No profiles recorded for this repo. Use \'gitrack --profile <command>\' '
+                   'or GITRACK_PROFILE=1 environmental variable.')
+        return
+
+    for run in runs[:limit]:
+        click.secho('{} @ {} - total {:.3f} s'.format(run['command'], run['timestamp'], run['total']), bold=True)
+
+        for name, count, duration in profiling.summarize_phases(run['phases']):
+            if count > 1:
+                name = '{} ({}x)'.format(name, count)
+            click.echo('    {:<60} {:.3f} s'.format(name, duration))
+
+        click.echo()
+
+    if functions:
+        click.secho('The most expensive functions of the latest run:', bold=True)
+        click.echo(profiling.format_stats(runs[0]['path'].with_suffix('.pstats'), functions))
+
+
 cmd_help = """Shell completion for gitrack command
 
 Available shell types:
@@ -295,8 +864,7 @@ Available shell types:
   {}
 
 Default type: auto
-""".format("\n  ".join('{:<12} {}'.format(k, click_completion.core.shells[k]) for k in sorted(
-    click_completion.core.shells.keys())))
+""".format("\n  ".join('{:<12} {}'.format(k, v) for k, v in sorted(completion_module.SHELLS.items())))
 
 
 @cli.group(help=cmd_help, short_help='Shell completion for gitrack command')
@@ -304,11 +872,27 @@ def completion():
     pass
 
 
+def _detect_static_shell(shell):  # type: (typing.Optional[str]) -> str
+    shell = shell or os.path.basename(os.environ.get('SHELL', ''))
+    if shell not in completion_module.STATIC_SHELLS:
+        raise click.UsageError('Static completion is available only for {}, specify the shell.'.format(
+            ', '.join(completion_module.STATIC_SHELLS)))
+
+    return shell
+
+
 @completion.command()
 @click.option('-i', '--case-insensitive/--no-case-insensitive', help="Case insensitive completion")
-@click.argument('shell', required=False, type=click_completion.DocumentedChoice(click_completion.core.shells))
-def show(shell, case_insensitive):
-    """Show the toggl completion code"""
+@click.option('--static', is_flag=True, help="Static completion script, which does not invoke gitrack on Tab press")
+@click.argument('shell', required=False, type=click.Choice(list(completion_module.SHELLS)))
+def show(shell, case_insensitive, static):
+    """Show the gitrack completion code"""
+    if static:
+        shell = _detect_static_shell(shell)
+        click.echo(completion_module.generate(shell, cli))
+        return
+
+    import click_completion
     extra_env = {'_GITRACK_CASE_INSENSITIVE_COMPLETE': 'ON'} if case_insensitive else {}
     click.echo(click_completion.core.get_code(shell, extra_env=extra_env))
 
@@ -316,10 +900,17 @@ def show(shell, case_insensitive):
 @completion.command()
 @click.option('--append/--overwrite', help="Append the completion code to the file", default=None)
 @click.option('-i', '--case-insensitive/--no-case-insensitive', help="Case insensitive completion")
-@click.argument('shell', required=False, type=click_completion.DocumentedChoice(click_completion.core.shells))
+@click.option('--static', is_flag=True, help="Static completion script, which does not invoke gitrack on Tab press")
+@click.argument('shell', required=False, type=click.Choice(list(completion_module.SHELLS)))
 @click.argument('path', required=False)
-def install(append, case_insensitive, shell, path):
-    """Install the toggl completion"""
-    extra_env = {'_GITRACK_CASE_INSENSITIVE_COMPLETE': 'ON'} if case_insensitive else {}
-    shell, path = click_completion.core.install(shell=shell, path=path, append=append, extra_env=extra_env)
+def install(append, case_insensitive, static, shell, path):
+    """Install the gitrack completion"""
+    if static:
+        shell = _detect_static_shell(shell)
+        path = completion_module.install(shell, cli, path)
+    else:
+        import click_completion
+        extra_env = {'_GITRACK_CASE_INSENSITIVE_COMPLETE': 'ON'} if case_insensitive else {}
+        shell, path = click_completion.core.install(shell=shell, path=path, append=append, extra_env=extra_env)
+
     click.echo('%s completion installed in %s' % (shell, path))
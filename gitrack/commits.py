@@ -0,0 +1,206 @@
+"""
+Single-flight processing of the post-commit hooks.
+
+Every commit spawns the post-commit hook in background, so cherry-picks, rebases with --exec or bots committing
+in a loop would start a process per commit, all of them competing for the Store and the provider's API.
+Instead the hooks only append the commit into the repo's queue and the process holding the repo's lock drains it,
+while the others exit right away. All the commits drained together are collapsed into single entry boundary.
+
+Commits which would close a time entry shorter than the 'commit_min_entry_length' are not sent to the provider
+at all. They are deferred in the Store and merged into the next boundary, whose entry is then described by
+the messages of all of them.
+"""
+import collections
+import datetime
+import json
+import logging
+import pathlib
+import time
+import typing
+
+import git
+
+from gitrack import config as config_module, events as events_module, helpers, locking, profiling
+
+logger = logging.getLogger('gitrack.commits')
+
+QUEUE_FILENAME = 'commits.queue'
+LOCK_FILENAME = 'post-commit.lock'
+
+# Guards the queue file, so no commit is appended into it after it was taken for the processing
+QUEUE_LOCK_FILENAME = 'commits.queue.lock'
+
+# Upper limit of the waiting for the end of the commits' burst, so never ending bursts still get processed
+MAX_WAIT = 60
+
+CommitEvent = collections.namedtuple('CommitEvent', ['sha', 'at', 'force'])
+
+# Store's key with the deferred commits, list of [sha, message] pairs
+PENDING_STORE_KEY = 'pending_commits'
+
+
+def enqueue(repo_data_dir, sha, force=False):  # type: (pathlib.Path, str, bool) -> None
+    """
+    Appends the commit into the repo's queue. The hooks append only while holding the queue's lock, which is taken
+    also by the process taking the queue, so the commit never ends up in the queue file after it was already read.
+    """
+    event = CommitEvent(sha, time.time(), force)
+    with locking.locked(repo_data_dir / QUEUE_LOCK_FILENAME):
+        with (repo_data_dir / QUEUE_FILENAME).open('a') as file:
+            file.write(json.dumps(event._asdict(), separators=(',', ':')) + '\n')
+
+
+def _take_queue(queue_file):  # type: (pathlib.Path) -> typing.List[CommitEvent]
+    processing_file = queue_file.with_suffix('.processing')
+
+    # Once the queue is renamed, new commits go into new queue file, so the renamed one can be read without the lock
+    with locking.locked(queue_file.parent / QUEUE_LOCK_FILENAME):
+        try:
+            queue_file.replace(processing_file)
+        except FileNotFoundError:
+            return []
+
+    events = []
+    try:
+        with processing_file.open('r') as file:
+            for line in file:
+                try:
+                    events.append(CommitEvent(**json.loads(line)))
+                except (ValueError, TypeError):  # Partially written line
+                    continue
+    finally:
+        processing_file.unlink()
+
+    return sorted(events, key=lambda event: event.at)
+
+
+def describe(messages):  # type: (typing.List[str]) -> typing.Optional[str]
+    """
+    Description of the time entry closed by several commits: their messages' first lines, the single commit
+    is described by its whole message.
+    """
+    messages = [message.strip() for message in messages if message and message.strip()]
+
+    if len(messages) <= 1:
+        return messages[0] if messages else None
+
+    return '; '.join(message.splitlines()[0] for message in messages)
+
+
+def take_pending(store):  # type: (config_module.Store) -> typing.List[typing.List[str]]
+    """
+    Removes the deferred commits from the Store.
+
+    :return: Pairs of the commits' sha and message
+    """
+    pending = store[PENDING_STORE_KEY] or []
+    if pending:
+        store[PENDING_STORE_KEY] = []
+
+    return pending
+
+
+def stop_entry(config, provider, description=None, last_activity=None, **kwargs):
+    # type: (config_module.Config, typing.Any, typing.Optional[str], datetime.datetime, **typing.Any) -> typing.Any
+    """
+    Stops the running time entry outside of the commits (eq. 'gitrack stop' or the autopause), the deferred commits
+    are included into the entry's description. Keyword arguments are passed to the provider's stop().
+
+    :param last_activity: When given, the entry is paused with the provider's pause(), so it ends at this moment
+    """
+    pending = take_pending(config.store)
+    if pending:
+        description = describe([message for _, message in pending] + [description])
+
+    if last_activity is None:
+        reference = provider.stop(description, **kwargs)
+    else:
+        reference = provider.pause(last_activity, description)
+
+    if reference is not None and pending:
+        helpers.record_commit_entry(config.store, pending[-1][0], reference)
+
+    events_module.publish(config, events_module.STOP, description=description, task=kwargs.get('task'),
+                          entry=reference)
+    return reference
+
+
+class CommitProcessor:
+    """
+    Closes the running time entry with the latest of the queued commits and starts new one.
+    """
+
+    def __init__(self, config, provider, repo, window=None, max_wait=None, min_length=None):
+        self.config = config  # type: config_module.Config
+        self.provider = provider
+        self.repo = repo  # type: git.Repo
+        self.window = config.commit_coalesce_window if window is None else window
+        self.min_length = config.commit_min_entry_length if min_length is None else min_length
+        self.max_wait = MAX_WAIT if max_wait is None else max_wait
+
+        self.queue_file = config.repo_data_dir / QUEUE_FILENAME
+        self.lock_file = config.repo_data_dir / LOCK_FILENAME
+
+    def process(self, events):  # type: (typing.List[CommitEvent]) -> None
+        # Other invocations might have changed the state while the queue was being filled
+        self.config.store.load()
+        if not self.config.store['running']:
+            return
+
+        pending = (self.config.store[PENDING_STORE_KEY] or []) \
+            + [[event.sha, self.repo.commit(event.sha).message] for event in events]
+        force = any(event.force for event in events)
+
+        since = self.config.store['since']
+        if not force and since is not None and \
+                (datetime.datetime.now() - since).total_seconds() < self.min_length:
+            logger.info('Time entry is shorter than {}s, deferring {} commits'.format(self.min_length, len(pending)))
+            self.config.store[PENDING_STORE_KEY] = pending
+            self.config.store.save()
+            return
+
+        if len(pending) > 1:
+            logger.info('Collapsing {} commits into one time entry'.format(len(pending)))
+
+        commit = self.repo.commit(events[-1].sha)
+        message = describe([message for _, message in pending])
+
+        task = None
+        if self.config.tasks_support:
+            task = helpers.get_task(self.config, self.repo, commit)
+
+        helpers.configure_transport(self.config)
+
+        with profiling.phase('provider.stop'):
+            reference = self.provider.stop(message, task=task, force=force)
+
+        take_pending(self.config.store)
+        if reference is not None:
+            helpers.record_commit_entry(self.config.store, commit.hexsha, reference)
+
+        events_module.publish(self.config, events_module.STOP, description=message, task=task, entry=reference)
+        events_module.publish(self.config, events_module.COMMIT, commits=[sha for sha, _ in pending],
+                              description=message, task=task, entry=reference)
+
+        with profiling.phase('provider.start'):
+            self.provider.start()
+
+        events_module.publish(self.config, events_module.START, project=None)
+
+        self.config.store['since'] = datetime.datetime.now()
+        self.config.store.save()
+
+    def _drain(self):
+        locking.wait_until_quiet(self.queue_file, self.window, self.max_wait)
+        events = _take_queue(self.queue_file)
+
+        if events:
+            self.process(events)
+
+    def run(self):  # type: () -> bool
+        """
+        Drains the repo's queue, unless other process is already doing that.
+
+        :return: True if the queue was drained by this process
+        """
+        return locking.single_flight(self.lock_file, self.queue_file.exists, self._drain)
@@ -0,0 +1,341 @@
+"""
+Static shell completion generated from the click's command tree.
+
+The completion installed by click_completion invokes gitrack on every Tab press, paying for the interpreter's start
+and all of gitrack's imports. The static scripts contain all the commands, options and their choices, so the shell
+completes them on its own. Dynamic values (eq. paths of the initialized repos) are read by the shell from the values
+files in giTrack's data folder, which gitrack refreshes whenever the values change.
+"""
+import collections
+import logging
+import pathlib
+import typing
+
+import click
+
+from gitrack import config as config_module
+
+logger = logging.getLogger('gitrack.completion')
+
+SHELLS = collections.OrderedDict((
+    ('bash', 'Bourne again shell'),
+    ('fish', 'Friendly interactive shell'),
+    ('zsh', 'Z shell'),
+    ('powershell', 'Windows PowerShell'),
+))
+
+STATIC_SHELLS = ('bash', 'fish', 'zsh')
+
+VALUES_FOLDER = 'completion'
+
+# Parameters whose values are read from the values files, keyed by the command's path and the parameter's name
+DYNAMIC_VALUES = {
+    ('stats', 'repo_filter'): 'repos',
+}
+
+# What the shell completes as the parameter's value
+VALUES_NONE = 'none'
+VALUES_CHOICE = 'choice'
+VALUES_FILE = 'file'
+VALUES_DIR = 'dir'
+VALUES_DYNAMIC = 'dynamic'
+
+Parameter = collections.namedtuple('Parameter', ['names', 'takes_value', 'help', 'values', 'choices'])
+Node = collections.namedtuple('Node', ['path', 'help', 'commands', 'options', 'arguments'])
+
+
+def get_values_dir():  # type: () -> pathlib.Path
+    return config_module.get_data_dir() / VALUES_FOLDER
+
+
+def update_values():  # type: () -> None
+    """
+    Refreshes the values files read by the static completion. Nothing is done when the static completion
+    was not installed.
+    """
+    values_dir = get_values_dir()
+    if not values_dir.exists():
+        return
+
+    from gitrack import state
+
+    try:
+        repos = '\n'.join(sorted(str(repo_dir) for repo_dir in state.known_repos()))
+        tmp_file = values_dir / 'repos.tmp'
+        tmp_file.write_text(repos + '\n' if repos else '')
+        tmp_file.replace(values_dir / 'repos')
+    except OSError as e:
+        logger.debug('Completion\'s values could not be updated: {}'.format(e))
+
+
+def _describe_values(path, param):  # type: (str, click.Parameter) -> typing.Tuple[str, typing.List[str]]
+    key = DYNAMIC_VALUES.get((path, param.name))
+    if key is not None:
+        return VALUES_DYNAMIC, [key]
+
+    if isinstance(param.type, click.Choice):
+        return VALUES_CHOICE, list(param.type.choices)
+
+    if isinstance(param.type, click.Path):
+        return (VALUES_FILE if param.type.file_okay else VALUES_DIR), []
+
+    if isinstance(param.type, click.File):
+        return VALUES_FILE, []
+
+    return VALUES_NONE, []
+
+
+def _describe_parameter(path, param):  # type: (str, click.Parameter) -> Parameter
+    values, choices = _describe_values(path, param)
+
+    if isinstance(param, click.Option):
+        takes_value = not param.is_flag and not param.count
+        names = list(param.opts) + list(param.secondary_opts)
+        return Parameter(names, takes_value, param.help or '', values, choices)
+
+    return Parameter([param.name], True, '', values, choices)
+
+
+def walk(command, path=''):  # type: (click.BaseCommand, str) -> typing.Iterator[Node]
+    """
+    Yields all the commands of the tree, with the root command having empty path.
+    """
+    subcommands = collections.OrderedDict()
+    if isinstance(command, click.Group):
+        for name in sorted(command.commands):
+            if not getattr(command.commands[name], 'hidden', False):
+                subcommands[name] = command.commands[name]
+
+    params = [_describe_parameter(path, param) for param in command.params if not getattr(param, 'hidden', False)]
+    options = [param for param in params if param.names[0].startswith('-')]
+    options.append(Parameter(['--help'], False, 'Show this message and exit.', VALUES_NONE, []))
+    arguments = [param for param in params if not param.names[0].startswith('-')]
+
+    yield Node(path, command.get_short_help_str() if path else '',
+               collections.OrderedDict((name, sub.get_short_help_str()) for name, sub in subcommands.items()),
+               options, arguments)
+
+    for name, subcommand in subcommands.items():
+        yield from walk(subcommand, '{} {}'.format(path, name).strip())
+
+
+def _header(shell):  # type: (str) -> str
+    return '# giTrack\'s static completion for {}, generated by \'gitrack completion install --static\'.\n' \
+           '# Regenerate it after upgrading giTrack.\n'.format(shell)
+
+
+def _bash_case(key):  # type: (str) -> str
+    return '"{}"'.format(key)
+
+
+def _bash_values(param):  # type: (Parameter) -> str
+    if param.values == VALUES_CHOICE:
+        return 'COMPREPLY=($(compgen -W "{}" -- "$cur"))'.format(' '.join(param.choices))
+
+    if param.values == VALUES_FILE:
+        return 'compopt -o filenames; COMPREPLY=($(compgen -f -- "$cur"))'
+
+    if param.values == VALUES_DIR:
+        return 'compopt -o filenames; COMPREPLY=($(compgen -d -- "$cur"))'
+
+    if param.values == VALUES_DYNAMIC:
+        return 'local IFS=$\'\\n\'; COMPREPLY=($(compgen -W "$(_gitrack_values {})" -- "$cur"))'.format(
+            param.choices[0])
+
+    return 'COMPREPLY=()'
+
+
+def generate_bash(command, prog_name='gitrack'):  # type: (click.BaseCommand, str) -> str
+    nodes = list(walk(command))
+
+    subcommands = '|'.join(_bash_case('{}|{}'.format(node.path, name)) for node in nodes for name in node.commands)
+
+    option_values = []
+    for node in nodes:
+        for option in node.options:
+            if option.takes_value:
+                option_values.append('        {})\n            {}\n            return ;;'.format(
+                    '|'.join(_bash_case('{}|{}'.format(node.path, name)) for name in option.names),
+                    _bash_values(option)))
+
+    words = []
+    for node in nodes:
+        options = ' '.join(name for option in node.options for name in option.names)
+        words.append('        {})\n            if [[ "$cur" == -* ]]; then\n'
+                     '                COMPREPLY=($(compgen -W "{}" -- "$cur"))\n'
+                     '                return\n            fi'.format(_bash_case(node.path), options))
+
+        if node.commands:
+            words.append('            COMPREPLY=($(compgen -W "{}" -- "$cur")) ;;'.format(' '.join(node.commands)))
+        elif node.arguments and node.arguments[0].values != VALUES_NONE:
+            # Positions of the arguments are not tracked, the first argument is the most useful to complete
+            words.append('            {} ;;'.format(_bash_values(node.arguments[0])))
+        else:
+            words.append('            COMPREPLY=() ;;')
+
+    return _header('bash') + '''
+_gitrack_values() {{
+    local file="${{GITRACK_STORAGE:+$GITRACK_STORAGE/data}}"
+    file="${{file:-{data_dir}}}/{values_folder}/$1"
+    [[ -r "$file" ]] && cat "$file"
+}}
+
+_gitrack_complete() {{
+    local cur="${{COMP_WORDS[COMP_CWORD]}}"
+    local prev="${{COMP_WORDS[COMP_CWORD-1]}}"
+    local path="" i
+
+    for ((i = 1; i < COMP_CWORD; i++)); do
+        case "$path|${{COMP_WORDS[i]}}" in
+            {subcommands})
+                path="${{path:+$path }}${{COMP_WORDS[i]}}" ;;
+        esac
+    done
+
+    case "$path|$prev" in
+{option_values}
+    esac
+
+    case "$path" in
+{words}
+    esac
+}}
+
+complete -F _gitrack_complete {prog_name}
+'''.format(data_dir=config_module.get_data_dir(), values_folder=VALUES_FOLDER, subcommands=subcommands or '""',
+           option_values='\n'.join(option_values), words='\n'.join(words), prog_name=prog_name)
+
+
+def generate_zsh(command, prog_name='gitrack'):  # type: (click.BaseCommand, str) -> str
+    script = generate_bash(command, prog_name)
+    return _header('zsh') + '\nautoload -U +X bashcompinit && bashcompinit\n' + script[len(_header('bash')):]
+
+
+def _fish_quote(text):  # type: (str) -> str
+    return '\'{}\''.format(text.replace('\\', '\\\\').replace('\'', '\\\''))
+
+
+def generate_fish(command, prog_name='gitrack'):  # type: (click.BaseCommand, str) -> str
+    nodes = list(walk(command))
+    subcommands = ' '.join(_fish_quote('{}|{}'.format(node.path, name)) for node in nodes for name in node.commands)
+
+    lines = ['complete -c {} -f'.format(prog_name)]
+    for node in nodes:
+        condition = '-n {}'.format(_fish_quote('test (__gitrack_path) = {}'.format(_fish_quote(node.path))))
+
+        for name, short_help in node.commands.items():
+            lines.append('complete -c {} {} -a {} -d {}'.format(prog_name, condition, _fish_quote(name),
+                                                                _fish_quote(short_help)))
+
+        for option in node.options:
+            line = ['complete -c {} {}'.format(prog_name, condition)]
+            for name in option.names:
+                line.append('-l {}'.format(name[2:]) if name.startswith('--') else '-s {}'.format(name[1:]))
+
+            if option.takes_value:
+                line.append(_fish_values(option))
+
+            if option.help:
+                line.append('-d {}'.format(_fish_quote(option.help)))
+
+            lines.append(' '.join(line))
+
+        if not node.commands and node.arguments and node.arguments[0].values != VALUES_NONE:
+            lines.append('complete -c {} {} {}'.format(prog_name, condition, _fish_values(node.arguments[0])))
+
+    data_dir = config_module.get_data_dir()
+    return _header('fish') + '''
+function __gitrack_path
+    set -l path ''
+    for word in (commandline -opc)[2..-1]
+        switch "$path|$word"
+            case {subcommands}
+                set path (string trim -- "$path $word")
+        end
+    end
+    echo $path
+end
+
+function __gitrack_values
+    set -l data_dir {data_dir}
+    test -n "$GITRACK_STORAGE"; and set data_dir "$GITRACK_STORAGE/data"
+    test -r "$data_dir/{values_folder}/$argv[1]"; and cat "$data_dir/{values_folder}/$argv[1]"
+end
+
+{lines}
+'''.format(subcommands=subcommands or '\'\'', data_dir=_fish_quote(str(data_dir)), values_folder=VALUES_FOLDER,
+           lines='\n'.join(lines))
+
+
+def _fish_values(param):  # type: (Parameter) -> str
+    if param.values == VALUES_CHOICE:
+        return '-x -a {}'.format(_fish_quote(' '.join(param.choices)))
+
+    if param.values == VALUES_FILE:
+        return '-r -F'
+
+    if param.values == VALUES_DIR:
+        return '-x -a \'(__fish_complete_directories)\''
+
+    if param.values == VALUES_DYNAMIC:
+        return '-x -a {}'.format(_fish_quote('(__gitrack_values {})'.format(param.choices[0])))
+
+    return '-x'
+
+
+GENERATORS = {
+    'bash': generate_bash,
+    'fish': generate_fish,
+    'zsh': generate_zsh,
+}
+
+
+def generate(shell, command, prog_name='gitrack'):  # type: (str, click.BaseCommand, str) -> str
+    return GENERATORS[shell](command, prog_name)
+
+
+# Files sourcing the static completion script, the fish loads it from its completions folder on its own
+RC_FILES = {
+    'bash': '~/.bash_completion',
+    'zsh': '~/.zshrc',
+}
+
+FISH_COMPLETIONS_FILE = '~/.config/fish/completions/gitrack.fish'
+
+
+def install(shell, command, path=None):  # type: (str, click.BaseCommand, typing.Optional[str]) -> pathlib.Path
+    """
+    Writes the static completion script and the values files. Unless the path of the script is specified,
+    the script is placed into giTrack's data folder and sourced from the shell's RC file, so regenerating
+    it does not touch the RC file again.
+
+    :return: Path of the written script
+    """
+    values_dir = get_values_dir()
+    values_dir.mkdir(parents=True, exist_ok=True)
+    update_values()
+
+    if path is not None:
+        script_path = pathlib.Path(path).expanduser()
+    elif shell == 'fish':
+        script_path = pathlib.Path(FISH_COMPLETIONS_FILE).expanduser()
+    else:
+        script_path = values_dir / 'gitrack.{}'.format(shell)
+
+    script_path.parent.mkdir(parents=True, exist_ok=True)
+    script_path.write_text(generate(shell, command))
+
+    if path is None and shell in RC_FILES:
+        rc_file = pathlib.Path(RC_FILES[shell]).expanduser()
+        source_line = 'source \'{}\''.format(script_path)
+
+        try:
+            rc_content = rc_file.read_text()
+        except FileNotFoundError:
+            rc_content = ''
+
+        if source_line not in rc_content.splitlines():
+            with rc_file.open('a') as file:
+                file.write('{}# giTrack\'s completion\n{}\n'.format('\n' if rc_content else '', source_line))
+
+    return script_path
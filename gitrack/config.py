@@ -11,7 +11,7 @@ from enum import Enum
 
 import appdirs
 
-from gitrack import exceptions, APP_NAME, LOCAL_CONFIG_NAME, Providers, TaskParsingModes
+from gitrack import exceptions, profiling, APP_NAME, LOCAL_CONFIG_NAME, Providers, TaskParsingModes
 
 IniEntry = namedtuple('IniEntry', ['section', 'type'])
 logger = logging.getLogger('gitrack.config')
@@ -36,9 +36,50 @@ def repo_name(repo_dir):  # type: (pathlib.Path) -> str
     return name[-250:]  # Most of file-systems has restriction on length of filename around 250 chars
 
 
+# File in the repo's data folder with the repo's full path, as several repos can map to the same folder's name
+REPO_DIR_FILENAME = 'repo_dir'
+
+STATE_BACKEND_PICKLE = 'pickle'
+STATE_BACKEND_SQLITE = 'sqlite'
+STATE_BACKEND_ENV_VARIABLE = 'GITRACK_STATE_BACKEND'
+
+
+def get_state_backend():  # type: () -> str
+    """
+    Backend of the repos' state, it can be set only for all repos: either with environmental variable
+    or in the global config.
+    """
+    if os.environ.get(STATE_BACKEND_ENV_VARIABLE):
+        return os.environ[STATE_BACKEND_ENV_VARIABLE]
+
+    global_config = configparser.ConfigParser(interpolation=None)
+    global_config.read((str(Config.get_global_config_file()),))
+    return global_config.get('gitrack', 'state_backend', fallback=Config.state_backend)
+
+
+def _data_folder_owner(path):  # type: (pathlib.Path) -> typing.Optional[str]
+    """
+    :return: Path of the repo the data folder belongs to, None for the folders created by older versions
+    """
+    try:
+        return (path / REPO_DIR_FILENAME).read_text()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
 def is_repo_initialized(repo_dir):  # type: (pathlib.Path) -> bool
     name = repo_name(repo_dir)
     path = get_data_dir() / 'repos' / name
+
+    # Folder of other repo with the same (eq. truncated) name
+    owner = _data_folder_owner(path)
+    if owner is not None and owner != str(repo_dir):
+        return False
+
+    if get_state_backend() == STATE_BACKEND_SQLITE:
+        # The repo's folder is still used for the status file and other data
+        return path.exists() and DatabaseStore.exists(repo_dir)
+
     return path.exists()
 
 
@@ -159,7 +200,7 @@ class StoreConfigSource(ConfigSource):
             super().__setattr__(key, value)
             return
 
-        self._store.data[key] = value
+        self._store[key] = value
 
     def __getattr__(self, item):
         try:
@@ -206,12 +247,47 @@ class Config:
     project_support = False
     tasks_support = False
     update_check = True
+    network_connect_timeout = 3.05
+    network_read_timeout = 10.0
+    network_deadline = 20.0
+    network_retries = 2
+    network_rate_limit = 1.0
+    network_rate_burst = 3
+    state_backend = STATE_BACKEND_PICKLE
+    idle_timeout = 15
+    watcher_max_watches = None
+    commit_coalesce_window = 0.0
+    commit_min_entry_length = 0.0
+    remote_state_ttl = 30
+    events_workers = 4
+    events_timeout = 5.0
+
+    # Options which affect all the repos, so they are read only from the global config
+    GLOBAL_ONLY = ('state_backend',)
 
     INI_MAPPING = {
         'provider': IniEntry('gitrack', Providers),
 
         'update_check': IniEntry('gitrack', bool),
 
+        'network_connect_timeout': IniEntry('gitrack', float),
+        'network_read_timeout': IniEntry('gitrack', float),
+        'network_deadline': IniEntry('gitrack', float),
+        'network_retries': IniEntry('gitrack', int),
+        'network_rate_limit': IniEntry('gitrack', float),
+        'network_rate_burst': IniEntry('gitrack', int),
+
+        'state_backend': IniEntry('gitrack', str),
+
+        'idle_timeout': IniEntry('gitrack', int),
+        'watcher_max_watches': IniEntry('gitrack', int),
+
+        'commit_coalesce_window': IniEntry('gitrack', float),
+        'commit_min_entry_length': IniEntry('gitrack', float),
+        'remote_state_ttl': IniEntry('gitrack', int),
+        'events_workers': IniEntry('gitrack', int),
+        'events_timeout': IniEntry('gitrack', float),
+
         'project_support': IniEntry('gitrack', bool),
         'project': IniEntry('gitrack', str),
 
@@ -236,7 +312,7 @@ class Config:
             setattr(self, key, value)
 
     def _bootstrap_sources(self, repo_dir, primary_source):
-        self._store = Store(self.repo_data_dir / 'data.pickle')
+        self._store = Store.get_for_repo(repo_dir)
 
         self._sources = (
             IniConfigSource(self.get_local_config_file(repo_dir), self.INI_MAPPING),
@@ -244,6 +320,15 @@ class Config:
             IniConfigSource(self.get_global_config_file(), self.INI_MAPPING),
         )
 
+        for option in self.GLOBAL_ONLY:
+            if hasattr(self._sources[0], option):
+                raise exceptions.ConfigException('Option \'{}\' can be set only in the global config, but it is set '
+                                                 'in {}!'.format(option, self.get_local_config_file(repo_dir)))
+
+        # The state database indexes the repos by their provider, which is in the Store only with the Store's
+        # config destination
+        self._store.provider = self.provider
+
         if primary_source == ConfigDestination.STORE:
             self._primary_source = self._sources[1]
         elif primary_source == ConfigDestination.LOCAL_CONFIG:
@@ -255,6 +340,10 @@ class Config:
     def store(self):
         return self._store
 
+    @property
+    def repo_dir(self):
+        return self._repo_dir
+
     @property
     def repo_data_dir(self):
         return get_data_dir() / 'repos' / self._repo_name
@@ -329,8 +418,15 @@ class Store:
 
     It utilize pickle serialization. Serialized file is stored in passed path. The path is by convention bound
     to Git's repo path. (Eq. moving Git repo will brake things)
+
+    Values have to be set through the item assignment, so the Store knows it was modified and has to be saved.
     """
 
+    modified = False
+
+    # Name of the repo's provider, set by Config
+    provider = None
+
     def __init__(self, path):  # type: (pathlib.Path) -> None
         self._path = path
         if not self._path.exists():
@@ -344,32 +440,116 @@ class Store:
 
     def __setitem__(self, key, value):
         self.data[key] = value
+        self.modified = True
 
     def load(self):
-        with self._path.open('rb') as file:
+        with profiling.phase('store load'), self._path.open('rb') as file:
             self.data = pickle.load(file)
             logger.debug("Store loading from this path: {}\nThis data:\n{}".format(self._path, pprint.pformat(self.data)))
 
+        self.modified = False
+
     def save(self):
-        with self._path.open('wb') as file:
+        with profiling.phase('store save'), self._path.open('wb') as file:
             logger.debug("Store saving to this path: {}\nThis data:\n{}".format(self._path, pprint.pformat(self.data)))
             pickle.dump(self.data, file)
 
+        self.modified = False
+
     @classmethod
     def init_repo(cls, repo_dir):
+        """
+        :raises exceptions.GitrackException: When other repo already uses the same data folder
+        """
         name = repo_name(repo_dir)
         path = get_data_dir() / 'repos' / name
+
+        owner = _data_folder_owner(path) or cls._pickled_repo_dir(path)
+        if owner is not None and owner != str(repo_dir):
+            raise exceptions.GitrackException('Repo {} can not be initialized, its data folder {} is already used '
+                                              'by repo {}'.format(repo_dir, path, owner))
+
         path.mkdir(parents=True, exist_ok=True)
-        repo_file = path / 'data.pickle'  # type: pathlib.Path
+        (path / REPO_DIR_FILENAME).write_text(str(repo_dir))
+
+        # The folder's name is lossy, so the repo's path is recorded for the case of migration to the state database
+        data = {'repo_dir': str(repo_dir)}
 
+        if get_state_backend() == STATE_BACKEND_SQLITE:
+            DatabaseStore.init_repo(repo_dir, data)
+            return
+
+        repo_file = path / 'data.pickle'  # type: pathlib.Path
         with repo_file.open('wb') as file:
-            pickle.dump({}, file)
+            pickle.dump(data, file)
+
+    @staticmethod
+    def _pickled_repo_dir(path):  # type: (pathlib.Path) -> typing.Optional[str]
+        try:
+            with (path / 'data.pickle').open('rb') as file:
+                return pickle.load(file).get('repo_dir')
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
 
     @classmethod
     def get_for_repo(cls, repo_dir):
+        if get_state_backend() == STATE_BACKEND_SQLITE:
+            return DatabaseStore(repo_dir)
+
         name = repo_name(repo_dir)
         path = get_data_dir() / 'repos' / name / 'data.pickle'
         return cls(path)
 
     def __str__(self):
         return 'Store({})'.format(self._path)
+
+
+class DatabaseStore(Store):
+    """
+    Store kept in the global state database (see gitrack.state). Repos initialized with the pickle's backend
+    are migrated upon their first use.
+    """
+
+    def __init__(self, repo_dir):  # type: (pathlib.Path) -> None
+        self._repo_dir = repo_dir
+        self._path = self._get_database().path
+        self.data = {}
+        self.load()
+
+    @staticmethod
+    def _get_database():
+        from gitrack import state
+        return state.StateDatabase.get_default()
+
+    @classmethod
+    def exists(cls, repo_dir):  # type: (pathlib.Path) -> bool
+        from gitrack import state
+
+        database = cls._get_database()
+        return database.exists(repo_dir) or state.migrate_repo(database, repo_dir)
+
+    def load(self):
+        with profiling.phase('store load'):
+            data = self._get_database().load(self._repo_dir)
+
+        if data is None:
+            if not self.exists(self._repo_dir):
+                raise exceptions.UninitializedRepoException('Repo has not been initialized!')
+
+            data = self._get_database().load(self._repo_dir)
+
+        self.data = data
+        self.modified = False
+
+    def save(self):
+        with profiling.phase('store save'):
+            self._get_database().save(self._repo_dir, self.data, self.provider)
+
+        self.modified = False
+
+    @classmethod
+    def init_repo(cls, repo_dir, data=None):  # type: (pathlib.Path, typing.Optional[typing.Dict]) -> None
+        cls._get_database().save(repo_dir, data or {'repo_dir': str(repo_dir)})
+
+    def __str__(self):
+        return 'DatabaseStore({})'.format(self._repo_dir)
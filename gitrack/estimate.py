@@ -0,0 +1,451 @@
+"""
+Estimation of the time spent on the repos from their Git history, for the work which was not tracked by giTrack.
+
+Commits of every author are split into sessions: when the author's commit follows the previous one within
+the session gap, the time in between is counted as work, otherwise the commit starts new session and fixed
+amount of time is counted for the work before it. The time is attributed to the task parsed from the commit's
+message and to the commit's day.
+
+Every repo's history is streamed from 'git log' only once and its commits are sent in batches to a pool
+of processes, each of them handling its own share of the authors. The results are stored as a checkpoint
+together with the refs' tips they were computed from, so the following runs process only the commits which
+are not reachable from these tips. Commits which are not reachable anymore (eq. from deleted branches) stay
+counted in the checkpoint, until the estimation is rebuilt.
+"""
+import collections
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import pathlib
+import queue
+import subprocess
+import time
+import typing
+import zlib
+
+from gitrack import config as config_module, exceptions, helpers, TaskParsingModes
+
+logger = logging.getLogger('gitrack.estimate')
+
+CHECKPOINTS_FOLDER = 'estimates'
+CHECKPOINT_VERSION = 2
+
+# Defaults in minutes
+SESSION_GAP = 120
+FIRST_COMMIT = 30
+
+PERIOD_DAY = 'day'
+PERIOD_WEEK = 'week'
+PERIOD_MONTH = 'month'
+PERIOD_TOTAL = 'total'
+PERIODS = (PERIOD_DAY, PERIOD_WEEK, PERIOD_MONTH, PERIOD_TOTAL)
+
+# Parameters of the estimation, gaps are in seconds. tasks_regex and tasks_value have the same meaning
+# as in Config, so helpers.parse_task() can be used with it.
+Settings = collections.namedtuple('Settings', ['session_gap', 'first_commit', 'tasks_regex', 'tasks_value'])
+
+# Work of one of the repos' processes: authors whose CRC32 of e-mail modulo 'shards' equals 'shard'
+ShardJob = collections.namedtuple('ShardJob', ['repo_dir', 'shard', 'shards', 'exclude', 'authors', 'settings'])
+
+Row = collections.namedtuple('Row', ['author', 'task', 'period', 'hours', 'commits'])
+
+# Used with -z, so the commits are separated by NUL and the whole messages can be parsed
+LOG_FORMAT = '%at%n%ae%n%B'
+
+# Number of commits sent to the shard's process at once
+BATCH_SIZE = 1000
+
+# Number of batches which can wait for the shard's process, before the streaming of the history is paused
+QUEUED_BATCHES = 8
+
+
+def get_settings(repo_dir, session_gap=SESSION_GAP, first_commit=FIRST_COMMIT, tasks_regex=None):
+    # type: (pathlib.Path, int, int, typing.Optional[str]) -> Settings
+    """
+    Without explicit regex, the tasks are parsed the same way as for the tracked entries, when the repo
+    is initialized with the tasks' support. Branches of the past commits are not known, so in the dynamic
+    branch mode the commits have no task.
+    """
+    tasks_value = None
+
+    if tasks_regex is None and config_module.is_repo_initialized(repo_dir):
+        config = config_module.Config(repo_dir)
+
+        if config.tasks_support and config.tasks_mode == TaskParsingModes.DYNAMIC_MESSAGE:
+            tasks_regex = config.tasks_regex
+        elif config.tasks_support and config.tasks_mode == TaskParsingModes.STATIC:
+            tasks_value = config.tasks_value
+
+    return Settings(session_gap * 60, first_commit * 60, tasks_regex, tasks_value)
+
+
+def _git(repo_dir, *args):  # type: (str, *str) -> str
+    try:
+        return subprocess.check_output(('git', '-C', repo_dir) + args, universal_newlines=True,
+                                       stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError as e:
+        raise exceptions.GitrackException('Git failed in {}: {}'.format(repo_dir, e.stderr.strip()))
+
+
+def get_tips(repo_dir):  # type: (str) -> typing.List[str]
+    """
+    Commits pointed to by the repo's refs and HEAD, which are the commits 'git log --all' starts from.
+    """
+    tips = set(_git(repo_dir, 'for-each-ref', '--format=%(objectname)').split())
+
+    try:
+        tips.add(_git(repo_dir, 'rev-parse', '--verify', '-q', 'HEAD').strip())
+    except exceptions.GitrackException:  # Unborn branch
+        pass
+
+    return sorted(tips)
+
+
+def _missing_objects(repo_dir, objects):  # type: (str, typing.List[str]) -> bool
+    if not objects:
+        return False
+
+    output = subprocess.run(['git', '-C', repo_dir, 'cat-file', '--batch-check'], input='\n'.join(objects) + '\n',
+                            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return any(line.endswith(' missing') for line in output.splitlines())
+
+
+def _shard(email, shards):  # type: (str, int) -> int
+    # Python's hash() of strings differs among the processes
+    return zlib.crc32(email.encode('utf-8')) % shards
+
+
+def _read_log(repo_dir, exclude=None, authors=None):
+    # type: (str, typing.Optional[typing.List[str]], typing.Optional[typing.Set[str]]) -> typing.Iterator[typing.Tuple]
+    """
+    Streams the history's commits as their timestamp, author's e-mail in lower case and undecoded message.
+
+    :param exclude: Commits whose history is not read
+    :param authors: Reads the whole history of these authors only
+    """
+    command = ['git', '-C', repo_dir, 'log', '--all', '--no-merges', '-z', '--format=' + LOG_FORMAT]
+    if authors is not None:
+        command += ['--fixed-strings', '--regexp-ignore-case'] + \
+            ['--author=<{}>'.format(email) for email in sorted(authors)]
+    elif exclude:
+        command += ['--not'] + exclude
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    remainder = b''
+
+    with process.stdout:
+        for chunk in iter(lambda: process.stdout.read(65536), b''):
+            records = (remainder + chunk).split(b'\0')
+            remainder = records.pop()
+
+            for record in records:
+                try:
+                    timestamp, email, message = record.split(b'\n', 2)
+                    timestamp = int(timestamp)
+                except ValueError:
+                    continue
+
+                email = email.decode('utf-8', 'replace').lower()
+                if authors is None or email in authors:
+                    yield timestamp, email, message
+
+    # Repo without any commits fails, which is fine
+    process.wait()
+
+
+def _collect(commits, batch, settings, tasks):
+    # type: (typing.Dict, typing.Iterable[typing.Tuple[int, str, bytes]], Settings, typing.Dict[str, str]) -> None
+    """
+    Adds timestamps and tasks of the commits into the lists of their authors' commits.
+
+    :param tasks: Interned tasks, the histories have only few of them
+    """
+    for timestamp, email, message in batch:
+        if settings.tasks_value is not None:
+            task = settings.tasks_value
+        elif settings.tasks_regex:
+            # The same way as helpers.get_task() parses the commit's message
+            task = helpers.parse_task(settings, message.decode('utf-8', 'replace').strip())
+        else:
+            task = None
+
+        task = '' if task is None else str(task)
+        commits[email].append((timestamp, tasks.setdefault(task, task)))
+
+
+def add_commits(author, commits, settings):  # type: (typing.Dict, typing.List[typing.Tuple[int, str]], Settings) -> None
+    """
+    Adds the author's commits, sorted by time, into the author's state.
+
+    The state has the timestamp of the author's last commit and the counted seconds and commits per day and task:
+    {'last': 1571234567, 'days': {'2019-10-16': {'ABC-123': [3600, 2]}}}
+    """
+    last = author['last']
+
+    for timestamp, task in commits:
+        if last is not None and timestamp - last <= settings.session_gap:
+            seconds = timestamp - last
+        else:
+            seconds = settings.first_commit
+
+        day = time.strftime('%Y-%m-%d', time.localtime(timestamp))
+        bucket = author['days'].setdefault(day, {}).setdefault(task, [0, 0])
+        bucket[0] += seconds
+        bucket[1] += 1
+        last = timestamp
+
+    author['last'] = last
+
+
+def _new_author():  # type: () -> typing.Dict
+    return {'last': None, 'days': {}}
+
+
+def process_shard(job, commits):
+    # type: (ShardJob, typing.Dict[str, typing.List[typing.Tuple[int, str]]]) -> typing.Dict[str, typing.Dict]
+    """
+    Processes the not yet processed commits of the shard's authors.
+
+    When some of the author's new commits are not newer than the ones already processed (eq. merged branch with
+    old commits or amended last commit, which keeps its time), the sessions are not additive anymore and
+    the author's whole history is processed again.
+
+    :param commits: Timestamps and tasks of the not yet processed commits per author
+    :return: Updated states of the authors who have new commits
+    """
+    outdated = {email for email, author_commits in commits.items()
+                if email in job.authors and min(author_commits)[0] <= job.authors[email]['last']}
+    if outdated:
+        logger.debug('Processing again whole history of {} authors of {}'.format(len(outdated), job.repo_dir))
+        history = collections.defaultdict(list)
+        _collect(history, _read_log(job.repo_dir, authors=outdated), job.settings, {})
+        commits.update(history)
+
+    results = {}
+    for email, author_commits in commits.items():
+        author = _new_author() if email in outdated else job.authors.get(email) or _new_author()
+        add_commits(author, sorted(author_commits), job.settings)
+        results[email] = author
+
+    return results
+
+
+def _shard_worker(inbox, outbox):  # type: (multiprocessing.Queue, multiprocessing.Queue) -> None
+    """
+    Process of one shard: collects the batches of commits of all the repos and then processes them.
+    The repo's first batch comes with its ShardJob, the end is signalled by None.
+    """
+    try:
+        jobs = {}
+        commits = {}
+        tasks = {}
+
+        for repo_dir, job, batch in iter(inbox.get, None):
+            if job is not None:
+                jobs[repo_dir] = job
+                commits[repo_dir] = collections.defaultdict(list)
+
+            _collect(commits[repo_dir], batch, jobs[repo_dir].settings, tasks)
+
+        outbox.put({repo_dir: process_shard(job, commits[repo_dir]) for repo_dir, job in jobs.items()})
+    except BaseException as e:
+        outbox.put(e)
+        raise
+
+
+def _dispatch(repo_jobs, send):
+    # type: (typing.Dict[pathlib.Path, typing.List[ShardJob]], typing.Callable) -> None
+    """
+    Streams the repos' histories and sends their commits in batches to the shards of their authors.
+    """
+    for repo_dir, shard_jobs in repo_jobs.items():
+        shards = len(shard_jobs)
+        batches = [[] for _ in shard_jobs]
+        started = [False] * shards
+
+        def flush(shard):
+            send(shard, repo_dir, None if started[shard] else shard_jobs[shard], batches[shard])
+            batches[shard] = []
+            started[shard] = True
+
+        for commit in _read_log(str(repo_dir), shard_jobs[0].exclude):
+            shard = _shard(commit[1], shards)
+            batches[shard].append(commit)
+
+            if len(batches[shard]) >= BATCH_SIZE:
+                flush(shard)
+
+        for shard in range(shards):
+            if batches[shard]:
+                flush(shard)
+
+
+def _get_checkpoint_file(repo_dir):  # type: (pathlib.Path) -> pathlib.Path
+    return config_module.get_data_dir() / CHECKPOINTS_FOLDER / '{}.json'.format(config_module.repo_name(repo_dir))
+
+
+def load_checkpoint(repo_dir, settings):  # type: (pathlib.Path, Settings) -> typing.Optional[typing.Dict]
+    try:
+        checkpoint = json.loads(_get_checkpoint_file(repo_dir).read_text())
+    except (OSError, ValueError):
+        return None
+
+    if checkpoint.get('version') != CHECKPOINT_VERSION or checkpoint.get('settings') != list(settings):
+        return None
+
+    # History was rewritten and the processed commits were garbage collected
+    if _missing_objects(str(repo_dir), checkpoint['tips']):
+        logger.info('Processed commits of {} are not available anymore, processing whole history'.format(repo_dir))
+        return None
+
+    return checkpoint
+
+
+def save_checkpoint(repo_dir, checkpoint):  # type: (pathlib.Path, typing.Dict) -> None
+    checkpoint_file = _get_checkpoint_file(repo_dir)
+    checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_file = checkpoint_file.with_suffix('.tmp{}'.format(os.getpid()))
+    tmp_file.write_text(json.dumps(checkpoint, separators=(',', ':')))
+    tmp_file.replace(checkpoint_file)
+
+
+def _wait(operation, workers):  # type: (typing.Callable, typing.List[multiprocessing.Process]) -> typing.Any
+    """
+    Retries the blocking queue's operation, until it succeeds or some of the shards' processes dies.
+    """
+    while True:
+        try:
+            return operation()
+        except (queue.Empty, queue.Full):
+            if any(worker.exitcode not in (None, 0) for worker in workers):
+                raise exceptions.GitrackException('Process of the estimation died unexpectedly')
+
+
+def _run_shards(repo_jobs, jobs):
+    # type: (typing.Dict[pathlib.Path, typing.List[ShardJob]], int) -> typing.List[typing.Dict]
+    """
+    :return: Updated authors' states per repo, for every shard
+    """
+    if jobs == 1:
+        commits = collections.defaultdict(lambda: collections.defaultdict(list))
+        tasks = {}
+
+        _dispatch(repo_jobs, lambda shard, repo_dir, job, batch: _collect(commits[repo_dir], batch,
+                                                                           repo_jobs[repo_dir][0].settings, tasks))
+        return [{repo_dir: process_shard(repo_jobs[repo_dir][0], repo_commits)
+                 for repo_dir, repo_commits in commits.items()}]
+
+    inboxes = [multiprocessing.Queue(QUEUED_BATCHES) for _ in range(jobs)]
+    outbox = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_shard_worker, args=(inbox, outbox), daemon=True) for inbox in inboxes]
+
+    for worker in workers:
+        worker.start()
+
+    try:
+        _dispatch(repo_jobs, lambda shard, repo_dir, job, batch: _wait(
+            lambda: inboxes[shard].put((repo_dir, job, batch), timeout=1), workers))
+
+        for inbox in inboxes:
+            _wait(lambda: inbox.put(None, timeout=1), workers)
+
+        results = [_wait(lambda: outbox.get(timeout=1), workers) for _ in workers]
+    except BaseException:
+        for worker in workers:
+            worker.terminate()
+        raise
+
+    for worker in workers:
+        worker.join()
+
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+    return results
+
+
+def estimate(repos, jobs=None, rebuild=False):
+    # type: (typing.Dict[pathlib.Path, Settings], typing.Optional[int], bool) -> typing.Dict[pathlib.Path, typing.Dict]
+    """
+    Brings the repos' checkpoints up to date with their histories.
+
+    :param repos: Repos and the settings of their estimation
+    :param jobs: Number of processes, by default the number of CPUs
+    :param rebuild: Ignore the checkpoints and process whole histories
+    :return: Authors' states (see add_commits()) per repo
+    """
+    jobs = jobs or os.cpu_count() or 1
+    checkpoints = {}
+    repo_jobs = collections.OrderedDict()
+
+    for repo_dir, settings in repos.items():
+        checkpoint = None if rebuild else load_checkpoint(repo_dir, settings)
+        if checkpoint is None:
+            checkpoint = {'version': CHECKPOINT_VERSION, 'settings': list(settings), 'tips': [], 'authors': {}}
+
+        tips = get_tips(str(repo_dir))
+        checkpoints[repo_dir] = (checkpoint, tips)
+
+        if set(tips) <= set(checkpoint['tips']):
+            continue
+
+        repo_jobs[repo_dir] = [
+            ShardJob(str(repo_dir), shard, jobs, checkpoint['tips'],
+                     {email: author for email, author in checkpoint['authors'].items() if _shard(email, jobs) == shard},
+                     settings)
+            for shard in range(jobs)
+        ]
+
+    results = _run_shards(repo_jobs, jobs) if repo_jobs else []
+
+    for shard_results in results:
+        for repo_dir, authors in shard_results.items():
+            checkpoints[repo_dir][0]['authors'].update(authors)
+
+    for repo_dir, (checkpoint, tips) in checkpoints.items():
+        if checkpoint['tips'] != tips:
+            checkpoint['tips'] = tips
+            save_checkpoint(repo_dir, checkpoint)
+
+    return {repo_dir: checkpoint['authors'] for repo_dir, (checkpoint, _) in checkpoints.items()}
+
+
+def _period(day, period):  # type: (str, str) -> str
+    if period == PERIOD_DAY:
+        return day
+
+    if period == PERIOD_MONTH:
+        return day[:7]
+
+    if period == PERIOD_WEEK:
+        year, week, _ = datetime.datetime.strptime(day, '%Y-%m-%d').isocalendar()
+        return '{}-W{:02}'.format(year, week)
+
+    return PERIOD_TOTAL
+
+
+def summarize(authors_per_repo, period=PERIOD_MONTH, since=None):
+    # type: (typing.Iterable[typing.Dict[str, typing.Dict]], str, typing.Optional[datetime.date]) -> typing.List[Row]
+    """
+    Sums the authors' time per task and period over all the repos.
+    """
+    since = since.strftime('%Y-%m-%d') if since is not None else None
+    totals = collections.defaultdict(lambda: [0, 0])
+
+    for authors in authors_per_repo:
+        for email, author in authors.items():
+            for day, tasks in author['days'].items():
+                if since is not None and day < since:
+                    continue
+
+                for task, (seconds, commits) in tasks.items():
+                    total = totals[(email, task, _period(day, period))]
+                    total[0] += seconds
+                    total[1] += commits
+
+    return [Row(email, task or None, period_key, round(seconds / 3600, 2), commits)
+            for (email, task, period_key), (seconds, commits) in sorted(totals.items())]
@@ -0,0 +1,228 @@
+"""
+Pipeline of the tracking's events, to which features not essential for the tracking itself subscribe, so they
+don't add sequential latency to the hooks and commands.
+
+Events are published after the provider was called: 'start', 'stop', 'cancel' and 'commit' for the entry
+boundaries created by commits. The provider itself is still called directly, as the order of its calls matters
+and its failures have to be reported to the user.
+
+Handlers are registered through the 'gitrack.handlers' entry points (see gitrack.plugins). Handler is a callable
+receiving the Event, it can limit the events it receives and its timeout with the subscribe() decorator.
+Handlers run concurrently on a bounded pool of threads, their failures are only logged. The invocation waits
+for the handlers at its end, at most until their timeouts run out. The handlers which did not finish by then
+are abandoned and their threads are replaced in the pool.
+"""
+import atexit
+import collections
+import itertools
+import logging
+import queue
+import threading
+import time
+import typing
+
+from gitrack import metrics, plugins, transport
+
+logger = logging.getLogger('gitrack.events')
+
+START = 'start'
+STOP = 'stop'
+CANCEL = 'cancel'
+COMMIT = 'commit'
+
+# data has the event's details: project for 'start'; description, task and entry (EntryReference or None) for 'stop';
+# commits (list of shas), description, task and entry for 'commit'
+Event = collections.namedtuple('Event', ['name', 'repo_dir', 'at', 'data'])
+
+
+def subscribe(*names, timeout=None):  # type: (*str, typing.Optional[float]) -> typing.Callable
+    """
+    Decorator of event handler.
+
+    :param names: Events the handler receives, all of them when none is given.
+    :param timeout: Seconds after which the handler is abandoned, overrides the 'events_timeout' option.
+    """
+    def decorator(handler):
+        handler.events = frozenset(names) or None
+        handler.timeout = timeout
+        return handler
+
+    return decorator
+
+
+class _Task:
+    __slots__ = ('name', 'handler', 'event', 'deadline', 'limits', 'done', 'failed')
+
+    def __init__(self, name, handler, event, deadline, limits):
+        # type: (str, typing.Callable, Event, float, typing.Dict[str, typing.Any]) -> None
+        self.name = name
+        self.handler = handler
+        self.event = event
+        self.deadline = deadline
+        self.limits = limits
+        self.done = threading.Event()
+        self.failed = False
+
+
+class Pipeline:
+    """
+    Runs the handlers of the published events on at most 'workers' daemon threads, so the abandoned handlers
+    don't prevent the process from exiting. Thread running handler whose timeout ran out is not counted
+    as a worker anymore, it exits once the handler returns.
+    """
+
+    def __init__(self, handlers, workers):  # type: (typing.List[typing.Tuple[str, typing.Callable]], int) -> None
+        self.handlers = handlers
+        self.workers = workers
+
+        self._queue = queue.Queue()  # type: queue.Queue
+        self._threads = []  # type: typing.List[threading.Thread]
+        self._names = itertools.count()
+        self._running = {}  # type: typing.Dict[threading.Thread, _Task]
+        self._pending = set()  # type: typing.Set[_Task]
+        self._lock = threading.Lock()
+
+    def publish(self, event, timeout):  # type: (Event, float) -> None
+        """
+        :param timeout: Seconds from now, in which the handlers without their own timeout have to finish.
+        """
+        # The workers don't inherit the network limits of gitrack.api's calls
+        limits = transport.current_limits()
+
+        for name, handler in self.handlers:
+            events = getattr(handler, 'events', None)
+            if events is not None and event.name not in events:
+                continue
+
+            task = _Task(name, handler, event, time.monotonic() + (getattr(handler, 'timeout', None) or timeout),
+                         limits)
+
+            with self._lock:
+                self._pending.add(task)
+                self._replace_abandoned()
+
+                if len(self._threads) < self.workers:
+                    self._start_worker()
+
+            self._queue.put(task)
+
+    def _start_worker(self):  # type: () -> None
+        thread = threading.Thread(target=self._work, name='gitrack-events-{}'.format(next(self._names)), daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _replace_abandoned(self):  # type: () -> None
+        """
+        Replaces the workers running handlers whose timeout ran out, so the hanging handlers don't block
+        the following events. Has to be called with the lock held.
+        """
+        now = time.monotonic()
+
+        for thread, task in self._running.items():
+            if task.deadline <= now and thread in self._threads:
+                logger.debug('Handler {} of {} event is abandoned'.format(task.name, task.event.name))
+                self._threads.remove(thread)
+                self._start_worker()
+
+    def _fail(self, task):  # type: (_Task) -> bool
+        """
+        Counts the task's failure, but only once as hanging handler can fail also after its timeout ran out.
+
+        :return: True if the failure was not counted yet
+        """
+        with self._lock:
+            if task.failed:
+                return False
+
+            task.failed = True
+
+        metrics.increment('handler_failures')
+        return True
+
+    def _work(self):
+        thread = threading.current_thread()
+
+        while True:
+            task = self._queue.get()
+            remaining = task.deadline - time.monotonic()
+
+            with self._lock:
+                self._running[thread] = task
+
+            try:
+                if remaining <= 0:
+                    logger.debug('Handler {} of {} event was not run, its timeout ran out'.format(task.name,
+                                                                                                task.event.name))
+                else:
+                    # Requests made by the handler are bounded by its timeout, not by the invocation's deadline
+                    with transport.budget(remaining, **task.limits):
+                        task.handler(task.event)
+            except Exception as e:
+                if self._fail(task):
+                    logger.warning('Handler {} of {} event failed: {}'.format(task.name, task.event.name, e))
+                logger.debug('Handler\'s failure', exc_info=True)
+            finally:
+                task.done.set()
+
+                with self._lock:
+                    self._pending.discard(task)
+                    del self._running[thread]
+                    abandoned = thread not in self._threads
+
+            # Abandoned worker was already replaced
+            if abandoned:
+                return
+
+    def drain(self):  # type: () -> None
+        """
+        Waits for the handlers of the published events, each of them at most until its timeout runs out.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, set()
+
+        for task in sorted(pending, key=lambda pending_task: pending_task.deadline):
+            if not task.done.wait(max(0.0, task.deadline - time.monotonic())):
+                if self._fail(task):
+                    logger.warning('Handler {} of {} event did not finish in time'.format(task.name, task.event.name))
+
+                # The handlers queued behind the abandoned one can still make it in time
+                with self._lock:
+                    self._replace_abandoned()
+
+
+_pipeline = None  # type: typing.Optional[Pipeline]
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline(workers):  # type: (int) -> Pipeline
+    """
+    Process-wide pipeline, the handlers are loaded upon the first event.
+
+    :param workers: Size of the worker pool, when the pipeline is created.
+    """
+    global _pipeline
+
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = Pipeline(plugins.load_handlers(), workers)
+
+            # For embedding processes (see gitrack.api), the commands drain the pipeline on their own
+            atexit.register(_pipeline.drain)
+
+        return _pipeline
+
+
+def publish(config, name, **data):  # type: (typing.Any, str, **typing.Any) -> None
+    """
+    Publishes event of the config's repo.
+    """
+    event = Event(name, config.repo_dir, time.time(), data)
+    get_pipeline(config.events_workers).publish(event, config.events_timeout)
+
+
+def drain():  # type: () -> None
+    """
+    Waits for the handlers of the events published so far.
+    """
+    if _pipeline is not None:
+        _pipeline.drain()
@@ -27,6 +27,13 @@ class UninitializedRepoException(GitrackException):
     pass
 
 
+class NotRunningException(GitrackException):
+    """
+    Raised when an action requires running time tracking, but the repo is not tracking.
+    """
+    pass
+
+
 class UnknownShell(GitrackException):
     pass
 
@@ -35,6 +42,27 @@ class PromptException(GitrackException):
     pass
 
 
+class NetworkException(GitrackException):
+    """
+    Raised when a HTTP request could not be performed.
+    """
+    pass
+
+
+class ServiceUnavailable(NetworkException):
+    """
+    Raised when the remote service is known to be down or it did not respond even after retries.
+    """
+    pass
+
+
+class DeadlineExceeded(NetworkException):
+    """
+    Raised when the invocation's time budget for network requests was spent.
+    """
+    pass
+
+
 class ProviderException(GitrackException):
     def __init__(self, provider_name, message, *args, **kwargs):
         self.message = message
@@ -48,3 +76,10 @@ class ProviderException(GitrackException):
 
 class RunningEntry(ProviderException):
     pass
+
+
+class WatcherException(GitrackException):
+    """
+    Raised when watching of the repo's working tree for activity is not possible.
+    """
+    pass
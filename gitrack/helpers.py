@@ -1,16 +1,24 @@
+import collections
+import configparser
 import logging
+import os
 import re
 import shutil
+import subprocess
 import sys
+from concurrent import futures
 
 import git
 import pathlib
 import typing
 import click
 import inquirer
-import requests
 
-from gitrack import exceptions, config, Providers, GITRACK_POST_COMMIT_EXECUTABLE_FILENAME, SUPPORTED_SHELLS, TaskParsingModes, __version__, GITHUB_REPO_NAME
+from gitrack import exceptions, config, transport, providers, Providers, GITRACK_POST_COMMIT_EXECUTABLE_FILENAME, \
+    GITRACK_POST_REWRITE_EXECUTABLE_FILENAME, GITRACK_POST_CHECKOUT_EXECUTABLE_FILENAME, SUPPORTED_SHELLS, \
+    TaskParsingModes, get_version, GITHUB_REPO_NAME
+
+logger = logging.getLogger('gitrack.helpers')
 
 CMD_PATH_PLACEHOLDER = '{{CMD_PATH}}'
 
@@ -20,6 +28,52 @@ SHELLS_COMMANDS = {
     'fish': '\n{} & disown',
 }
 
+# post-rewrite's executable reads the rewritten commits from stdin and goes to background on its own
+POST_REWRITE_SHELLS_COMMANDS = {
+    'bash': '\n{} "$1"',
+    'zsh': '\n{} "$1"',
+    'fish': '\n{} $argv[1]',
+}
+
+# post-checkout's executable passes all the hook's arguments and goes to background on its own
+POST_CHECKOUT_SHELLS_COMMANDS = {
+    'bash': '\n{} "$@"',
+    'zsh': '\n{} "$@"',
+    'fish': '\n{} $argv',
+}
+
+# Git's hook -> (giTrack's executable, its template, commands for appending into existing hook script)
+HOOKS = {
+    'post-commit': (GITRACK_POST_COMMIT_EXECUTABLE_FILENAME, 'post_commit_executable_template.sh', SHELLS_COMMANDS),
+    'post-rewrite': (GITRACK_POST_REWRITE_EXECUTABLE_FILENAME, 'post_rewrite_executable_template.sh',
+                     POST_REWRITE_SHELLS_COMMANDS),
+}
+
+# Hooks installed only on demand
+OPTIONAL_HOOKS = {
+    'post-checkout': (GITRACK_POST_CHECKOUT_EXECUTABLE_FILENAME, 'post_checkout_executable_template.sh',
+                      POST_CHECKOUT_SHELLS_COMMANDS),
+}
+
+GLOBAL_HOOKS_FOLDER = 'hooks'
+GLOBAL_HOOKS_TEMPLATE = 'global_hooks_dispatcher.sh'
+DATA_PATH_PLACEHOLDER = '{{DATA_PATH}}'
+CHECKOUT_HOOK_PLACEHOLDER = '{{CHECKOUT_HOOK}}'
+
+# Hooks the global dispatcher is installed under: the ones giTrack dispatches and the ones which behave the same
+# when they only pass, so the repos' own hooks keep working. Hooks which change Git's behaviour by merely existing
+# (or are run on every index write or ref update) are never installed, see UNSAFE_GIT_HOOKS.
+GIT_HOOKS = (
+    'applypatch-msg', 'pre-applypatch', 'post-applypatch', 'pre-commit', 'pre-merge-commit', 'prepare-commit-msg',
+    'commit-msg', 'post-commit', 'pre-rebase', 'post-checkout', 'post-merge', 'pre-push', 'pre-receive', 'update',
+    'post-receive', 'post-update', 'pre-auto-gc', 'post-rewrite', 'sendemail-validate',
+)
+
+# Installed by older versions, removed when the dispatcher is updated
+UNSAFE_GIT_HOOKS = (
+    'push-to-checkout', 'proc-receive', 'reference-transaction', 'post-index-change', 'fsmonitor-watchman',
+)
+
 ###########################
 # Logging
 
@@ -145,57 +199,200 @@ def _get_scripts_shell(script_file):  # type: (pathlib.Path) -> str
                                       'hook uses shebang that is not known to Gitrack: ' + shebang)
 
 
-def install_hook(repo_dir):  # type: (pathlib.Path) -> None
+def install_hook(repo_dir, checkout_hook=False):  # type: (pathlib.Path, bool) -> None
     """
-    Will automatically install Git's hook post-commit for detecting new commits.
+    Will automatically install Git's hooks post-commit for detecting new commits and post-rewrite for detecting
+    amended or rebased commits. Optionally also post-checkout for switching the time entries between
+    branches' tasks.
 
-    Function detects if post-commit script is already present and if so, it tries to only add the relevant piece
+    Function detects if the hook script is already present and if so, it tries to only add the relevant piece
     for giTrack's need.
 
     It uses absolute paths, so if the repo is moved it will stop work.
 
+    When the repo uses giTrack's global hooks dispatcher, nothing is installed as Git would ignore the hooks anyway.
+
     :param repo_dir:
+    :param checkout_hook: Install also the post-checkout hook
     :return:
     """
+    if is_global_hook_installed(repo_dir):
+        logger.info('The repo uses the global hooks dispatcher, skipping installation of its hooks')
+        return
+
     hooks_dir = repo_dir / '.git' / 'hooks'
 
-    if is_hook_installed(hooks_dir):
-        return
+    hooks = dict(HOOKS)
+    if checkout_hook:
+        hooks.update(OPTIONAL_HOOKS)
 
-    _create_gitrack_post_commit_executable(hooks_dir)
-    path_to_post_commit_executable = str(hooks_dir / GITRACK_POST_COMMIT_EXECUTABLE_FILENAME)
+    for hook, (executable_filename, template, shells_commands) in hooks.items():
+        executable = hooks_dir / executable_filename
+        if executable.exists():
+            continue
 
-    post_commit_file = hooks_dir / 'post-commit'
-    if post_commit_file.exists():
-        shell = _get_scripts_shell(post_commit_file)
+        _create_gitrack_executable(executable, template)
 
-        with post_commit_file.open('a') as f:
-            f.writelines(SHELLS_COMMANDS[shell].format(path_to_post_commit_executable))
-    else:
-        post_commit_file.write_text('#!/usr/bin/env bash\n\n{} &'.format(path_to_post_commit_executable))
-        post_commit_file.chmod(0o740)
+        hook_file = hooks_dir / hook
+        if hook_file.exists():
+            shell = _get_scripts_shell(hook_file)
+
+            with hook_file.open('a') as f:
+                f.writelines(shells_commands[shell].format(str(executable)))
+        else:
+            hook_file.write_text('#!/usr/bin/env bash\n' + shells_commands['bash'].format(str(executable)))
+            hook_file.chmod(0o740)
+
+
+_gitrack_binary = None  # type: typing.Optional[str]
+
+
+def _get_gitrack_binary():  # type: () -> str
+    """
+    Looks up the gitrack's binary on PATH, only once per process as the lookup is relatively slow.
+    """
+    global _gitrack_binary
+
+    if _gitrack_binary is None:
+        _gitrack_binary = shutil.which('gitrack')
 
+        if _gitrack_binary is None:
+            raise RuntimeError('gitrack binary can not be found!')
 
-def _create_gitrack_post_commit_executable(hooks_dir):  # type: (pathlib.Path) -> None
-    gitrack_post_commit_executable = hooks_dir / GITRACK_POST_COMMIT_EXECUTABLE_FILENAME
-    gitrack_binary = shutil.which('gitrack')
+    return _gitrack_binary
 
-    if gitrack_binary is None:
-        raise RuntimeError('gitrack binary can not be found!')
 
-    with (pathlib.Path(__file__).parent / 'scripts' / 'post_commit_executable_template.sh').open('r') as f:
+def _create_gitrack_executable(executable, template_name):  # type: (pathlib.Path, str) -> None
+    gitrack_binary = _get_gitrack_binary()
+
+    with (pathlib.Path(__file__).parent / 'scripts' / template_name).open('r') as f:
         template = f.read().replace(CMD_PATH_PLACEHOLDER, gitrack_binary)
 
-    gitrack_post_commit_executable.write_text(template)
-    gitrack_post_commit_executable.chmod(0o740)
+    executable.write_text(template)
+    executable.chmod(0o740)
+
+
+def get_global_hooks_dir():  # type: () -> pathlib.Path
+    return config.get_data_dir() / GLOBAL_HOOKS_FOLDER
+
+
+def _get_hooks_path(repo_dir=None):  # type: (typing.Optional[pathlib.Path]) -> typing.Optional[str]
+    """
+    :param repo_dir: Returns the core.hooksPath in effect for the repo, when None the global one
+    """
+    command = ['git', 'config', '--global'] if repo_dir is None else ['git', '-C', str(repo_dir), 'config']
+    result = subprocess.run(command + ['--get', 'core.hooksPath'], stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, universal_newlines=True)
+    return result.stdout.strip() or None
+
+
+def is_global_hook_installed(repo_dir=None):  # type: (typing.Optional[pathlib.Path]) -> bool
+    """
+    Detects if giTrack's global hooks dispatcher is set as the core.hooksPath.
+
+    :param repo_dir: Checks whether the repo uses the dispatcher, as it can have its own core.hooksPath
+    """
+    hooks_path = _get_hooks_path(repo_dir)
+    return hooks_path is not None and pathlib.Path(hooks_path).expanduser() == get_global_hooks_dir()
+
+
+def install_global_hook(checkout_hook=False):  # type: (bool) -> None
+    """
+    Installs the dispatcher of Git's hooks into giTrack's data folder and sets it as the global core.hooksPath,
+    instead of installing the hooks into every repo. The dispatcher calls giTrack only in the initialized repos,
+    which it detects by presence of their data folder, and calls the repos' own hooks.
+
+    Running it again updates the dispatcher, eq. with the new location of gitrack's binary.
+
+    :param checkout_hook: Dispatch also the post-checkout hook
+    :raises exceptions.GitrackException: If the global core.hooksPath is already used for other hooks
+    """
+    hooks_path = _get_hooks_path()
+    hooks_dir = get_global_hooks_dir()
+
+    if hooks_path is not None and pathlib.Path(hooks_path).expanduser() != hooks_dir:
+        raise exceptions.GitrackException('Global core.hooksPath is already set to {}, giTrack\'s dispatcher '
+                                          'can not be installed.'.format(hooks_path))
+
+    with (pathlib.Path(__file__).parent / 'scripts' / GLOBAL_HOOKS_TEMPLATE).open('r') as f:
+        template = f.read().replace(CMD_PATH_PLACEHOLDER, _get_gitrack_binary()) \
+            .replace(DATA_PATH_PLACEHOLDER, str(config.get_data_dir())) \
+            .replace(CHECKOUT_HOOK_PLACEHOLDER, '1' if checkout_hook else '0')
+
+    hooks_dir.mkdir(parents=True, exist_ok=True)
+    for hook in GIT_HOOKS:
+        executable = hooks_dir / hook
+        executable.write_text(template)
+        executable.chmod(0o740)
+
+    for hook in UNSAFE_GIT_HOOKS:
+        try:
+            (hooks_dir / hook).unlink()
+        except FileNotFoundError:
+            pass
+
+    subprocess.run(['git', 'config', '--global', 'core.hooksPath', str(hooks_dir)], check=True)
+
+
+def uninstall_global_hook():  # type: () -> None
+    """
+    Removes the global hooks dispatcher. The repos initialized while it was installed have no hooks of their own,
+    for them 'gitrack init --install-hook' has to be run.
+    """
+    if is_global_hook_installed():
+        subprocess.run(['git', 'config', '--global', '--unset', 'core.hooksPath'], check=True)
+
+    shutil.rmtree(str(get_global_hooks_dir()), ignore_errors=True)
+
+
+def get_last_reflog_message(git_dir):  # type: (pathlib.Path) -> typing.Optional[str]
+    """
+    Returns message of the latest HEAD's reflog entry (eq. 'commit (amend): Some message'), which tells which
+    operation created the current commit. Only the end of the reflog is read, as it can be huge.
+    """
+    try:
+        with (git_dir / 'logs' / 'HEAD').open('rb') as file:
+            file.seek(0, 2)
+            file.seek(max(0, file.tell() - 4096))
+            last_line = file.read().rstrip(b'\n').rsplit(b'\n', 1)[-1]
+    except OSError:
+        return None
+
+    _, _, message = last_line.decode('utf-8', errors='replace').partition('\t')
+    return message
+
+
+def is_rewriting_commit(git_dir):  # type: (pathlib.Path) -> bool
+    """
+    Detects if the current commit was created by amending or rebasing, which is handled by the post-rewrite hook.
+    """
+    message = get_last_reflog_message(git_dir) or ''
+    return message.startswith('commit (amend)') or message.startswith('rebase')
+
+
+def is_rewrite_hook_installed(repo_dir, git_dir):  # type: (pathlib.Path, pathlib.Path) -> bool
+    """
+    Detects if giTrack is called on the post-rewrite hook, either installed by giTrack (also through the global
+    dispatcher) or integrated manually. Repos initialized before the hook was introduced don't have it.
+    """
+    hook_file = git_dir / 'hooks' / 'post-rewrite'
+
+    try:
+        if 'gitrack' in hook_file.read_text():
+            return True
+    except (OSError, UnicodeDecodeError):
+        pass
+
+    return is_global_hook_installed(repo_dir)
+
 
 #####################################################################################
 # Initialization
 #####################################################################################
 
 
-def init(repo_dir, config_store_destination, should_install_hook=True,
-         verbose=True):  # type: (pathlib.Path, config.ConfigDestination, bool, bool) -> None
+def init(repo_dir, config_store_destination, should_install_hook=True, verbose=True,
+         checkout_hook=False):  # type: (pathlib.Path, config.ConfigDestination, bool, bool, bool) -> None
     """
     Initialize Git repo defined by repo_dir for usage with giTrack.
 
@@ -203,6 +400,7 @@ def init(repo_dir, config_store_destination, should_install_hook=True,
     :param config_store_destination: Define to which Config's Source will be the bootstrapped configuration stored.
     :param should_install_hook: Define if the automatic installation should happen or not
     :param verbose: How much should the bootstrap be verbose?
+    :param checkout_hook: Install also the post-checkout hook
     :return:
     """
 
@@ -214,7 +412,7 @@ def init(repo_dir, config_store_destination, should_install_hook=True,
         click.secho('Found local .gitrack file. Skipping bootstrap and using its configuration.', fg='yellow')
         config.Store.init_repo(repo_dir)
 
-        should_install_hook and install_hook(repo_dir)
+        should_install_hook and install_hook(repo_dir, checkout_hook)
         return
 
     if verbose:
@@ -233,7 +431,155 @@ def init(repo_dir, config_store_destination, should_install_hook=True,
     gitrack_config.set_providers_config(provider_class.NAME, provider_configuration)
     gitrack_config.persist()
 
-    should_install_hook and install_hook(repo_dir)
+    should_install_hook and install_hook(repo_dir, checkout_hook)
+
+
+BulkInitResult = collections.namedtuple('BulkInitResult', ['repo_dir', 'initialized', 'error'])
+
+# Number of repos initialized in parallel by the bulk initialization
+BULK_INIT_JOBS = 8
+
+
+def discover_repos(root):  # type: (pathlib.Path) -> typing.List[pathlib.Path]
+    """
+    Finds Git repos in the directory tree. The repos' folders are not traversed further, so nested repos
+    (eq. submodules) are not found. Symlinks are not followed.
+    """
+    repos = []
+    queue = collections.deque([str(root)])
+
+    while queue:
+        directory = queue.popleft()
+
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            logger.warning('Directory {} can not be read: {}'.format(directory, e))
+            continue
+
+        if any(entry.name == '.git' for entry in entries):
+            repos.append(pathlib.Path(directory))
+            continue
+
+        queue.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+
+    return sorted(repos)
+
+
+def load_init_template(template):  # type: (pathlib.Path) -> str
+    """
+    Reads the .gitrack file used as the configuration of all the repos initialized by the bulk initialization.
+
+    :raises exceptions.ConfigException: When the template is not valid giTrack's config.
+    """
+    content = template.read_text()
+
+    parser = configparser.ConfigParser(interpolation=None)
+    try:
+        parser.read_string(content, source=str(template))
+    except configparser.Error as e:
+        raise exceptions.ConfigException('Template {} is not valid config: {}'.format(template, e))
+
+    if not parser.has_option('gitrack', 'provider'):
+        raise exceptions.ConfigException('Template {} does not specify the provider!'.format(template))
+
+    # Fails early when the provider is not installed
+    Providers(parser.get('gitrack', 'provider')).klass()
+
+    return content
+
+
+def _prepare_repo(repo_dir, template_content, checkout_hook):  # type: (pathlib.Path, str, bool) -> None
+    """
+    Filesystem part of the repo's bulk initialization, which is safe to run in parallel.
+    Existing local config and hooks are kept.
+    """
+    local_config = config.Config.get_local_config_file(repo_dir)
+    if not local_config.exists():
+        local_config.write_text(template_content)
+
+    (repo_dir / '.git' / 'hooks').mkdir(exist_ok=True)
+    install_hook(repo_dir, checkout_hook)
+
+
+class _TemplateConfig(config.Config):
+    """
+    Config made of the bulk initialization's template and the global config, so the template can be validated
+    before any repo is touched. It is not bound to any repo's Store.
+    """
+
+    def __init__(self, template, repo_dir):  # type: (pathlib.Path, pathlib.Path) -> None
+        self._template = template
+        super().__init__(repo_dir)
+
+    def _bootstrap_sources(self, repo_dir, primary_source):
+        self._store = None
+        self._sources = (
+            config.IniConfigSource(self._template, self.INI_MAPPING),
+            config.IniConfigSource(self.get_global_config_file(), self.INI_MAPPING),
+        )
+        self._primary_source = None
+
+
+def _validate_provider(template, repo_dir):  # type: (pathlib.Path, pathlib.Path) -> None
+    """
+    Makes one authenticated call to the provider configured by the template, so wrong credentials are discovered
+    before any repo is initialized.
+
+    :param repo_dir: Repo on whose behalf the call is made
+    """
+    template_config = _TemplateConfig(template, repo_dir)
+    provider = template_config.provider.klass()(template_config)
+
+    try:
+        provider.is_running()
+    except Exception as e:
+        raise exceptions.ProviderException(template_config.provider.name, 'Validation of the provider\'s '
+                                                                          'configuration failed: {}'.format(e))
+
+
+def init_recursive(root, template, checkout_hook=False, jobs=BULK_INIT_JOBS):
+    # type: (pathlib.Path, pathlib.Path, bool, int) -> typing.List[BulkInitResult]
+    """
+    Initializes all the Git repos in the directory tree with the configuration from the template, without any
+    interaction. Already initialized repos are skipped and so it is safe to run it repeatedly.
+
+    The template is validated and the provider's credentials are checked only once, before any repo is touched.
+    Local configs and hooks are written by pool of workers, while the Stores are initialized from the main
+    thread as the state database's connection can't be shared by the threads.
+
+    :param root: Directory which is searched for the repos
+    :param template: .gitrack file that is copied into the repos that don't have their own
+    :param checkout_hook: Install also the post-checkout hook
+    :param jobs: Number of workers
+    """
+    template_content = load_init_template(template)
+    repos = discover_repos(root)
+
+    # Already initialized repos are left untouched, the template would override their config kept in the Store
+    results = [BulkInitResult(repo_dir, False, None) for repo_dir in repos if config.is_repo_initialized(repo_dir)]
+    repos = [repo_dir for repo_dir in repos if not config.is_repo_initialized(repo_dir)]
+    if not repos:
+        return sorted(results, key=lambda result: result.repo_dir)
+
+    _validate_provider(template, repos[0])
+
+    with futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = {executor.submit(_prepare_repo, repo_dir, template_content, checkout_hook): repo_dir
+                   for repo_dir in repos}
+
+        for future in futures.as_completed(pending):
+            repo_dir = pending[future]
+
+            try:
+                future.result()
+                config.Store.init_repo(repo_dir)
+                results.append(BulkInitResult(repo_dir, True, None))
+            except Exception as e:
+                logger.debug('Initialization of {} failed'.format(repo_dir), exc_info=True)
+                results.append(BulkInitResult(repo_dir, False, e))
+
+    return sorted(results, key=lambda result: result.repo_dir)
 
 
 def print_welcome(repo_path):
@@ -303,11 +649,45 @@ def prompt_configuration():  # type: () -> typing.Dict
 
     return answers
 
+def configure_transport(config):  # type: (config.Config) -> None
+    """
+    Sets the network limits from the configuration. Besides the invocation's start it is called also by long running
+    invocations before talking to the provider, as the invocation's deadline is meant for short-lived processes.
+    """
+    transport.configure(connect_timeout=config.network_connect_timeout, read_timeout=config.network_read_timeout,
+                        deadline=config.network_deadline, retries=config.network_retries,
+                        rate_limit=config.network_rate_limit, rate_burst=config.network_rate_burst)
+
+
+def network_budget(config):  # type: (config.Config) -> typing.ContextManager[None]
+    """
+    Applies the network limits from the configuration only to the requests of the current thread, for processes
+    calling several repos, which can have different limits (see gitrack.api).
+    """
+    return transport.budget(config.network_deadline, connect_timeout=config.network_connect_timeout,
+                            read_timeout=config.network_read_timeout, retries=config.network_retries,
+                            rate_limit=config.network_rate_limit, rate_burst=config.network_rate_burst)
+
+
 #####################################################################################
 # Task/Projects
 #####################################################################################
 
 
+def get_project(config):  # type: (config.Config) -> typing.Union[str, int, None]
+    """
+    Returns project's ID or name that should be assigned to the new time entries, or None if Project's support
+    is not enabled.
+    """
+    if not config.project_support:
+        return None
+
+    try:
+        return int(config.project)
+    except ValueError:
+        return config.project
+
+
 def _parse_string(regex, string):
     match = re.search(regex, string)
 
@@ -317,55 +697,153 @@ def _parse_string(regex, string):
     return match.group('task')
 
 
-def get_task(config, repo):  # type: (config.Config, git.Repo) -> typing.Union[str, int]
+def get_task(config, repo, commit=None):  # type: (config.Config, git.Repo, typing.Optional[git.Commit]) -> typing.Union[str, int]
     """
     For given repository parse task identificator.
 
     Three modes are supported: static, dynamic message and dynamic branch.
     Static mode will always return value that was defined by user during configuration bootstrap.
-    Dynamic message will parse the last commit's message.
+    Dynamic message will parse the commit's message.
     Dynamic branch will parse the current branch name.
 
     :param config:
     :param repo:
+    :param commit: Commit whose message is parsed, the last commit if not specified
     :return:
     """
     if config.tasks_mode == TaskParsingModes.STATIC:
         return config.tasks_value
 
     if config.tasks_mode == TaskParsingModes.DYNAMIC_MESSAGE:
-        text_to_parse = repo.head.commit.message.strip()
+        text_to_parse = (commit or repo.head.commit).message.strip()
     elif config.tasks_mode == TaskParsingModes.DYNAMIC_BRANCH:
         text_to_parse = repo.active_branch.name
     else:
         raise exceptions.GitrackException('Unkown Task\'s mode: ' + config.tasks_mode)
 
-    task = _parse_string(config.tasks_regex, text_to_parse)
+    return parse_task(config, text_to_parse)
+
+
+def parse_task(config, text):  # type: (config.Config, str) -> typing.Union[str, int, None]
+    """
+    Parses task identificator from the text (commit's message or branch's name) using the configured regex.
+    """
+    task = _parse_string(config.tasks_regex, text)
 
     try:
         return int(task)
-    except ValueError:
+    except (TypeError, ValueError):
         return task
 
+#####################################################################################
+# Rewritten commits
+#####################################################################################
+
+COMMIT_ENTRIES_STORE_KEY = 'commit_entries'
+MAX_COMMIT_ENTRIES = 1000
+
+# Entries whose gap is smaller than this number of seconds are considered consecutive and they can be merged
+CONTIGUOUS_ENTRIES_GAP = 60
+
+
+def record_commit_entry(store, sha, reference):  # type: (config.Store, str, providers.EntryReference) -> None
+    """
+    Remembers which time entry was closed by the commit, so it can be updated when the commit is rewritten.
+    Only the latest MAX_COMMIT_ENTRIES commits are remembered.
+    """
+    commit_entries = store[COMMIT_ENTRIES_STORE_KEY] or collections.OrderedDict()
+    commit_entries[sha] = tuple(reference)
+
+    while len(commit_entries) > MAX_COMMIT_ENTRIES:
+        commit_entries.popitem(last=False)
+
+    store[COMMIT_ENTRIES_STORE_KEY] = commit_entries
+
+
+def parse_rewritten_commits(lines):  # type: (typing.Iterable[str]) -> typing.Dict[str, typing.List[str]]
+    """
+    Parses the post-rewrite hook's input, lines in format '<old-sha> <new-sha> [<extra-info>]'.
+
+    :return: Dict of new commit's SHA and list of SHAs of the commits it replaced (more of them when squashed).
+    """
+    rewritten = collections.OrderedDict()
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2:
+            rewritten.setdefault(parts[1], []).append(parts[0])
+
+    return rewritten
+
+
+def _contiguous_runs(references):  # type: (typing.List[providers.EntryReference]) -> typing.List[typing.List]
+    runs = []
+    for reference in sorted(references, key=lambda ref: ref.start):
+        if runs and reference.start - runs[-1][-1].stop <= CONTIGUOUS_ENTRIES_GAP:
+            runs[-1].append(reference)
+        else:
+            runs.append([reference])
+
+    return runs
+
+
+def plan_rewrites(commit_entries, rewritten, get_message):
+    # type: (typing.Dict[str, typing.Tuple], typing.Dict[str, typing.List[str]], typing.Callable[[str], str]) -> typing.List[providers.EntryRewrite]
+    """
+    Computes changes of the time entries for the rewritten commits. The entries get the new commit's message and
+    when more commits were squashed into one, their consecutive entries are merged into one entry.
+    The commit_entries mapping is updated to the new commits.
+
+    :param commit_entries: Mapping of commit's SHA and reference to the entry closed by it
+    :param rewritten: See parse_rewritten_commits()
+    :param get_message: Function returning message of the commit with given SHA
+    """
+    rewrites = []
+
+    for new_sha, old_shas in rewritten.items():
+        references = collections.OrderedDict()
+        for old_sha in old_shas:
+            reference = commit_entries.pop(old_sha, None)
+            if reference is not None:
+                references[reference[0]] = providers.EntryReference(*reference)
+
+        if not references:
+            continue
+
+        message = get_message(new_sha)
+        for run in _contiguous_runs(list(references.values())):
+            entry = providers.EntryReference(run[0].id, run[0].start, max(reference.stop for reference in run))
+            rewrites.append(providers.EntryRewrite(entry, message, run[1:]))
+
+        # The latest entry is the one closed by the new commit
+        commit_entries[new_sha] = tuple(rewrites[-1].entry)
+
+    return rewrites
+
+
 #####################################################################################
 # Version detection
 #####################################################################################
 
 
 def get_latest_version(repo):
-    r = requests.get("https://api.github.com/repos/{}/releases/latest".format(repo))
+    r = transport.request('get', "https://api.github.com/repos/{}/releases/latest".format(repo))
     return r.json().get('tag_name')
 
 
 def check_version():
-    latest_version = get_latest_version(GITHUB_REPO_NAME)
+    try:
+        latest_version = get_latest_version(GITHUB_REPO_NAME)
+    except exceptions.NetworkException as e:
+        logger.debug('Version check skipped: {}'.format(e))
+        return
 
     if latest_version is None:
         return
 
-    if latest_version != __version__:
+    current_version = get_version()
+    if latest_version != current_version:
         click.secho("There is newer version of gitrack available! "
-                    "You are running {}, but there is {}!".format(__version__, latest_version), fg='yellow')
+                    "You are running {}, but there is {}!".format(current_version, latest_version), fg='yellow')
 
 
 
@@ -0,0 +1,125 @@
+"""
+Minimal wrapper around Linux's inotify API using ctypes, so no additional dependency is needed.
+"""
+import collections
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import typing
+
+from gitrack import exceptions
+
+IN_ACCESS = 0x00000001
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+MAX_USER_WATCHES_FILE = '/proc/sys/fs/inotify/max_user_watches'
+
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+_READ_SIZE = 64 * 1024
+
+Event = collections.namedtuple('Event', ['wd', 'mask', 'cookie', 'name'])
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+
+    if _libc is None:
+        if not sys.platform.startswith('linux'):
+            raise exceptions.WatcherException('inotify is available only on Linux!')
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise exceptions.WatcherException('Your libc does not support inotify!')
+
+        _libc = libc
+
+    return _libc
+
+
+def max_user_watches():  # type: () -> typing.Optional[int]
+    """
+    :return: System-wide limit of watches per user or None if it can't be determined.
+    """
+    try:
+        with open(MAX_USER_WATCHES_FILE) as file:
+            return int(file.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+class Inotify:
+    def __init__(self):
+        self._libc = _get_libc()
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path, mask):  # type: (typing.Union[str, os.PathLike], int) -> int
+        """
+        :return: Watch descriptor
+        :raises OSError: For example with errno.ENOSPC when the watches limit is reached
+        """
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(path)), mask)
+
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), str(path))
+
+        return wd
+
+    def rm_watch(self, wd):  # type: (int) -> None
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout=None):  # type: (typing.Optional[float]) -> typing.List[Event]
+        """
+        Waits for events at most timeout seconds (None means forever) and returns all the queued events.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self.fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append(Event(wd, mask, cookie, os.fsdecode(name)))
+
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,79 @@
+"""
+Inter-process locking based on flock(), used to guard giTrack's state files which are shared by all the gitrack
+processes running on the machine (eq. hooks running in the background).
+"""
+import contextlib
+import fcntl
+import os
+import pathlib
+import time
+import typing
+
+
+@contextlib.contextmanager
+def locked(path, blocking=True):  # type: (pathlib.Path, bool) -> typing.Iterator[bool]
+    """
+    Context manager that holds exclusive lock on the lock file for the duration of the block.
+    The lock is released also when the process dies.
+
+    :param path: Path to the lock file, it is created if it does not exist.
+    :param blocking: If False, the block is executed right away even if the lock is held by somebody else.
+    :return: True if the lock was acquired
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o600)
+
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            acquired = True
+        except BlockingIOError:
+            acquired = False
+
+        yield acquired
+    finally:
+        os.close(fd)  # Closing the descriptor releases the lock
+
+
+def single_flight(path, has_work, work):  # type: (pathlib.Path, typing.Callable[[], bool], typing.Callable[[], None]) -> bool
+    """
+    Calls work() as long as has_work() returns True, but only in one process at a time. Other processes return
+    right away, relying on the process holding the lock to do their part of the work too.
+
+    :param path: Path to the lock file
+    :param has_work: Function telling whether there is queued work, it is called also after the lock is released,
+                     as the work queued right before the release would not be done by anybody otherwise.
+    :param work: Function doing the queued work
+    :return: True if the work was done by this process
+    """
+    while True:
+        with locked(path, blocking=False) as acquired:
+            if not acquired:
+                return False
+
+            while has_work():
+                work()
+
+        if not has_work():
+            return True
+
+
+def wait_until_quiet(path, quiet_period, max_wait):  # type: (pathlib.Path, float, float) -> None
+    """
+    Debouncing of the work queued in the file: waits until the file was not modified for quiet_period seconds,
+    but at most max_wait seconds. Returns right away when the file does not exist.
+    """
+    started = time.time()
+
+    while True:
+        try:
+            last_modification = path.stat().st_mtime
+        except FileNotFoundError:
+            return
+
+        now = time.time()
+        remaining = min(last_modification + quiet_period - now, started + max_wait - now)
+        if remaining <= 0:
+            return
+
+        time.sleep(remaining)
@@ -1,9 +1,18 @@
+import time
+_IMPORTS_START = time.perf_counter()
+
 import sys
 
-from gitrack import cli
+from gitrack import cli, profiling
 
 
 def main(args=None):
+    profiling.mark_start(_IMPORTS_START)
+    profiling.record('imports', time.perf_counter() - _IMPORTS_START)
+
+    if profiling.is_requested():
+        profiling.enable()
+
     cli.entrypoint(args or sys.argv[1:])
 
 
@@ -0,0 +1,216 @@
+"""
+Local metrics of giTrack's invocations.
+
+Every invocation (including the ones from Git's hooks, whose output is discarded) appends one compact sample
+into metrics file in giTrack's data folder. The file is trimmed to keep only the latest samples.
+"""
+import collections
+import json
+import logging
+import math
+import os
+import pathlib
+import sys
+import time
+import typing
+
+from gitrack import profiling
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger('gitrack.metrics')
+
+METRICS_FILENAME = 'metrics.jsonl'
+MAX_SAMPLES = 5000
+
+# Rough size of one sample, used to detect when the file needs trimming without reading it
+_APPROXIMATE_SAMPLE_SIZE = 300
+
+PERCENTILES = (50, 95, 99)
+
+_counters = collections.Counter()  # type: typing.Counter[str]
+
+
+def increment(counter, value=1):  # type: (str, float) -> None
+    """
+    Increments counter of the current invocation, eq. 'http_requests', 'retries' or 'rate_limit_wait' (seconds).
+    """
+    _counters[counter] += value
+
+
+def reset():  # type: () -> None
+    _counters.clear()
+
+
+def count_event(event):  # type: (typing.Any) -> None
+    """
+    Built-in event handler (see gitrack.events), which counts the invocation's events.
+    """
+    increment('events')
+
+
+def get_metrics_file(data_dir):  # type: (pathlib.Path) -> pathlib.Path
+    return data_dir / METRICS_FILENAME
+
+
+def _peak_rss():  # type: () -> typing.Optional[int]
+    """
+    :return: Peak resident set size of the current process in kilobytes.
+    """
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss // 1024 if sys.platform == 'darwin' else max_rss  # MacOS reports bytes, Linux kilobytes
+
+
+def build_sample(command, repo_dir, outcome):  # type: (str, typing.Optional[pathlib.Path], str) -> typing.Dict
+    provider_calls = collections.OrderedDict()
+    for name, duration in profiling.get_phases():
+        if name.startswith('provider.'):
+            name = name[len('provider.'):]
+            provider_calls[name] = round(provider_calls.get(name, 0) + duration, 4)
+
+    return {
+        'timestamp': int(time.time()),
+        'command': command,
+        'repo': str(repo_dir) if repo_dir is not None else None,
+        'duration': round(profiling.elapsed(), 4),
+        'provider_calls': provider_calls,
+        'http_requests': _counters['http_requests'],
+        'retries': _counters['retries'],
+        'rate_limit_wait': round(_counters['rate_limit_wait'], 4),
+        'events': _counters['events'],
+        'handler_failures': _counters['handler_failures'],
+        'peak_rss': _peak_rss(),
+        'outcome': outcome,
+    }
+
+
+def record(data_dir, sample):  # type: (pathlib.Path, typing.Dict) -> None
+    """
+    Appends the sample into the metrics file. It is written with single write() call on file opened in append mode,
+    so concurrently running invocations don't mangle each other's samples.
+    """
+    metrics_file = get_metrics_file(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    with metrics_file.open('a') as file:
+        file.write(json.dumps(sample, separators=(',', ':')) + '\n')
+
+    if metrics_file.stat().st_size > 2 * MAX_SAMPLES * _APPROXIMATE_SAMPLE_SIZE:
+        trim(metrics_file)
+
+
+def trim(metrics_file, keep=MAX_SAMPLES):  # type: (pathlib.Path, int) -> None
+    """
+    Keeps only the latest samples in the metrics file.
+    Samples appended by other processes while trimming might be lost, which is acceptable for metrics.
+    """
+    lines = metrics_file.read_text().splitlines(True)[-keep:]
+
+    tmp_file = metrics_file.with_suffix('.tmp{}'.format(os.getpid()))
+    tmp_file.write_text(''.join(lines))
+    tmp_file.replace(metrics_file)
+
+
+def load(data_dir):  # type: (pathlib.Path) -> typing.List[typing.Dict]
+    metrics_file = get_metrics_file(data_dir)
+    if not metrics_file.exists():
+        return []
+
+    samples = []
+    with metrics_file.open('r') as file:
+        for line in file:
+            try:
+                samples.append(json.loads(line))
+            except ValueError:  # Partially written line
+                continue
+
+    return samples
+
+
+def percentile(values, percent):  # type: (typing.Sequence[float], float) -> float
+    """
+    Nearest-rank percentile of already sorted values.
+    """
+    if not values:
+        return 0.0
+
+    rank = max(0, math.ceil(percent / 100.0 * len(values)) - 1)
+    return values[rank]
+
+
+Summary = collections.namedtuple('Summary', ['count', 'failures', 'percentiles', 'total', 'http_requests',
+                                             'retries', 'rate_limit_wait', 'handler_failures', 'peak_rss'])
+
+
+def summarize(samples, key):  # type: (typing.Iterable[typing.Dict], str) -> typing.Dict[str, Summary]
+    """
+    Groups the samples by given key ('command' or 'repo') and computes their statistics.
+    """
+    groups = collections.defaultdict(list)
+    for sample in samples:
+        groups[sample.get(key) or '-'].append(sample)
+
+    summaries = collections.OrderedDict()
+    for name in sorted(groups):
+        group = groups[name]
+        durations = sorted(sample['duration'] for sample in group)
+
+        summaries[name] = Summary(
+            count=len(group),
+            failures=sum(1 for sample in group if sample['outcome'] != 'ok'),
+            percentiles=tuple(percentile(durations, percent) for percent in PERCENTILES),
+            total=sum(durations),
+            http_requests=sum(sample.get('http_requests', 0) for sample in group),
+            retries=sum(sample.get('retries', 0) for sample in group),
+            rate_limit_wait=sum(sample.get('rate_limit_wait', 0) for sample in group),
+            handler_failures=sum(sample.get('handler_failures', 0) for sample in group),
+            peak_rss=max(sample.get('peak_rss') or 0 for sample in group),
+        )
+
+    return summaries
+
+
+def _escape_label(value):  # type: (str) -> str
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def export_prometheus(samples, destination):  # type: (typing.List[typing.Dict], pathlib.Path) -> None
+    """
+    Writes the statistics per command in Prometheus' text format, suitable for node exporter's textfile collector.
+    The file is written atomically.
+    """
+    summaries = summarize(samples, 'command')
+    lines = [
+        '# HELP gitrack_command_duration_seconds Wall-clock duration of gitrack invocations.',
+        '# TYPE gitrack_command_duration_seconds summary',
+    ]
+
+    for command, summary in summaries.items():
+        label = 'command="{}"'.format(_escape_label(command))
+        for percent, value in zip(PERCENTILES, summary.percentiles):
+            lines.append('gitrack_command_duration_seconds{{{},quantile="{}"}} {}'.format(label, percent / 100, value))
+        lines.append('gitrack_command_duration_seconds_sum{{{}}} {}'.format(label, summary.total))
+        lines.append('gitrack_command_duration_seconds_count{{{}}} {}'.format(label, summary.count))
+
+    for metric, help_text, attribute in (
+            ('gitrack_command_failures_total', 'Number of failed gitrack invocations.', 'failures'),
+            ('gitrack_http_requests_total', 'Number of HTTP requests made by gitrack.', 'http_requests'),
+            ('gitrack_http_retries_total', 'Number of retried HTTP requests.', 'retries'),
+            ('gitrack_rate_limit_wait_seconds_total', 'Time spent waiting for the API\'s rate limit.',
+             'rate_limit_wait'),
+            ('gitrack_handler_failures_total', 'Number of failed or timed out event handlers.', 'handler_failures'),
+    ):
+        lines.append('# HELP {} {}'.format(metric, help_text))
+        lines.append('# TYPE {} counter'.format(metric))
+        for command, summary in summaries.items():
+            lines.append('{}{{command="{}"}} {}'.format(metric, _escape_label(command), getattr(summary, attribute)))
+
+    tmp_file = destination.with_name('.{}.tmp'.format(destination.name))
+    tmp_file.write_text('\n'.join(lines) + '\n')
+    tmp_file.replace(destination)
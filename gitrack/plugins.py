@@ -0,0 +1,192 @@
+"""
+Registry of providers, which are discovered through the 'gitrack.providers' entry points group, and of the event
+handlers (see gitrack.events), discovered through the 'gitrack.handlers' entry points group.
+
+Scanning the installed distributions for entry points is slow, so the discovered registry is cached in giTrack's
+data folder. The cache is keyed by modification times of the environment's site-packages folders, which change
+whenever a distribution is installed or removed. Provider's module is imported only when the provider is used.
+"""
+import importlib
+import json
+import logging
+import os
+import sys
+import typing
+
+from gitrack import exceptions, config as config_module
+
+logger = logging.getLogger('gitrack.plugins')
+
+ENTRY_POINT_GROUP = 'gitrack.providers'
+CACHE_FILENAME = 'providers.json'
+
+HANDLERS_ENTRY_POINT_GROUP = 'gitrack.handlers'
+HANDLERS_CACHE_FILENAME = 'handlers.json'
+
+# Providers shipped with giTrack, used even when the package's metadata are not available (eq. running from source)
+BUILTIN_PROVIDERS = {
+    'toggl': 'gitrack.providers.toggl:TogglProvider',
+    'local': 'gitrack.providers.local:LocalProvider',
+}
+
+BUILTIN_HANDLERS = {
+    'metrics': 'gitrack.metrics:count_event',
+}
+
+_registry = None  # type: typing.Optional[typing.Dict[str, str]]
+_handlers_registry = None  # type: typing.Optional[typing.Dict[str, str]]
+
+
+def _environment_key():  # type: () -> typing.List[typing.List]
+    key = []
+    for path in sys.path:
+        if os.path.basename(path) in {'site-packages', 'dist-packages'}:
+            try:
+                key.append([path, os.stat(path).st_mtime])
+            except OSError:
+                continue
+
+    return key
+
+
+def _iter_entry_points(group=ENTRY_POINT_GROUP):  # type: (str) -> typing.Iterator[typing.Tuple[str, str]]
+    """
+    :return: Pairs of entry point's name and its target in 'module:attribute' format.
+    """
+    try:
+        from importlib import metadata
+    except ImportError:  # Python < 3.8
+        try:
+            import pkg_resources
+        except ImportError:  # Environment without setuptools (eq. the release's archive), only built-ins are known
+            logger.debug('Entry points can not be discovered, neither importlib.metadata nor pkg_resources '
+                         'is available')
+            return
+
+        for entry_point in pkg_resources.iter_entry_points(group):
+            yield entry_point.name, '{}:{}'.format(entry_point.module_name, '.'.join(entry_point.attrs))
+        return
+
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        entry_points = entry_points.select(group=group)
+    else:  # Python < 3.10
+        entry_points = entry_points.get(group, [])
+
+    for entry_point in entry_points:
+        yield entry_point.name, entry_point.value
+
+
+def discover(group=ENTRY_POINT_GROUP):  # type: (str) -> typing.Dict[str, str]
+    registry = dict(BUILTIN_PROVIDERS if group == ENTRY_POINT_GROUP else BUILTIN_HANDLERS)
+    registry.update(_iter_entry_points(group))
+    return registry
+
+
+def _get_cache_file(group=ENTRY_POINT_GROUP):
+    return config_module.get_data_dir() / (CACHE_FILENAME if group == ENTRY_POINT_GROUP else HANDLERS_CACHE_FILENAME)
+
+
+def _load_registry(group, refresh):  # type: (str, bool) -> typing.Dict[str, str]
+    cache_file = _get_cache_file(group)
+    key = _environment_key()
+
+    if not refresh:
+        try:
+            cached = json.loads(cache_file.read_text())
+            if cached['key'] == key:
+                return cached['registry']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    registry = discover(group)
+
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_suffix('.tmp{}'.format(os.getpid()))
+        tmp_file.write_text(json.dumps({'key': key, 'registry': registry}))
+        tmp_file.replace(cache_file)
+    except OSError as e:
+        logger.debug('Registry of {} could not be cached: {}'.format(group, e))
+
+    return registry
+
+
+def get_registry(refresh=False):  # type: (bool) -> typing.Dict[str, str]
+    """
+    :param refresh: Ignore the cached registry and discover the providers again.
+    :return: Dict of provider's name and its class in 'module:attribute' format.
+    """
+    global _registry
+
+    if _registry is None or refresh:
+        _registry = _load_registry(ENTRY_POINT_GROUP, refresh)
+
+    return _registry
+
+
+def get_handlers_registry(refresh=False):  # type: (bool) -> typing.Dict[str, str]
+    """
+    :param refresh: Ignore the cached registry and discover the handlers again.
+    :return: Dict of handler's name and the handler in 'module:attribute' format.
+    """
+    global _handlers_registry
+
+    if _handlers_registry is None or refresh:
+        _handlers_registry = _load_registry(HANDLERS_ENTRY_POINT_GROUP, refresh)
+
+    return _handlers_registry
+
+
+def _import(target):  # type: (str) -> typing.Any
+    module_name, _, attributes = target.partition(':')
+
+    obj = importlib.import_module(module_name)
+    for attribute in filter(None, attributes.split('.')):
+        obj = getattr(obj, attribute)
+
+    return obj
+
+
+def load_provider(name):  # type: (str) -> type
+    """
+    Imports class of the provider.
+
+    :raises exceptions.ConfigException: When there is no such provider installed.
+    """
+    registry = get_registry()
+
+    if name not in registry:
+        # The cache might be outdated, when the change in the environment was not detected
+        registry = get_registry(refresh=True)
+
+    if name not in registry:
+        raise exceptions.ConfigException('Unknown provider \'{}\'! Available providers: {}'.format(
+            name, ', '.join(sorted(registry))))
+
+    try:
+        return _import(registry[name])
+    except (ImportError, AttributeError):
+        registry = get_registry(refresh=True)
+        if name not in registry:
+            raise exceptions.ConfigException('Provider \'{}\' is not installed anymore!'.format(name))
+
+        return _import(registry[name])
+
+
+def load_handlers():  # type: () -> typing.List[typing.Tuple[str, typing.Callable]]
+    """
+    Imports all the registered event handlers. Handlers which can't be imported are skipped, so broken plugin
+    does not break the tracking.
+
+    :return: Pairs of handler's name and the handler, sorted by the name.
+    """
+    handlers = []
+
+    for name, target in sorted(get_handlers_registry().items()):
+        try:
+            handlers.append((name, _import(target)))
+        except (ImportError, AttributeError) as e:
+            logger.warning('Event handler \'{}\' could not be loaded: {}'.format(name, e))
+
+    return handlers
@@ -0,0 +1,173 @@
+"""
+Instrumentation of giTrack's invocations.
+
+Wall-clock duration of the main phases of every invocation (imports, repo discovery, config load, store I/O,
+provider's requests, version check) is always recorded in-memory, as it is cheap. When profiling is requested
+(`--profile` option or GITRACK_PROFILE=1 environmental variable), also cProfile is enabled and both the pstats dump
+and the phases breakdown are written into the profiles folder.
+"""
+import collections
+import contextlib
+import datetime
+import io
+import json
+import logging
+import os
+import pathlib
+import time
+import typing
+
+logger = logging.getLogger('gitrack.profiling')
+
+PROFILE_ENV_VARIABLE = 'GITRACK_PROFILE'
+MAX_STORED_PROFILES = 20
+
+# Long-running processes (gitrack.api, autopause, watch) never reset the phases, so only the latest ones are kept
+MAX_PHASES = 1000
+
+_phases = collections.deque(maxlen=MAX_PHASES)  # type: typing.Deque[typing.Tuple[str, float]]
+_profiler = None  # type: typing.Optional['cProfile.Profile']
+_started = time.perf_counter()
+
+
+def is_requested():  # type: () -> bool
+    return os.environ.get(PROFILE_ENV_VARIABLE, '') not in {'', '0'}
+
+
+def is_enabled():  # type: () -> bool
+    return _profiler is not None
+
+
+def mark_start(started):  # type: (float) -> None
+    """
+    Sets the perf_counter() value of the moment from which the invocation's total duration is measured.
+    By default it is the moment when this module was imported.
+    """
+    global _started
+    _started = started
+
+
+def elapsed():  # type: () -> float
+    return time.perf_counter() - _started
+
+
+def enable():  # type: () -> None
+    """
+    Starts the cProfile's profiler. It is imported only here, as most of the invocations are not profiled.
+    """
+    global _profiler
+
+    if _profiler is not None:
+        return
+
+    import cProfile
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+
+@contextlib.contextmanager
+def phase(name):  # type: (str) -> typing.Iterator[None]
+    """
+    Context manager that records wall-clock duration of the wrapped block under given name.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, time.perf_counter() - start))
+
+
+def record(name, duration):  # type: (str, float) -> None
+    _phases.append((name, duration))
+
+
+def reset():  # type: () -> None
+    """
+    Clears the recorded phases and sets the start of the next invocation's measurement to now.
+    """
+    global _started
+    _phases.clear()
+    _started = time.perf_counter()
+
+
+def get_phases():  # type: () -> typing.List[typing.Tuple[str, float]]
+    return list(_phases)
+
+
+def dump(directory, command):  # type: (pathlib.Path, str) -> typing.Optional[pathlib.Path]
+    """
+    Stops the profiler and writes its results into the directory. Two files are created for each run:
+    '.pstats' with the cProfile's data and '.json' with the phases breakdown.
+
+    Only MAX_STORED_PROFILES latest runs are kept.
+
+    :return: Path to the written pstats file or None if profiling was not enabled.
+    """
+    global _profiler
+
+    if _profiler is None:
+        return None
+
+    _profiler.disable()
+    total = elapsed()
+
+    directory.mkdir(parents=True, exist_ok=True)
+    now = datetime.datetime.now()
+    base_name = '{}-{}'.format(now.strftime('%Y%m%d-%H%M%S-%f'), command.replace(' ', '_'))
+
+    pstats_file = directory / (base_name + '.pstats')
+    _profiler.dump_stats(str(pstats_file))
+    _profiler = None
+
+    (directory / (base_name + '.json')).write_text(json.dumps({
+        'command': command,
+        'timestamp': now.isoformat(),
+        'total': total,
+        'phases': list(_phases),
+    }))
+    logger.info('Profile written to: {}'.format(pstats_file))
+
+    for stale_run in get_runs(directory)[MAX_STORED_PROFILES:]:
+        stale_run['path'].unlink()
+        stale_run['path'].with_suffix('.pstats').unlink()
+
+    return pstats_file
+
+
+def get_runs(directory):  # type: (pathlib.Path) -> typing.List[typing.Dict]
+    """
+    Returns metadata of the stored runs ordered from the latest one.
+    """
+    if not directory.exists():
+        return []
+
+    runs = []
+    for path in sorted(directory.glob('*.json'), reverse=True):
+        run = json.loads(path.read_text())
+        run['path'] = path
+        runs.append(run)
+
+    return runs
+
+
+def summarize_phases(phases):  # type: (typing.Iterable) -> typing.List[typing.Tuple[str, int, float]]
+    """
+    Aggregates phases with same name, keeps the order of their first occurrence.
+
+    :return: List of tuples (name, count, total duration)
+    """
+    summary = collections.OrderedDict()
+    for name, duration in phases:
+        count, total = summary.get(name, (0, 0.0))
+        summary[name] = (count + 1, total + duration)
+
+    return [(name, count, total) for name, (count, total) in summary.items()]
+
+
+def format_stats(pstats_file, limit):  # type: (pathlib.Path, int) -> str
+    import pstats
+
+    stream = io.StringIO()
+    stats = pstats.Stats(str(pstats_file), stream=stream)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
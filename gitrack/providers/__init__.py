@@ -1,18 +1,33 @@
 import abc
+import collections
 import datetime
 import logging
 import time
 import typing
 
-from gitrack import config as config_module
+from gitrack import exceptions, config as config_module
 
 logger = logging.getLogger('gitrack.provider.abstract')
 
+# Reference to the provider's time entry, start and stop are UNIX timestamps
+EntryReference = collections.namedtuple('EntryReference', ['id', 'start', 'stop'])
+
+# Change of the entry's description, entries in 'merged' should be deleted and the 'entry' should span all of them
+EntryRewrite = collections.namedtuple('EntryRewrite', ['entry', 'description', 'merged'])
+
+# Provider's currently running entry, start is UNIX timestamp. Fields unknown to the provider are None.
+RemoteEntry = collections.namedtuple('RemoteEntry', ['id', 'start', 'description'])
+
+# File in the repo's data folder with the tracking status, read by the shell's prompt integration
+STATUS_FILENAME = 'status'
+
 
 class AbstractProvider(abc.ABC):
 
     support_projects = False
     support_tasks = False
+    support_export = False
+    support_rewrite = False
 
     def __init__(self, config):  # type: (config_module.Config) -> None
         self.config = config
@@ -39,7 +54,33 @@ class AbstractProvider(abc.ABC):
         :return: pathlib.Path
         :rtype: pathlib.Path
         """
-        return self.config.repo_data_dir / 'status'
+        return self.config.repo_data_dir / STATUS_FILENAME
+
+    @property
+    def state_key(self):  # type: () -> typing.Optional[str]
+        """
+        Identifies the account whose running entry is returned by current_entry() (eq. hash of the API token).
+        Repos with the same key share the cached remote state and they are reconciled together with single request.
+        When None, the remote state is not cached.
+        """
+        return None
+
+    def _record_state(self, running):  # type: (bool) -> None
+        """
+        Writes the tracking state of the repo into the Store and into the status file.
+
+        :param running: True when a time entry was started, False when it was ended
+        """
+        self.config.store['running'] = running
+        self.config.store['paused'] = False
+        self.config.store['since'] = datetime.datetime.now() if running else None
+
+        self._status_file.write_text(str(int(time.time())) if running else '')
+
+    def _invalidate_remote_state(self):
+        if self.state_key is not None:
+            from gitrack import sync
+            sync.RemoteStateCache().invalidate(self.state_key)
 
     @abc.abstractmethod
     def is_running(self):  # type: () -> bool
@@ -52,6 +93,15 @@ class AbstractProvider(abc.ABC):
         """
         pass
 
+    def current_entry(self):  # type: () -> typing.Optional[RemoteEntry]
+        """
+        Method for getting the currently running time entry. The default implementation knows only if there is
+        some running entry, providers should override it to supply the entry's details.
+
+        :return: The running entry or None
+        """
+        return RemoteEntry(None, None, None) if self.is_running() else None
+
     @abc.abstractmethod
     def start(self, project=None, force=False):  # type: (typing.Union[str, int], bool) -> None
         """
@@ -66,10 +116,8 @@ class AbstractProvider(abc.ABC):
                         Can be ignored if support_projects==False.
         :return: None
         """
-        self.config.store['running'] = True
-        self.config.store['since'] = datetime.datetime.now()
-
-        self._status_file.write_text(str(int(time.time())))
+        self._record_state(True)
+        self._invalidate_remote_state()
 
     @abc.abstractmethod
     def stop(self, description, task=None,
@@ -84,12 +132,11 @@ class AbstractProvider(abc.ABC):
                      Can be ignored if support_tasks==False.
         :param force: If something prevented to save the current time entry, this parameter should allow user to
                       override any checks and enforce save of the time entry.
-        :return: None
+        :return: Reference to the stopped entry, if the provider supports rewriting of the entries (eq. when the
+                 commits are amended or rebased). Otherwise None.
         """
-        self.config.store['running'] = False
-        self.config.store['since'] = None
-
-        self._status_file.write_text('')
+        self._record_state(False)
+        self._invalidate_remote_state()
         logger.debug('Writing stopped metadata to status file and Store.')
 
     @abc.abstractmethod
@@ -101,8 +148,39 @@ class AbstractProvider(abc.ABC):
 
         :return:
         """
-        self.config.store['running'] = False
-        self.config.store['since'] = None
+        self._record_state(False)
+        self._invalidate_remote_state()
+
+    def pause(self, last_activity, description=None):
+        # type: (datetime.datetime, typing.Optional[str]) -> typing.Optional[EntryReference]
+        """
+        Method called when no activity was detected in the repo for the configured idle time.
+        It should end the currently running time entry at the moment of the last activity, so the idle
+        time is not tracked. The default implementation stops the entry right away.
+
+        :param last_activity: Moment of the last detected activity.
+        :param description: Description of the time entry, eq. messages of the deferred commits.
+        :return: Reference to the paused entry, same as with stop().
+        """
+        return self.stop(description)
 
-        self._status_file.write_text('')
+    def rewrite(self, rewrites):  # type: (typing.List[EntryRewrite]) -> None
+        """
+        Method called when commits were rewritten (eq. amended, rebased or squashed), to update the entries created
+        for them. It is supported only when support_rewrite==True. All the changes are passed at once, so the provider
+        can perform them in batch.
+
+        :param rewrites: Changes of the entries.
+        :return: None
+        """
+        raise exceptions.ProviderException(self.NAME, 'Rewriting of the time entries is not supported!')
+
+    def export(self, since=None):  # type: (typing.Optional[datetime.datetime]) -> typing.Iterator[typing.Dict]
+        """
+        Method returning the stored time entries, supported only when support_export==True.
+
+        :param since: Only entries started after this moment are returned.
+        :return: Dicts with entry's attributes: id, repo, description, project, task, tags, start and stop.
+        """
+        raise exceptions.ProviderException(self.NAME, 'Export of the time entries is not supported!')
 
@@ -0,0 +1,284 @@
+import ast
+import collections
+import datetime
+import json
+import logging
+import pathlib
+import sqlite3
+import time
+import typing
+import uuid
+
+import inquirer
+
+from gitrack import exceptions, config as config_module
+from gitrack.providers import AbstractProvider, EntryReference, RemoteEntry
+
+logger = logging.getLogger('gitrack.provider.local')
+
+LedgerEntry = collections.namedtuple('LedgerEntry', ['id', 'repo', 'description', 'project', 'task', 'tags',
+                                                     'start', 'stop'])
+
+STORAGE_SQLITE = 'sqlite'
+STORAGE_JSONL = 'jsonl'
+
+
+def _to_text(value):  # type: (typing.Any) -> typing.Optional[str]
+    return None if value is None else str(value)
+
+
+class SqliteLedger:
+    """
+    Ledger stored in SQLite database in WAL mode, so readers don't block the writer
+    and concurrently running hooks of different repos don't wait on each other.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS entries (id TEXT PRIMARY KEY, repo TEXT NOT NULL, description TEXT, project TEXT, '
+        'task TEXT, tags TEXT, start REAL NOT NULL, stop REAL)',
+        'CREATE INDEX IF NOT EXISTS entries_running ON entries (repo) WHERE stop IS NULL',
+        'CREATE INDEX IF NOT EXISTS entries_start ON entries (start)',
+    )
+
+    def __init__(self, path):  # type: (pathlib.Path) -> None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # The provider can be used from several threads (see gitrack.api), the calls are serialized by its user
+        self._connection = sqlite3.connect(str(path), timeout=10, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+
+        for statement in self.SCHEMA:
+            self._connection.execute(statement)
+
+    @staticmethod
+    def _to_entry(row):  # type: (typing.Sequence) -> LedgerEntry
+        return LedgerEntry(*row[:5], tags=json.loads(row[5] or '[]'), start=row[6], stop=row[7])
+
+    def current(self, repo):  # type: (str) -> typing.Optional[LedgerEntry]
+        row = self._connection.execute('SELECT * FROM entries WHERE repo = ? AND stop IS NULL', (repo,)).fetchone()
+        return self._to_entry(row) if row is not None else None
+
+    def save(self, entry):  # type: (LedgerEntry) -> None
+        self._connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                 entry[:5] + (json.dumps(entry.tags),) + entry[6:])
+
+    def delete(self, entry):  # type: (LedgerEntry) -> None
+        self._connection.execute('DELETE FROM entries WHERE id = ?', (entry.id,))
+
+    def get(self, entry_id):  # type: (str) -> typing.Optional[LedgerEntry]
+        row = self._connection.execute('SELECT * FROM entries WHERE id = ?', (entry_id,)).fetchone()
+        return self._to_entry(row) if row is not None else None
+
+    def apply(self, saved, deleted):  # type: (typing.List[LedgerEntry], typing.List[LedgerEntry]) -> None
+        """
+        Saves and deletes the entries in single transaction.
+        """
+        with self._connection:
+            self._connection.execute('BEGIN')
+            for entry in saved:
+                self.save(entry)
+            for entry in deleted:
+                self.delete(entry)
+
+    def entries(self, since=None):  # type: (typing.Optional[float]) -> typing.Iterator[LedgerEntry]
+        cursor = self._connection.execute('SELECT * FROM entries WHERE start >= ? ORDER BY start', (since or 0,))
+        return (self._to_entry(row) for row in cursor)
+
+
+class JsonlLedger:
+    """
+    Append-only ledger stored in JSONL file, which is easy to process with other tools.
+
+    Every change appends the complete entry, the latest line of the entry wins. Lines are written with single
+    write() call in append mode, so concurrently running hooks don't mangle each other's lines.
+    """
+
+    def __init__(self, path):  # type: (pathlib.Path) -> None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._path = path
+
+    def _load(self):  # type: () -> typing.Dict[str, LedgerEntry]
+        entries = collections.OrderedDict()
+
+        try:
+            with self._path.open('r') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:  # Partially written line
+                        continue
+
+                    if record.pop('deleted', False):
+                        entries.pop(record['id'], None)
+                    else:
+                        entries[record['id']] = LedgerEntry(**record)
+        except FileNotFoundError:
+            pass
+
+        return entries
+
+    def current(self, repo):  # type: (str) -> typing.Optional[LedgerEntry]
+        for entry in self._load().values():
+            if entry.repo == repo and entry.stop is None:
+                return entry
+
+        return None
+
+    def save(self, entry):  # type: (LedgerEntry) -> None
+        self.apply([entry], [])
+
+    def delete(self, entry):  # type: (LedgerEntry) -> None
+        self.apply([], [entry])
+
+    def get(self, entry_id):  # type: (str) -> typing.Optional[LedgerEntry]
+        return self._load().get(entry_id)
+
+    def apply(self, saved, deleted):  # type: (typing.List[LedgerEntry], typing.List[LedgerEntry]) -> None
+        """
+        Appends all the changes with single write() call.
+        """
+        records = [entry._asdict() for entry in saved] + [{'id': entry.id, 'deleted': True} for entry in deleted]
+        with self._path.open('a') as file:
+            file.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+
+    def entries(self, since=None):  # type: (typing.Optional[float]) -> typing.Iterator[LedgerEntry]
+        return iter(sorted((entry for entry in self._load().values() if entry.start >= (since or 0)),
+                           key=lambda entry: entry.start))
+
+
+LEDGERS = {
+    STORAGE_SQLITE: (SqliteLedger, 'ledger.sqlite'),
+    STORAGE_JSONL: (JsonlLedger, 'ledger.jsonl'),
+}
+
+
+class LocalProvider(AbstractProvider):
+    """
+    Provider which stores the time entries into local ledger, without any network communication.
+    The ledger is common for all the repos.
+    """
+
+    support_projects = True
+    support_tasks = True
+    support_export = True
+    support_rewrite = True
+
+    NAME = 'local'
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.provider_config = self._bootstrap_provider_config()
+        self.ledger = self._bootstrap_ledger()
+        self._repo = str(config.repo_dir)
+
+    def _bootstrap_provider_config(self):
+        provider_config = self.config.get_providers_config(self.NAME)
+
+        if 'tags' in provider_config:
+            provider_config['tags'] = ast.literal_eval(provider_config['tags'])
+
+        return provider_config
+
+    def _bootstrap_ledger(self):
+        storage = self.provider_config.get('storage', STORAGE_SQLITE)
+        if storage not in LEDGERS:
+            raise exceptions.ProviderException(self.NAME, 'Unknown storage \'{}\'! Possible values: {}'.format(
+                storage, ', '.join(sorted(LEDGERS))))
+
+        ledger_class, default_filename = LEDGERS[storage]
+        path = self.provider_config.get('path')
+        path = pathlib.Path(path).expanduser() if path else config_module.get_data_dir() / default_filename
+
+        return ledger_class(path)
+
+    @classmethod
+    def init(cls):
+        storage = inquirer.shortcuts.list_input('Where should be the time entries stored?',
+                                                choices=[STORAGE_SQLITE, STORAGE_JSONL])
+        tags = inquirer.shortcuts.text('Should the giTrack\'s entries be tagged? (tags delimited by \',\')')
+
+        return {
+            'storage': storage,
+            'tags': [tag.strip() for tag in tags.split(',') if tag.strip()],
+        }
+
+    def is_running(self):
+        return self.ledger.current(self._repo) is not None
+
+    def current_entry(self):
+        entry = self.ledger.current(self._repo)
+        return RemoteEntry(entry.id, entry.start, entry.description) if entry is not None else None
+
+    def start(self, project=None, force=False):
+        current = self.ledger.current(self._repo)
+
+        if current is not None:
+            if not force:
+                raise exceptions.RunningEntry(self.NAME, 'There is currently running another '
+                                                         'time entry which would be overridden!')
+
+            self.ledger.save(current._replace(stop=time.time()))
+
+        self.ledger.save(LedgerEntry(
+            id=uuid.uuid4().hex, repo=self._repo, description=None, project=_to_text(project), task=None,
+            tags=self.provider_config.get('tags') or [], start=time.time(), stop=None,
+        ))
+
+        # Have to be last, in case something would break earlier
+        super().start()
+
+    def stop(self, description, task=None, force=False):
+        entry = self.ledger.current(self._repo)
+
+        reference = None
+        if entry is not None:
+            entry = entry._replace(description=description, task=_to_text(task), stop=time.time())
+            self.ledger.save(entry)
+            reference = EntryReference(entry.id, entry.start, entry.stop)
+
+        # Have to be last, in case something would break earlier
+        super().stop(description, task, force)
+        return reference
+
+    def pause(self, last_activity, description=None):
+        entry = self.ledger.current(self._repo)
+
+        reference = None
+        if entry is not None:
+            entry = entry._replace(description=description, stop=max(last_activity.timestamp(), entry.start))
+            self.ledger.save(entry)
+            reference = EntryReference(entry.id, entry.start, entry.stop)
+
+        super().stop(description)
+        return reference
+
+    def cancel(self):
+        entry = self.ledger.current(self._repo)
+
+        if entry is None:
+            return
+
+        self.ledger.delete(entry)
+
+        super().cancel()
+
+    def rewrite(self, rewrites):
+        saved, deleted = [], []
+
+        for rewrite in rewrites:
+            entry = self.ledger.get(rewrite.entry.id)
+            if entry is None:
+                continue
+
+            saved.append(entry._replace(description=rewrite.description, start=rewrite.entry.start,
+                                        stop=rewrite.entry.stop))
+            deleted.extend(filter(None, (self.ledger.get(merged.id) for merged in rewrite.merged)))
+
+        self.ledger.apply(saved, deleted)
+
+    def export(self, since=None):  # type: (typing.Optional[datetime.datetime]) -> typing.Iterator[typing.Dict]
+        for entry in self.ledger.entries(since.timestamp() if since is not None else None):
+            record = entry._asdict()
+            record['start'] = datetime.datetime.fromtimestamp(entry.start).isoformat()
+            record['stop'] = datetime.datetime.fromtimestamp(entry.stop).isoformat() if entry.stop else None
+            yield record
@@ -0,0 +1,146 @@
+"""
+Mirroring of the repo's time entries into several providers, which are configured as comma-separated list
+of the providers' names (eq. 'provider = toggl, local').
+
+The first provider is the primary one. Its entries are mapped to the commits, rewritten when the commits are
+amended or rebased and exported, and its running entry is the one reported by 'gitrack status'. The other providers
+mirror the boundaries of the time entries. Every boundary is dispatched to all the providers concurrently, so
+the hook takes as long as the slowest provider instead of the sum of them. Failure of a mirror is only logged and
+does not affect the other providers, while failure of the primary provider fails the action as a whole.
+
+The tracking state of the repo (the Store's items and the status file) follows only the primary provider, the
+mirrors don't write it. Failed requests of the network providers are retried by gitrack.transport with the caller's
+limits, the local provider is not retried and its failure is only logged as any other mirror's.
+"""
+import logging
+import typing
+from concurrent import futures
+
+from gitrack import exceptions, transport
+from gitrack.providers import AbstractProvider
+
+logger = logging.getLogger('gitrack.provider.multi')
+
+
+class _Mirror:
+    """
+    Mixin for the mirrors' classes. The mirrors run concurrently with the primary provider, so they must not
+    write the repo's tracking state, which is shared with it.
+    """
+
+    def _record_state(self, running):  # type: (bool) -> None
+        pass
+
+
+class MultiProvider(AbstractProvider):
+    """
+    Dispatches the actions to the providers given by PROVIDERS, use bind() to get the class for the configured
+    providers.
+    """
+
+    PROVIDERS = ()  # type: typing.Tuple[type, ...]
+
+    @classmethod
+    def bind(cls, name, provider_classes):  # type: (str, typing.Sequence[type]) -> type
+        primary = provider_classes[0]
+
+        return type(cls.__name__, (cls,), {
+            'NAME': name,
+            'PROVIDERS': tuple(provider_classes),
+            'support_projects': primary.support_projects,
+            'support_tasks': primary.support_tasks,
+            'support_export': primary.support_export,
+            'support_rewrite': primary.support_rewrite,
+        })
+
+    def __init__(self, config):
+        super().__init__(config)
+        primary_class, mirror_classes = self.PROVIDERS[0], self.PROVIDERS[1:]
+        self.providers = [primary_class(config)] + [
+            type(mirror_class.__name__, (_Mirror, mirror_class), {})(config) for mirror_class in mirror_classes
+        ]
+
+    @property
+    def primary(self):  # type: () -> AbstractProvider
+        return self.providers[0]
+
+    @property
+    def mirrors(self):  # type: () -> typing.List[AbstractProvider]
+        return self.providers[1:]
+
+    @classmethod
+    def init(cls):
+        raise exceptions.ConfigException('Several providers can be configured only in the .gitrack file or '
+                                         'in the global config!')
+
+    def _dispatch(self, action, *args, **kwargs):  # type: (str, *typing.Any, **typing.Any) -> typing.Any
+        """
+        Calls the action of all the providers. The mirrors run in threads, while the primary provider runs in
+        the current thread.
+
+        :return: Result of the primary provider's action
+        :raises Exception: Whatever the primary provider raised, once all the mirrors finished
+        """
+        # The threads don't inherit the per-thread deadline and limits of gitrack.api's calls
+        budget = transport.remaining_budget()
+        limits = transport.current_limits()
+
+        def mirror_action(provider):
+            with transport.budget(budget, **limits):
+                return getattr(provider, action)(*args, **kwargs)
+
+        with futures.ThreadPoolExecutor(max_workers=len(self.mirrors)) as executor:
+            tasks = [executor.submit(mirror_action, provider) for provider in self.mirrors]
+
+            try:
+                return getattr(self.primary, action)(*args, **kwargs)
+            except Exception:
+                succeeded = [provider for provider, task in zip(self.mirrors, tasks) if task.exception() is None]
+
+                # The mirrors should not have entries which the primary provider does not have
+                if action == 'start':
+                    for provider in succeeded:
+                        self._rollback(provider)
+
+                raise
+            finally:
+                for provider, task in zip(self.mirrors, tasks):
+                    error = task.exception()
+                    if error is not None:
+                        logger.error('Provider {} failed to {} the time entry: {}'.format(provider.NAME, action, error))
+                        logger.debug('Failure of provider {}'.format(provider.NAME), exc_info=error)
+
+    @staticmethod
+    def _rollback(provider):  # type: (AbstractProvider) -> None
+        try:
+            provider.cancel()
+        except Exception as e:
+            logger.error('Provider {} failed to cancel the time entry: {}'.format(provider.NAME, e))
+
+    @property
+    def state_key(self):
+        return self.primary.state_key
+
+    def is_running(self):
+        return self.primary.is_running()
+
+    def current_entry(self):
+        return self.primary.current_entry()
+
+    def start(self, project=None, force=False):
+        self._dispatch('start', project=project, force=force)
+
+    def stop(self, description, task=None, force=False):
+        return self._dispatch('stop', description, task=task, force=force)
+
+    def cancel(self):
+        self._dispatch('cancel')
+
+    def pause(self, last_activity, description=None):
+        return self._dispatch('pause', last_activity, description)
+
+    def rewrite(self, rewrites):
+        self.primary.rewrite(rewrites)
+
+    def export(self, since=None):
+        return self.primary.export(since)
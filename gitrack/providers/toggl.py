@@ -1,18 +1,112 @@
 import ast
+import contextlib
+import functools
+import hashlib
+import json
 import logging
+import os
+import threading
+import types
+import typing
+from concurrent import futures
 
 import inquirer
-from toggl import api, utils, exceptions as toggl_exceptions
+import pendulum
+from toggl import api, utils, exceptions as toggl_exceptions, toggl as toggl_module
+from toggl.utils import others as toggl_utils
 
-from gitrack import exceptions
-from gitrack.providers import AbstractProvider
+from gitrack import exceptions, transport
+from gitrack.providers import AbstractProvider, EntryReference, EntryRewrite, RemoteEntry
 
 logger = logging.getLogger('gitrack.provider.toggl')
 
+# Toggl's API does not support updating multiple entries with different values in one request,
+# so the requests of rewrite are made concurrently
+REWRITE_CONCURRENCY = 4
+
+# Attribute of togglCli's config with the API's URL of the provider
+API_URL_ATTRIBUTE = 'gitrack_api_url'
+
+
+def _toggl_request(url, method, data, headers, auth):
+    """
+    Replacement of togglCli's function that performs the HTTP calls, so all the Toggl's traffic goes through
+    giTrack's transport layer.
+    """
+    response = transport.request(method, url, data=data, headers=headers, auth=auth)
+
+    if response.status_code >= 300:
+        toggl_utils.handle_error(response)
+
+    return response
+
+
+def _toggl_with_address(url, method, data=None, headers=None, config=None, address=None):
+    """
+    Wrapper of togglCli's API call, which sends the request to the API's URL of the provider owning the config,
+    as processes embedding giTrack can use several Toggl's servers at once.
+    """
+    if address is None:
+        address = getattr(config, API_URL_ATTRIBUTE, None)
+
+    return toggl_utils.toggl(url, method, data=data, headers=headers, config=config, address=address)
+
+
+# togglCli has no settings for the HTTP calls nor for the API's URL per config, so these of its functions are
+# replaced while giTrack calls togglCli and restored afterwards
+_PATCHES = (
+    (toggl_utils, '_toggl_request', _toggl_request),
+    (utils, 'toggl', _toggl_with_address),
+)
+
+_patches_lock = threading.Lock()
+_patches_users = 0
+_originals = []  # type: typing.List[typing.Tuple[types.ModuleType, str, typing.Callable]]
+
+
+@contextlib.contextmanager
+def _patched_toggl():
+    global _patches_users
+
+    with _patches_lock:
+        if _patches_users == 0:
+            for module, name, _ in _PATCHES:
+                if not hasattr(module, name):
+                    message = 'Unsupported version of togglCli, {}.{} is missing!'.format(module.__name__, name)
+                    raise exceptions.ProviderException(TogglProvider.NAME, message)
+
+            for module, name, replacement in _PATCHES:
+                _originals.append((module, name, getattr(module, name)))
+                setattr(module, name, replacement)
+
+        _patches_users += 1
+
+    try:
+        yield
+    finally:
+        with _patches_lock:
+            _patches_users -= 1
+
+            if _patches_users == 0:
+                for module, name, original in _originals:
+                    setattr(module, name, original)
+
+                del _originals[:]
+
+
+def _with_patched_toggl(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _patched_toggl():
+            return func(*args, **kwargs)
+
+    return wrapper
+
 
 class TogglProvider(AbstractProvider):
     support_projects = True
     support_tasks = True
+    support_rewrite = True
 
     NAME = 'toggl'
 
@@ -37,9 +131,18 @@ class TogglProvider(AbstractProvider):
 
         toggl_config.api_token = self.provider_config['api_token']
 
+        # Retries are handled by giTrack's transport layer
+        toggl_config.retries = 1
+
+        # Allows to redirect the API calls for example to the stand-in server used in benchmarks. It is kept per
+        # provider, so the repos using different servers don't send their tokens to each other's server.
+        api_url = os.environ.get('GITRACK_TOGGL_URL') or self.provider_config.get('api_url') or toggl_module.TOGGL_URL
+        setattr(toggl_config, API_URL_ATTRIBUTE, api_url.rstrip('/'))
+
         return toggl_config
 
     @classmethod
+    @_with_patched_toggl
     def init(cls):
         bootstrap = utils.bootstrap.ConfigBootstrap()
         api_token = bootstrap.get_api_token()
@@ -51,15 +154,33 @@ class TogglProvider(AbstractProvider):
             'tags': tags,
         }
 
+    @property
+    def state_key(self):
+        # Only one entry can run per Toggl's account, the token itself is not stored
+        key = '{}\0{}\0{}'.format(self.NAME, getattr(self.toggl_config, API_URL_ATTRIBUTE),
+                                  self.toggl_config.api_token)
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+    @_with_patched_toggl
     def is_running(self):
         current = api.TimeEntry.objects.current(config=self.toggl_config)  # type: api.TimeEntry
         return current is not None
 
+    @_with_patched_toggl
+    def current_entry(self):
+        current = api.TimeEntry.objects.current(config=self.toggl_config)  # type: api.TimeEntry
+
+        if current is None:
+            return None
+
+        return RemoteEntry(current.id, current.start.timestamp(), getattr(current, 'description', None))
+
+    @_with_patched_toggl
     def start(self, project=None, force=False):
         current = api.TimeEntry.objects.current(config=self.toggl_config)  # type: api.TimeEntry
 
         if current:
-            logger.info("Currently running entry: " + getattr(current, 'description', ''))
+            logger.info("Currently running entry: " + (getattr(current, 'description', None) or ''))
             if not force:
                 raise exceptions.RunningEntry(self.NAME, 'There is currently running another '
                                                          'time entry which would be overridden!')
@@ -79,6 +200,7 @@ class TogglProvider(AbstractProvider):
         # Have to be last, in case something would break earlier
         super().start()
 
+    @_with_patched_toggl
     def stop(self, description, task=None, force=False):
         entry = api.TimeEntry.objects.current(config=self.toggl_config)  # type: api.TimeEntry
 
@@ -102,7 +224,54 @@ class TogglProvider(AbstractProvider):
 
         # Have to be last, in case something would break earlier
         super().stop(description, task, force)
+        return EntryReference(entry.id, entry.start.timestamp(), entry.stop.timestamp())
+
+    @_with_patched_toggl
+    def pause(self, last_activity, description=None):
+        entry = api.TimeEntry.objects.current(config=self.toggl_config)  # type: api.TimeEntry
+
+        if entry is None:
+            super().stop(description)
+            return
+
+        if description is not None:
+            entry.description = description
+
+        stop = pendulum.instance(last_activity, tz=pendulum.local_timezone())
+        entry.stop_and_save(stop=max(stop, entry.start))
+
+        super().stop(description)
+        return EntryReference(entry.id, entry.start.timestamp(), entry.stop.timestamp())
+
+    def _update_entry(self, rewrite):  # type: (EntryRewrite) -> None
+        data = {'description': rewrite.description}
+
+        if rewrite.merged:
+            data.update({
+                'start': pendulum.from_timestamp(rewrite.entry.start).to_iso8601_string(),
+                'stop': pendulum.from_timestamp(rewrite.entry.stop).to_iso8601_string(),
+                'duration': int(rewrite.entry.stop - rewrite.entry.start),
+            })
+
+        utils.toggl('/time_entries/{}'.format(rewrite.entry.id), 'put',
+                    data=json.dumps({'time_entry': data}), config=self.toggl_config)
+
+    def _delete_entry(self, entry):  # type: (EntryReference) -> None
+        try:
+            utils.toggl('/time_entries/{}'.format(entry.id), 'delete', config=self.toggl_config)
+        except toggl_exceptions.TogglNotFoundException:
+            pass
+
+    @_with_patched_toggl
+    def rewrite(self, rewrites):
+        with futures.ThreadPoolExecutor(max_workers=REWRITE_CONCURRENCY) as executor:
+            tasks = [executor.submit(self._update_entry, rewrite) for rewrite in rewrites]
+            tasks += [executor.submit(self._delete_entry, merged) for rewrite in rewrites for merged in rewrite.merged]
+
+            for task in futures.as_completed(tasks):
+                task.result()
 
+    @_with_patched_toggl
     def cancel(self):
         entry = api.TimeEntry.objects.current(config=self.toggl_config)  # type: api.TimeEntry
 
@@ -0,0 +1,72 @@
+#!/usr/bin/env bash
+# giTrack's dispatcher of the Git's hooks, installed under the names of the hooks which are safe to chain
+# (see gitrack.helpers.GIT_HOOKS) into the folder which is set as global core.hooksPath. Git then ignores
+# the repos' own hooks, so they are called from here.
+
+CMD='{{CMD_PATH}}'
+DATA='{{DATA_PATH}}'
+CHECKOUT_HOOK={{CHECKOUT_HOOK}}
+
+HOOK="${0##*/}"
+
+if [[ -d .git ]]; then
+    HOOKS_DIR=.git/hooks
+else
+    # Worktrees, submodules and bare repos
+    HOOKS_DIR="$(git rev-parse --git-common-dir)/hooks"
+fi
+LOCAL_HOOK="$HOOKS_DIR/$HOOK"
+
+case "$HOOK" in
+    post-commit|post-rewrite) TRACKED=1 ;;
+    post-checkout) TRACKED=$CHECKOUT_HOOK ;;
+    *) TRACKED=0 ;;
+esac
+
+if [[ $TRACKED -eq 1 ]]; then
+    [[ -n "$GITRACK_STORAGE" ]] && DATA="$GITRACK_STORAGE/data"
+
+    # Hooks are run in the root of the working tree, the repo's data folder is named
+    # the same way as by gitrack.config.repo_name() and exists only for initialized repos
+    builtin cd -P . && NAME="${PWD:1}"
+    NAME="${NAME//\//_}"
+    (( ${#NAME} > 250 )) && NAME="${NAME: -250}"
+
+    # Repos with hooks installed by 'gitrack init' call giTrack on their own
+    [[ -d "$DATA/repos/$NAME" && ! -e "$LOCAL_HOOK.gitrack" ]] || TRACKED=0
+fi
+
+if [[ $TRACKED -eq 0 ]]; then
+    [[ -x "$LOCAL_HOOK" ]] && exec "$LOCAL_HOOK" "$@"
+    exit 0
+fi
+
+# The binary could have been moved since the installation
+[[ -x "$CMD" ]] || CMD="$(command -v gitrack)"
+
+# Git passes the rewritten commits on stdin, which is needed by both the repo's hook and giTrack
+[[ "$HOOK" == post-rewrite ]] && INPUT="$(cat)"
+
+STATUS=0
+if [[ -x "$LOCAL_HOOK" ]]; then
+    if [[ "$HOOK" == post-rewrite ]]; then
+        printf '%s\n' "$INPUT" | "$LOCAL_HOOK" "$@"
+    else
+        "$LOCAL_HOOK" "$@"
+    fi
+    STATUS=$?
+fi
+
+if [[ -n "$CMD" ]]; then
+    (
+        if "$CMD" init --check; then
+            case "$HOOK" in
+                post-commit) "$CMD" hooks post-commit ;;
+                post-rewrite) printf '%s\n' "$INPUT" | "$CMD" hooks post-rewrite "$1" ;;
+                post-checkout) "$CMD" hooks post-checkout "$@" ;;
+            esac
+        fi
+    ) &
+fi
+
+exit $STATUS
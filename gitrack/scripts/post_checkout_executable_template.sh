@@ -0,0 +1,10 @@
+#!/usr/bin/env bash
+
+CMD='{{CMD_PATH}}'
+
+# Checkouts are debounced by giTrack, so the checkout itself is never delayed
+(
+    if env $CMD init --check; then
+        env $CMD hooks post-checkout "$@"
+    fi
+) &
@@ -0,0 +1,13 @@
+#!/usr/bin/env bash
+
+CMD='{{CMD_PATH}}'
+
+# Git passes the rewritten commits on stdin, which is not available to background processes,
+# hence it has to be read before the rest runs in background.
+REWRITTEN="$(cat)"
+
+(
+    if env $CMD init --check; then
+        printf '%s\n' "$REWRITTEN" | env $CMD hooks post-rewrite "$1"
+    fi
+) &
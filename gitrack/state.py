@@ -0,0 +1,181 @@
+"""
+Global state database, an alternative to the per-repo folders with pickled Store.
+
+All repos have a row in single SQLite database in giTrack's data folder, keyed by the repo's full path, so there
+are no collisions caused by the truncated folder names and questions across the repos (eq. which repos are tracking
+right now) are single indexed query. It is enabled with the 'state_backend' option of the global config
+or with GITRACK_STATE_BACKEND environmental variable.
+"""
+import collections
+import json
+import logging
+import pathlib
+import pickle
+import sqlite3
+import threading
+import time
+import typing
+
+from gitrack import config as config_module
+
+logger = logging.getLogger('gitrack.state')
+
+DATABASE_FILENAME = 'state.sqlite'
+
+RepoState = collections.namedtuple('RepoState', ['path', 'running', 'since', 'provider', 'updated'])
+
+
+class StateDatabase:
+    _instances = {}  # type: typing.Dict[typing.Tuple[pathlib.Path, int], StateDatabase]
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS repos (path TEXT PRIMARY KEY, running INTEGER NOT NULL DEFAULT 0, since REAL, '
+        'provider TEXT, provider_config TEXT, data BLOB NOT NULL, updated REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS repos_running ON repos (running)',
+    )
+
+    def __init__(self, path=None):  # type: (typing.Optional[pathlib.Path]) -> None
+        self.path = path or config_module.get_data_dir() / DATABASE_FILENAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._connection = sqlite3.connect(str(self.path), timeout=10, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+
+        for statement in self.SCHEMA:
+            self._connection.execute(statement)
+
+    @classmethod
+    def get_default(cls):  # type: () -> StateDatabase
+        """
+        Returns connection to the database in giTrack's data folder, shared by the calls from the same thread
+        (SQLite's connections can't be used from other threads).
+        """
+        key = (config_module.get_data_dir() / DATABASE_FILENAME, threading.get_ident())
+        if key not in cls._instances:
+            cls._instances[key] = cls(key[0])
+
+        return cls._instances[key]
+
+    def exists(self, repo_dir):  # type: (pathlib.Path) -> bool
+        return self._connection.execute('SELECT 1 FROM repos WHERE path = ?', (str(repo_dir),)).fetchone() is not None
+
+    def load(self, repo_dir):  # type: (pathlib.Path) -> typing.Optional[typing.Dict]
+        row = self._connection.execute('SELECT data FROM repos WHERE path = ?', (str(repo_dir),)).fetchone()
+        return pickle.loads(row[0]) if row is not None else None
+
+    def save(self, repo_dir, data, provider=None):  # type: (pathlib.Path, typing.Dict, typing.Any) -> None
+        """
+        :param provider: Repo's provider, when its config is not kept in the Store
+        """
+        since = data.get('since')
+        provider = data.get('provider') or provider
+        provider_config = data.get(str(provider)) if provider is not None else None
+
+        self._connection.execute(
+            'INSERT OR REPLACE INTO repos (path, running, since, provider, provider_config, data, updated) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', (
+                str(repo_dir),
+                bool(data.get('running')),
+                since.timestamp() if since is not None else None,
+                str(provider) if provider is not None else None,
+                json.dumps(provider_config, default=str) if provider_config is not None else None,
+                pickle.dumps(data),
+                time.time(),
+            ))
+
+    def delete(self, repo_dir):  # type: (pathlib.Path) -> None
+        self._connection.execute('DELETE FROM repos WHERE path = ?', (str(repo_dir),))
+
+    def repos(self, running=None):  # type: (typing.Optional[bool]) -> typing.List[RepoState]
+        query = 'SELECT path, running, since, provider, updated FROM repos'
+        params = ()
+        if running is not None:
+            query += ' WHERE running = ?'
+            params = (running,)
+
+        return [RepoState(path, bool(is_running), since, provider, updated)
+                for path, is_running, since, provider, updated in self._connection.execute(query + ' ORDER BY path',
+                                                                                          params)]
+
+    def close(self):
+        self._connection.close()
+
+
+def _guess_repo_dir(folder):  # type: (pathlib.Path) -> typing.Optional[pathlib.Path]
+    """
+    Folders of repos initialized before the repo's path was recorded in the Store have only the mangled name,
+    which can be reversed only when the path did not contain underscores.
+    """
+    candidate = pathlib.Path('/' + folder.name.replace('_', '/'))
+    return candidate if config_module.repo_name(candidate) == folder.name and (candidate / '.git').exists() else None
+
+
+def migrate_repo(database, repo_dir):  # type: (StateDatabase, pathlib.Path) -> bool
+    """
+    Imports the pickled Store of the repo into the database, if there is any.
+
+    :return: True if the repo was migrated
+    """
+    pickle_file = config_module.get_data_dir() / 'repos' / config_module.repo_name(repo_dir) / 'data.pickle'
+
+    try:
+        with pickle_file.open('rb') as file:
+            data = pickle.load(file)
+    except FileNotFoundError:
+        return False
+
+    data.setdefault('repo_dir', str(repo_dir))
+    database.save(repo_dir, data)
+    logger.info('Migrated state of {} into the state database'.format(repo_dir))
+    return True
+
+
+def _iter_pickled_stores():
+    # type: () -> typing.Iterator[typing.Tuple[pathlib.Path, typing.Optional[pathlib.Path], typing.Dict]]
+    """
+    :return: Repo's data folder, the repo's path (None if it could not be determined) and its pickled Store
+    """
+    for pickle_file in sorted((config_module.get_data_dir() / 'repos').glob('*/data.pickle')):
+        try:
+            with pickle_file.open('rb') as file:
+                data = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning('Store {} could not be read: {}'.format(pickle_file, e))
+            continue
+
+        repo_dir = data.get('repo_dir')
+        repo_dir = pathlib.Path(repo_dir) if repo_dir else _guess_repo_dir(pickle_file.parent)
+        yield pickle_file.parent, repo_dir, data
+
+
+def migrate_all(database):  # type: (StateDatabase) -> typing.Tuple[typing.List[pathlib.Path], typing.List[pathlib.Path]]
+    """
+    Imports pickled Stores of all the repos, which are not in the database yet. The pickled files are left untouched,
+    so it is possible to switch back.
+
+    :return: Lists of migrated repos and of folders whose repo's path could not be determined
+    """
+    migrated, unknown = [], []
+
+    for folder, repo_dir, data in _iter_pickled_stores():
+        if repo_dir is None:
+            unknown.append(folder)
+            continue
+
+        if not database.exists(repo_dir):
+            data['repo_dir'] = str(repo_dir)
+            database.save(repo_dir, data)
+            migrated.append(repo_dir)
+
+    return migrated, unknown
+
+
+def known_repos():  # type: () -> typing.List[pathlib.Path]
+    """
+    :return: Paths of all the initialized repos, whose path is known, with the current state backend
+    """
+    if config_module.get_state_backend() == config_module.STATE_BACKEND_SQLITE:
+        return [pathlib.Path(repo.path) for repo in StateDatabase.get_default().repos()]
+
+    return [repo_dir for _, repo_dir, _ in _iter_pickled_stores() if repo_dir is not None]
@@ -0,0 +1,219 @@
+"""
+Cached remote state of the providers and its reconciliation with giTrack's local state.
+
+The provider's running entry is cached in giTrack's data folder for a short time (the 'remote_state_ttl' option),
+keyed by the provider's account, so repeated 'gitrack status' invocations don't have to ask the provider every time.
+The cache is invalidated whenever giTrack starts or stops an entry.
+
+When an entry is stopped or started outside of giTrack (eq. in the provider's web UI), the repos' Stores and status
+files drift from the provider's state. Reconciliation fetches the running entry once per account and fixes all
+the repos sharing it.
+"""
+import collections
+import datetime
+import json
+import logging
+import pathlib
+import time
+import typing
+
+from gitrack import config as config_module, exceptions, helpers, locking, profiling
+from gitrack.providers import AbstractProvider, RemoteEntry, STATUS_FILENAME
+
+logger = logging.getLogger('gitrack.sync')
+
+CACHE_FILENAME = 'remote_state.json'
+
+# Store's 'since' and the entry's start differing by less than this number of seconds are considered equal
+SINCE_TOLERANCE = 2
+
+Fix = collections.namedtuple('Fix', ['repo_dir', 'message'])
+
+
+class RemoteStateCache:
+    """
+    Running entries of the providers' accounts, shared by all gitrack processes through a JSON file.
+    """
+
+    def __init__(self, path=None):  # type: (typing.Optional[pathlib.Path]) -> None
+        self._path = path or config_module.get_data_dir() / CACHE_FILENAME
+        self._lock_path = self._path.with_suffix('.lock')
+
+    def _read(self):  # type: () -> typing.Dict
+        try:
+            return json.loads(self._path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _modify(self, key, value):  # type: (str, typing.Optional[typing.Dict]) -> None
+        with locking.locked(self._lock_path):
+            state = self._read()
+            if value is None and key not in state:
+                return  # Nothing changed, lets not write the file
+
+            if value is None:
+                del state[key]
+            else:
+                state[key] = value
+
+            tmp_path = self._path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(state))
+            tmp_path.replace(self._path)
+
+    def get(self, key, ttl):  # type: (str, float) -> typing.Tuple[bool, typing.Optional[RemoteEntry]]
+        """
+        :return: Whether the cached state is fresh and the running entry (None if there is none)
+        """
+        cached = self._read().get(key)
+        if cached is None or cached['fetched'] + ttl < time.time():
+            return False, None
+
+        return True, RemoteEntry(*cached['entry']) if cached['entry'] is not None else None
+
+    def put(self, key, entry):  # type: (str, typing.Optional[RemoteEntry]) -> None
+        self._modify(key, {'fetched': time.time(), 'entry': list(entry) if entry is not None else None})
+
+    def invalidate(self, key):  # type: (str) -> None
+        self._modify(key, None)
+
+
+def get_current_entry(config, provider):  # type: (config_module.Config, AbstractProvider) -> typing.Optional[RemoteEntry]
+    """
+    Returns the provider's running entry, from the cache when it is fresh enough.
+    """
+    key = provider.state_key
+    if key is None or config.remote_state_ttl <= 0:
+        with profiling.phase('provider.current_entry'):
+            return provider.current_entry()
+
+    cache = RemoteStateCache()
+    fresh, entry = cache.get(key, config.remote_state_ttl)
+    if fresh:
+        return entry
+
+    with profiling.phase('provider.current_entry'):
+        entry = provider.current_entry()
+
+    cache.put(key, entry)
+    return entry
+
+
+def _fix_status_file(config):  # type: (config_module.Config) -> bool
+    """
+    Makes the status file, read by the shell's prompt integration, consistent with the Store.
+
+    :return: True if the status file had to be changed
+    """
+    since = config.store['since'] if config.store['running'] else None
+    status_file = config.repo_data_dir / STATUS_FILENAME
+
+    try:
+        content = status_file.read_text().strip()
+    except FileNotFoundError:
+        content = None
+
+    if since is None:
+        consistent = content == ''
+    else:
+        try:
+            consistent = abs(int(content) - since.timestamp()) <= SINCE_TOLERANCE
+        except (TypeError, ValueError):
+            consistent = False
+
+    if consistent:
+        return False
+
+    status_file.write_text(str(int(since.timestamp())) if since is not None else '')
+    return True
+
+
+def _mark_stopped(config):  # type: (config_module.Config) -> None
+    config.store['running'] = False
+    config.store['paused'] = False
+    config.store['since'] = None
+
+
+def _reconcile_group(entry, members):
+    # type: (typing.Optional[RemoteEntry], typing.List[config_module.Config]) -> typing.List[Fix]
+    fixes = []
+    claiming = [config for config in members if config.store['running']]
+
+    if entry is None:
+        for config in claiming:
+            _mark_stopped(config)
+            fixes.append(Fix(config.repo_dir, 'the entry was stopped at the provider, tracking stopped'))
+    elif entry.start is not None:
+        if len(claiming) > 1:
+            # Only one entry can run, the repo which started it was most likely the last one to start tracking
+            def distance(config):
+                since = config.store['since']
+                return abs(since.timestamp() - entry.start) if since is not None else float('inf')
+
+            owner = min(claiming, key=distance)
+            for config in claiming:
+                if config is not owner:
+                    _mark_stopped(config)
+                    fixes.append(Fix(config.repo_dir, 'the running entry belongs to {}, tracking stopped'.format(
+                        owner.repo_dir)))
+
+            claiming = [owner]
+
+        for config in claiming:
+            since = config.store['since']
+            if since is None or abs(since.timestamp() - entry.start) > SINCE_TOLERANCE:
+                config.store['since'] = datetime.datetime.fromtimestamp(entry.start)
+                fixes.append(Fix(config.repo_dir, 'tracking\'s start corrected to the entry\'s start'))
+
+    for config in members:
+        if _fix_status_file(config):
+            fixes.append(Fix(config.repo_dir, 'status file corrected'))
+
+        if config.store.modified:
+            config.store.save()
+
+    return fixes
+
+
+def reconcile(repo_dirs):  # type: (typing.Iterable[pathlib.Path]) -> typing.List[Fix]
+    """
+    Fixes the drift between the repos' Stores, status files and the providers' running entries. Repos sharing
+    provider's account are reconciled together, with single request for the running entry.
+
+    :return: Fixes that were made
+    """
+    groups = collections.OrderedDict()  # type: typing.Dict[str, typing.List[typing.Tuple]]
+    cache = RemoteStateCache()
+
+    for repo_dir in repo_dirs:
+        try:
+            config = config_module.Config(repo_dir)
+            provider = config.provider.klass()(config)
+        except (exceptions.GitrackException, OSError) as e:
+            logger.warning('Repo {} skipped: {}'.format(repo_dir, e))
+            continue
+
+        # Without the key the repo can't share the state with the others
+        key = provider.state_key or 'repo:{}'.format(repo_dir)
+        groups.setdefault(key, []).append((config, provider))
+
+    fixes = []
+    for key, members in groups.items():
+        config, provider = members[0]
+
+        # Every group gets its own deadline, as the deadline is meant for single provider's state
+        helpers.configure_transport(config)
+
+        try:
+            with profiling.phase('provider.current_entry'):
+                entry = provider.current_entry()
+        except exceptions.NetworkException as e:
+            logger.warning('State of {} could not be fetched: {}'.format(
+                ', '.join(str(config.repo_dir) for config, _ in members), e))
+            continue
+
+        if provider.state_key is not None:
+            cache.put(key, entry)
+
+        fixes.extend(_reconcile_group(entry, [config for config, _ in members]))
+
+    return fixes
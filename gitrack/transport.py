@@ -0,0 +1,392 @@
+"""
+Single place through which goes all giTrack's HTTP traffic (provider's API calls and the version check).
+
+Every request is bounded by connect/read timeouts and by the deadline of the whole invocation, so a hanging
+service can't keep the background hooks' processes alive. Idempotent requests are retried with jittered
+exponential back-off. Failures are tracked per host by a circuit breaker that is persisted in giTrack's data
+folder and shared by all gitrack processes, so once a service is known to be down, later invocations fail fast
+instead of each of them waiting out the timeouts.
+
+Authenticated requests are throttled by a token bucket per host and credentials, which is shared by all gitrack
+processes as well, so the hooks of all the repos using one API token respect the provider's rate limit together.
+
+The traffic can be recorded into a cassette and replayed from it, see gitrack.cassette.
+"""
+import contextlib
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import typing
+from urllib.parse import urlsplit
+
+import requests
+
+from gitrack import profiling, metrics, locking, exceptions, cassette, config as config_module
+
+logger = logging.getLogger('gitrack.transport')
+
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 10
+DEFAULT_DEADLINE = 20
+DEFAULT_RETRIES = 2
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 4
+
+CIRCUIT_BREAKER_FILENAME = 'circuit_breaker.json'
+CIRCUIT_BREAKER_THRESHOLD = 3
+CIRCUIT_BREAKER_COOLDOWN = 60
+
+# Toggl allows one request per second per API token
+DEFAULT_RATE_LIMIT = 1.0
+DEFAULT_RATE_BURST = 3
+
+RATE_LIMITER_FILENAME = 'rate_limits.json'
+
+# Buckets not used for this number of seconds are dropped from the state file
+RATE_LIMITER_EXPIRATION = 3600
+
+_settings = {
+    'connect_timeout': DEFAULT_CONNECT_TIMEOUT,
+    'read_timeout': DEFAULT_READ_TIMEOUT,
+    'retries': DEFAULT_RETRIES,
+    'deadline': time.monotonic() + DEFAULT_DEADLINE,
+    'rate_limit': DEFAULT_RATE_LIMIT,
+    'rate_burst': DEFAULT_RATE_BURST,
+}
+
+# Per-thread deadline and limits set by budget()
+_local = threading.local()
+
+
+def configure(connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT, deadline=DEFAULT_DEADLINE,
+              retries=DEFAULT_RETRIES, rate_limit=DEFAULT_RATE_LIMIT, rate_burst=DEFAULT_RATE_BURST):
+    # type: (float, float, float, int, float, int) -> None
+    """
+    Sets the limits for the current invocation.
+
+    :param connect_timeout: Seconds to wait for establishing the connection.
+    :param read_timeout: Seconds to wait for the server's response.
+    :param deadline: Seconds from now, after which no more requests are made. It is the budget for all the
+                     requests of the invocation, including the retries.
+    :param retries: How many times is an idempotent request retried.
+    :param rate_limit: Authenticated requests per second allowed per host and credentials, 0 disables the limiting.
+    :param rate_burst: How many authenticated requests can be made at once, after a period without requests.
+    """
+    _settings.update({
+        'connect_timeout': connect_timeout,
+        'read_timeout': read_timeout,
+        'retries': retries,
+        'deadline': time.monotonic() + deadline,
+        'rate_limit': rate_limit,
+        'rate_burst': rate_burst,
+    })
+
+
+@contextlib.contextmanager
+def budget(seconds, **limits):  # type: (float, **typing.Any) -> typing.Iterator[None]
+    """
+    Gives the requests made by the current thread in the block their own deadline, instead of the invocation's one.
+    It is meant for long-lived processes serving many calls from several threads (see gitrack.api).
+
+    :param limits: Overrides of the invocation's limits for the block, the same keyword arguments as configure()
+                   has besides the deadline.
+    """
+    unknown = set(limits) - (set(_settings) - {'deadline'})
+    if unknown:
+        raise TypeError('Unknown transport limits: {}'.format(', '.join(sorted(unknown))))
+
+    previous = getattr(_local, 'deadline', None), getattr(_local, 'limits', None)
+    _local.deadline = time.monotonic() + seconds
+    _local.limits = dict(previous[1] or {}, **limits)
+
+    try:
+        yield
+    finally:
+        _local.deadline, _local.limits = previous
+
+
+def remaining_budget():  # type: () -> float
+    deadline = getattr(_local, 'deadline', None)
+    return (deadline if deadline is not None else _settings['deadline']) - time.monotonic()
+
+
+def current_limits():  # type: () -> typing.Dict[str, typing.Any]
+    """
+    Limits overridden by budget() for the current thread, so they can be passed on to other threads.
+    """
+    return dict(getattr(_local, 'limits', None) or {})
+
+
+def _limit(name):  # type: (str) -> typing.Any
+    limits = getattr(_local, 'limits', None) or {}
+    return limits.get(name, _settings[name])
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker with state shared across processes through a JSON file.
+
+    After CIRCUIT_BREAKER_THRESHOLD consecutive failures the circuit opens and all requests to the host
+    fail right away for CIRCUIT_BREAKER_COOLDOWN seconds. Afterwards a request is let through and
+    its result either closes the circuit or opens it again.
+    """
+
+    def __init__(self, host):  # type: (str) -> None
+        self.host = host
+        self._path = config_module.get_data_dir() / CIRCUIT_BREAKER_FILENAME
+        self._lock_path = self._path.with_suffix('.lock')
+
+    def _read(self):  # type: () -> typing.Dict
+        try:
+            return json.loads(self._path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _update(self, failed):  # type: (bool) -> None
+        # Common case of success with healthy host, which does not need any locking
+        if not failed and self._read().get(self.host, {}).get('failures', 0) == 0:
+            return
+
+        with locking.locked(self._lock_path):
+            state = self._read()
+            host_state = state.get(self.host, {'failures': 0, 'opened_until': 0})
+
+            if not failed and host_state['failures'] == 0:
+                return  # Nothing changed, lets not write the file
+
+            if failed:
+                host_state['failures'] += 1
+                if host_state['failures'] >= CIRCUIT_BREAKER_THRESHOLD:
+                    host_state['opened_until'] = time.time() + CIRCUIT_BREAKER_COOLDOWN
+                    logger.warning('Circuit for {} opened for {} seconds'.format(self.host, CIRCUIT_BREAKER_COOLDOWN))
+            else:
+                host_state = {'failures': 0, 'opened_until': 0}
+
+            state[self.host] = host_state
+            tmp_path = self._path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(state))
+            tmp_path.replace(self._path)
+
+    def is_open(self):  # type: () -> bool
+        return self._read().get(self.host, {}).get('opened_until', 0) > time.time()
+
+    def record_success(self):
+        self._update(failed=False)
+
+    def record_failure(self):
+        self._update(failed=True)
+
+
+class RateLimiter:
+    """
+    Token bucket with state shared across processes through a JSON file.
+
+    The bucket holds up to 'burst' tokens and it is refilled with 'rate' tokens per second. Every request takes one
+    token and when there is none, the request waits for it. The tokens are reserved under the lock, but the waiting
+    happens without it, so waiting processes don't block each other. Retry-After of throttled responses blocks
+    the bucket for all the processes.
+    """
+
+    def __init__(self, key, rate, burst):  # type: (str, float, int) -> None
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self._path = config_module.get_data_dir() / RATE_LIMITER_FILENAME
+        self._lock_path = self._path.with_suffix('.lock')
+
+    @classmethod
+    def for_request(cls, host, auth):  # type: (str, typing.Any) -> typing.Optional[RateLimiter]
+        """
+        :return: Limiter for the credentials used to authenticate the request, or None when the request is not
+                 authenticated or the limiting is disabled.
+        """
+        if isinstance(auth, (tuple, list)):
+            credentials = ':'.join(str(part) for part in auth)
+        elif getattr(auth, 'username', None) is not None:  # requests.auth.HTTPBasicAuth
+            credentials = '{}:{}'.format(auth.username, auth.password)
+        else:
+            return None
+
+        if _limit('rate_limit') <= 0:
+            return None
+
+        # The credentials themselves are not stored
+        key = hashlib.sha256('{}\0{}'.format(host, credentials).encode('utf-8')).hexdigest()[:16]
+        return cls(key, _limit('rate_limit'), _limit('rate_burst'))
+
+    def _read(self):  # type: () -> typing.Dict
+        try:
+            return json.loads(self._path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, state):  # type: (typing.Dict) -> None
+        now = time.time()
+        state = {key: bucket for key, bucket in state.items()
+                 if bucket['updated'] > now - RATE_LIMITER_EXPIRATION or bucket['blocked_until'] > now}
+
+        tmp_path = self._path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(state))
+        tmp_path.replace(self._path)
+
+    def _bucket(self, state, now):  # type: (typing.Dict, float) -> typing.Dict
+        bucket = state.get(self.key, {'tokens': self.burst, 'updated': now, 'blocked_until': 0})
+        bucket['tokens'] = min(self.burst, bucket['tokens'] + (now - bucket['updated']) * self.rate)
+        bucket['updated'] = now
+        return bucket
+
+    def reserve(self, budget):  # type: (float) -> float
+        """
+        Takes a token from the bucket.
+
+        :param budget: Maximal number of seconds the request can wait for the token.
+        :return: Number of seconds to wait before the request can be made.
+        :raises exceptions.DeadlineExceeded: When the token would not be available within the budget,
+                                             no token is taken then.
+        """
+        with locking.locked(self._lock_path):
+            state = self._read()
+            now = time.time()
+            bucket = self._bucket(state, now)
+
+            tokens = bucket['tokens'] - 1
+            wait = max(bucket['blocked_until'] - now, -tokens / self.rate, 0)
+            if wait >= budget:
+                raise exceptions.DeadlineExceeded('Rate limit of the API would be exceeded within the time budget '
+                                                  'for the network requests')
+
+            bucket['tokens'] = tokens
+            state[self.key] = bucket
+            self._write(state)
+
+        return wait
+
+    def block(self, seconds):  # type: (float) -> None
+        """
+        Blocks the bucket for given number of seconds, eq. when the service asked for it with Retry-After.
+        """
+        with locking.locked(self._lock_path):
+            state = self._read()
+            now = time.time()
+            bucket = self._bucket(state, now)
+
+            bucket['blocked_until'] = max(bucket['blocked_until'], now + seconds)
+            bucket['tokens'] = min(bucket['tokens'], 0)
+            state[self.key] = bucket
+            self._write(state)
+
+    def acquire(self, budget):  # type: (float) -> None
+        """
+        Waits until the request can be made. The waiting is recorded into the profile and the metrics.
+        """
+        wait = self.reserve(budget)
+        if wait <= 0:
+            return
+
+        logger.debug('Rate limit reached, waiting {:.2f} s'.format(wait))
+        metrics.increment('rate_limit_wait', wait)
+        with profiling.phase('rate limit wait'):
+            time.sleep(wait)
+
+
+def _backoff(attempt):  # type: (int) -> float
+    return random.uniform(0.5, 1) * min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)
+
+
+def _retry_after(response):  # type: (requests.Response) -> typing.Optional[float]
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _send(method, url, **kwargs):  # type: (str, str, **typing.Any) -> requests.Response
+    session = cassette.get_active()
+    if session is None:
+        return requests.request(method, url, **kwargs)
+
+    return session.send(method, url, **kwargs)
+
+
+def request(method, url, **kwargs):  # type: (str, str, **typing.Any) -> requests.Response
+    """
+    Performs the HTTP request. Accepts same arguments as requests.request(), except the timeout which is
+    governed by the configured limits.
+
+    :raises exceptions.ServiceUnavailable: When the host's circuit is open or the requests fail even after retries.
+    :raises exceptions.DeadlineExceeded: When the invocation's budget for requests is spent.
+    """
+    method = method.upper()
+    host = urlsplit(url).netloc
+    path = urlsplit(url).path
+    breaker = CircuitBreaker(host)
+    limiter = RateLimiter.for_request(host, kwargs.get('auth'))
+
+    if breaker.is_open():
+        raise exceptions.ServiceUnavailable('{} is not available, skipping the request to it'.format(host))
+
+    retries = _limit('retries') if method in IDEMPOTENT_METHODS else 0
+    attempt = 0
+
+    while True:
+        remaining = remaining_budget()
+        if remaining <= 0:
+            raise exceptions.DeadlineExceeded('Time budget for the network requests was spent before '
+                                              '{} {} could be made'.format(method, path))
+
+        if limiter is not None:
+            limiter.acquire(remaining)
+            remaining = remaining_budget()
+
+        timeout = (min(_limit('connect_timeout'), remaining), min(_limit('read_timeout'), remaining))
+        metrics.increment('http_requests')
+        error = None
+        response = None
+
+        try:
+            with profiling.phase('request {} {}'.format(method, path)):
+                response = _send(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.ConnectTimeout as e:
+            # Request was not sent, so it is safe to retry even non-idempotent one
+            retries = max(retries, _limit('retries'))
+            error = e
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            error = e
+
+        if error is None and response.status_code not in RETRY_STATUSES:
+            breaker.record_success()
+            return response
+
+        if response is not None and response.status_code == 429:
+            # Throttled request was not processed, so it is safe to retry even non-idempotent one
+            retries = max(retries, _limit('retries'))
+
+        delay = _backoff(attempt)
+        if response is not None and _retry_after(response) is not None:
+            delay = max(delay, _retry_after(response))
+
+            if limiter is not None:
+                limiter.block(_retry_after(response))
+
+        if attempt >= retries or delay >= remaining_budget():
+            # Throttling is not a sign of unavailable service
+            if response is None or response.status_code != 429:
+                breaker.record_failure()
+
+            if response is not None:
+                return response
+
+            raise exceptions.ServiceUnavailable('Request {} {} to {} failed: {}'.format(method, path, host, error))
+
+        logger.info('Request {} {} failed ({}), retrying in {:.2f} s'.format(
+            method, path, error or response.status_code, delay))
+        metrics.increment('retries')
+        time.sleep(delay)
+        attempt += 1
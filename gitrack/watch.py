@@ -0,0 +1,238 @@
+"""
+Streaming of the repos' tracking state for editors' plugins and status bars, so they don't have to poll
+'gitrack status' which starts Python and asks the provider every time.
+
+The state is taken from the status files which the providers write into the repos' data folders whenever the tracking
+starts or stops. The files are watched with inotify, so the watcher sleeps until something changes. Where inotify
+is not available the status files are polled instead.
+"""
+import collections
+import errno
+import logging
+import os
+import pathlib
+import time
+import typing
+
+from gitrack import config as config_module, exceptions, inotify
+from gitrack.providers import STATUS_FILENAME
+
+logger = logging.getLogger('gitrack.watch')
+
+# Number of seconds between the heartbeats with the elapsed time of the running repos
+HEARTBEAT = 60
+
+# Number of seconds between the scans of the status files, when inotify is not available
+POLL_INTERVAL = 2
+
+# Number of seconds for which the data folder, whose repo was not found among the known repos, is not looked up again
+UNKNOWN_REPO_TTL = 60
+
+REPOS_MASK = inotify.IN_CREATE | inotify.IN_MOVED_TO | inotify.IN_DELETE | inotify.IN_ONLYDIR
+REPO_MASK = inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO | inotify.IN_DELETE
+
+EVENT_STATE = 'state'
+EVENT_HEARTBEAT = 'heartbeat'
+
+RepoStatus = collections.namedtuple('RepoStatus', ['repo', 'running', 'since'])
+
+
+def _read_status(status_file):  # type: (pathlib.Path) -> typing.Tuple[bool, typing.Optional[int]]
+    try:
+        content = status_file.read_text().strip()
+    except FileNotFoundError:
+        return False, None
+
+    try:
+        return True, int(content)
+    except ValueError:  # Empty when stopped
+        return False, None
+
+
+def state_event(status, now=None):  # type: (RepoStatus, typing.Optional[float]) -> typing.Dict
+    now = now or time.time()
+    return {
+        'event': EVENT_STATE,
+        'repo': status.repo,
+        'running': status.running,
+        'since': status.since,
+        'elapsed': int(now - status.since) if status.running else None,
+        'time': int(now),
+    }
+
+
+def heartbeat_event(statuses, now=None):  # type: (typing.Iterable[RepoStatus], typing.Optional[float]) -> typing.Dict
+    now = now or time.time()
+    return {
+        'event': EVENT_HEARTBEAT,
+        'running': [{'repo': status.repo, 'since': status.since, 'elapsed': int(now - status.since)}
+                    for status in statuses if status.running],
+        'time': int(now),
+    }
+
+
+class StatusWatcher:
+    """
+    Tracks the status files of all the repos and reports their changes.
+    """
+
+    def __init__(self, repos_dir=None, poll_interval=None):
+        # type: (typing.Optional[pathlib.Path], typing.Optional[float]) -> None
+        self.repos_dir = repos_dir or config_module.get_data_dir() / 'repos'
+        self.repos_dir.mkdir(parents=True, exist_ok=True)
+        self.poll_interval = poll_interval
+
+        self.statuses = {}  # type: typing.Dict[str, RepoStatus]
+        self._repo_dirs = {}  # type: typing.Dict[str, str]
+        self._unknown = {}  # type: typing.Dict[str, float]
+        self._mtimes = {}  # type: typing.Dict[str, typing.Optional[int]]
+        self._watches = {}  # type: typing.Dict[int, typing.Optional[str]]
+        self._inotify = None  # type: typing.Optional[inotify.Inotify]
+
+        if poll_interval is None:
+            self._setup_inotify()
+
+        for folder in self._folders():
+            self._update(folder)
+
+    def _setup_inotify(self):
+        try:
+            self._inotify = inotify.Inotify()
+            self._watches[self._inotify.add_watch(self.repos_dir, REPOS_MASK)] = None
+        except (exceptions.WatcherException, OSError) as e:
+            logger.warning('Inotify is not available ({}), the status files will be polled.'.format(e))
+            self.close()
+            self.poll_interval = POLL_INTERVAL
+
+    def _folders(self):  # type: () -> typing.List[str]
+        try:
+            return sorted(entry.name for entry in os.scandir(str(self.repos_dir)) if entry.is_dir())
+        except OSError:
+            return []
+
+    def _repo_dir(self, folder):  # type: (str) -> str
+        """
+        Translates the repo's data folder into the repo's path, the folder's name is used when it can't be determined.
+        The known repos are not scanned again for the folders which were not found among them recently.
+        """
+        if folder not in self._repo_dirs and time.monotonic() - self._unknown.get(folder, -UNKNOWN_REPO_TTL) \
+                >= UNKNOWN_REPO_TTL:
+            from gitrack import state
+
+            self._repo_dirs.update((config_module.repo_name(repo_dir), str(repo_dir))
+                                   for repo_dir in state.known_repos())
+
+            if folder not in self._repo_dirs:
+                self._unknown[folder] = time.monotonic()
+
+        return self._repo_dirs.get(folder, folder)
+
+    def _watch(self, folder):  # type: (str) -> None
+        if self._inotify is None or folder in self._watches.values():
+            return
+
+        try:
+            self._watches[self._inotify.add_watch(self.repos_dir / folder, REPO_MASK)] = folder
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                logger.warning('Limit of inotify watches reached, changes of {} won\'t be reported.'.format(folder))
+
+    def _update(self, folder):  # type: (str) -> typing.Optional[RepoStatus]
+        """
+        Reads the repo's status file.
+
+        :return: The repo's status if it changed
+        """
+        self._watch(folder)
+        running, since = _read_status(self.repos_dir / folder / STATUS_FILENAME)
+
+        previous = self.statuses.get(folder)
+        if previous is not None and (previous.running, previous.since) == (running, since):
+            return None
+
+        self.statuses[folder] = status = RepoStatus(self._repo_dir(folder), running, since)
+        return status
+
+    def _changed_folders(self, timeout):  # type: (float) -> typing.Set[str]
+        if self._inotify is None:
+            time.sleep(timeout)
+            changed = set()
+
+            for folder in self._folders():
+                try:
+                    mtime = (self.repos_dir / folder / STATUS_FILENAME).stat().st_mtime_ns
+                except OSError:
+                    mtime = None
+
+                if self._mtimes.get(folder, -1) != mtime:
+                    self._mtimes[folder] = mtime
+                    changed.add(folder)
+
+            return changed
+
+        changed = set()
+        for event in self._inotify.read(timeout):
+            if event.mask & inotify.IN_Q_OVERFLOW:
+                return set(self._folders())
+
+            if event.mask & inotify.IN_IGNORED:
+                self._watches.pop(event.wd, None)
+                continue
+
+            if event.wd not in self._watches:
+                continue
+
+            folder = self._watches[event.wd]
+            if folder is None:  # Repo's folder was created or removed
+                changed.add(event.name)
+            elif event.name == STATUS_FILENAME:
+                changed.add(folder)
+
+        return changed
+
+    def changes(self, timeout):  # type: (float) -> typing.List[RepoStatus]
+        """
+        Waits at most timeout seconds for the changes of the repos' status.
+        """
+        changed = []
+        for folder in sorted(self._changed_folders(timeout)):
+            status = self._update(folder)
+            if status is not None:
+                changed.append(status)
+
+        return changed
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+            self._watches = {}
+
+
+def watch(emit, heartbeat=HEARTBEAT, poll_interval=None, watcher=None):
+    # type: (typing.Callable[[typing.Dict], None], float, typing.Optional[float], typing.Optional[StatusWatcher]) -> None
+    """
+    Emits the state of all the repos and then their changes, with heartbeats in between. Runs until interrupted.
+    """
+    watcher = watcher or StatusWatcher(poll_interval=poll_interval)
+
+    try:
+        now = time.time()
+        for status in sorted(watcher.statuses.values()):
+            emit(state_event(status, now))
+
+        next_heartbeat = now + heartbeat
+        while True:
+            timeout = max(0, next_heartbeat - time.time())
+            if watcher.poll_interval is not None:
+                timeout = min(timeout, watcher.poll_interval)
+
+            for status in watcher.changes(timeout):
+                emit(state_event(status))
+
+            now = time.time()
+            if now >= next_heartbeat:
+                emit(heartbeat_event(sorted(watcher.statuses.values()), now))
+                next_heartbeat = now + heartbeat
+    finally:
+        watcher.close()
@@ -0,0 +1,130 @@
+"""
+Custom setuptools' commands, registered through the [global] section of setup.cfg
+(pbr ignores the cmdclass passed to setup()).
+"""
+import compileall
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+from setuptools import Command
+from setuptools.command.build_py import build_py
+
+VERSION_MODULE = os.path.join('gitrack', '_version.py')
+VERSION_TEMPLATE = '''# Generated during the build, do not edit nor commit.
+version = {!r}
+'''
+
+LAUNCHER_TEMPLATE = '''#!/bin/sh
+# Generated by 'python setup.py build_release', do not edit.
+#
+# Everything giTrack needs is vendored in lib/ with precompiled bytecode, so the interpreter is isolated from the user's
+# environment (-I) and does not process site-packages (-S). The launcher can be symlinked from anywhere on the $PATH.
+script="$0"
+while [ -h "$script" ]; do
+    target="$(readlink "$script")"
+    case "$target" in
+        /*) script="$target" ;;
+        *) script="${{script%/*}}/$target" ;;
+    esac
+done
+
+case "$script" in
+    */*) root="${{script%/*}}/.." ;;
+    *) root=".." ;;
+esac
+case "$root" in
+    /*) ;;
+    *) root="$PWD/$root" ;;
+esac
+
+exec {python} -I -S -c 'import sys; sys.argv[0] = "gitrack"; sys.path.insert(0, sys.argv.pop(1))
+from gitrack.main import main; main()' "$root/lib" "$@"
+'''
+
+
+def get_platform():  # type: () -> str
+    """
+    Platform's name in the form used by bin/install.sh (eq. linux-x86_64, macosx-x86_64).
+    """
+    return '{}-{}'.format('macosx' if sys.platform == 'darwin' else sys.platform, platform.machine())
+
+
+def write_launcher(path, python):  # type: (str, str) -> None
+    with open(path, 'w') as file:
+        file.write(LAUNCHER_TEMPLATE.format(python=python))
+
+    os.chmod(path, 0o755)
+
+
+class BuildPyWithVersion(build_py):
+    """
+    Stamps the package's version into gitrack/_version.py, so it does not have to be resolved
+    through pbr (and pkg_resources) on every start of gitrack.
+    """
+
+    command_name = 'build_py'
+
+    def run(self):
+        super().run()
+
+        target = os.path.join(self.build_lib, VERSION_MODULE)
+        self.mkpath(os.path.dirname(target))
+        with open(target, 'w') as file:
+            file.write(VERSION_TEMPLATE.format(self.distribution.get_version()))
+
+
+class BuildRelease(Command):
+    """
+    Builds the release archive optimized for fast start: giTrack with all its dependencies vendored into single
+    folder with precompiled bytecode and shell launcher running the interpreter in the isolated mode. Unlike PEX there
+    is nothing to unpack nor resolve when the command starts.
+
+    The bytecode is specific for the Python's version, so the archive is built for the interpreter running this
+    command and its name contains the interpreter's version and the platform (eq. gitrack.linux-x86_64.python37.tar.gz).
+    """
+
+    command_name = 'build_release'
+    description = 'build vendored release archive with precompiled bytecode'
+    user_options = [
+        ('dist-dir=', 'd', 'directory where the archive is placed [default: dist]'),
+    ]
+
+    def initialize_options(self):
+        self.dist_dir = None
+
+    def finalize_options(self):
+        if self.dist_dir is None:
+            self.dist_dir = 'dist'
+
+    def run(self):
+        python = 'python{}.{}'.format(*sys.version_info[:2])
+        archive_name = 'gitrack.{}.{}.tar.gz'.format(get_platform(), python.replace('.', ''))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = os.path.join(tmp_dir, 'gitrack')
+            lib = os.path.join(root, 'lib')
+
+            # setuptools is not vendored, so on Python < 3.8 only the built-in providers are available
+            # (see gitrack.plugins)
+            subprocess.check_call([sys.executable, '-m', 'pip', 'install', '--no-compile', '--target', lib, '.'])
+
+            # Console scripts generated by pip expect the packages in site-packages, the launcher replaces them
+            shutil.rmtree(os.path.join(lib, 'bin'), ignore_errors=True)
+
+            if not compileall.compile_dir(lib, quiet=1):
+                self.warn('Some of the vendored modules could not be compiled, they will be compiled on import')
+
+            os.mkdir(os.path.join(root, 'bin'))
+            write_launcher(os.path.join(root, 'bin', 'gitrack'), python)
+
+            self.mkpath(self.dist_dir)
+            archive = os.path.join(self.dist_dir, archive_name)
+            with tarfile.open(archive, 'w:gz') as tar:
+                tar.add(root, arcname='gitrack')
+
+        self.announce('Release archive written to {}'.format(archive), level=2)
@@ -63,7 +63,7 @@ def commit(repo_dir):
 def cmd(repo_dir, store):
     tmp_repo_dir = repo_dir
 
-    def _cmd(cmd, config='default.config', repo_dir=None, inited=True, git_inited=False):
+    def _cmd(cmd, config='default.config', repo_dir=None, inited=True, git_inited=False, input=None):
         if repo_dir is None:
             repo_dir = tmp_repo_dir
 
@@ -77,7 +77,7 @@ def cmd(repo_dir, store):
             git.Repo.init(str(repo_dir))
 
         helpers.set_config(repo_dir, config)
-        return helpers.inner_cmd(cmd), repo_dir
+        return helpers.inner_cmd(cmd, input=input), repo_dir
 
     return _cmd
 
@@ -87,3 +87,9 @@ def patch_providers():
     with mock.patch.object(gitrack.Providers, 'klass') as _fixture:
         _fixture.return_value = helpers.ProviderForTesting
         yield
+
+
+@pytest.fixture(autouse=True)
+def patch_version_check():
+    with mock.patch.object(helpers_module, 'check_version') as _fixture:
+        yield _fixture
@@ -1,5 +1,6 @@
 import re
 import shutil
+import typing
 from enum import Enum
 
 from pathlib import Path
@@ -10,13 +11,13 @@ from gitrack import cli, config
 from gitrack.providers import AbstractProvider
 
 
-def inner_cmd(cmd):  # type: (str) -> ParsingResult
+def inner_cmd(cmd, input=None):  # type: (str, typing.Optional[str]) -> ParsingResult
 
     parsed = re.findall(r"([\"]([^\"]+)\")|([']([^']+)')|(\S+)",
                         cmd)  # Simulates quoting of strings with spaces (eq. filter -n "some important task")
     args = [i[1] or i[3] or i[4] for i in parsed]
 
-    result = CliRunner().invoke(cli.cli, args, obj={}, catch_exceptions=False)
+    result = CliRunner().invoke(cli.cli, args, input=input, obj={}, catch_exceptions=False)
     print(result.stdout)  # We want to pytest do the capturing as it will be displayed when tests fail
 
     return result
@@ -42,6 +43,9 @@ class ProviderForTesting(AbstractProvider):
     def init(cls):
         pass
 
+    def is_running(self):
+        return False
+
     def start(self, project=None, force=False):
         super().start(force)
 
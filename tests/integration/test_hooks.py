@@ -1,5 +1,12 @@
 from unittest import mock
 
+import git
+import pytest
+
+from gitrack import checkout, commits
+from gitrack.providers import EntryReference, EntryRewrite
+
+from . import helpers
 from .helpers import ProviderForTesting
 
 
@@ -74,3 +81,147 @@ class TestHooks:
 
         ProviderForTesting.stop.assert_called_once_with(mock.ANY, '#321 Some message', force=False, task=321)
         ProviderForTesting.start.assert_called_once_with(mock.ANY)
+    def test_queued_commits_are_collapsed(self, cmd, mocker, commit, repo_dir):
+        result, _ = cmd('start', git_inited=True)
+        assert result.exit_code == 0
+
+        mocker.spy(ProviderForTesting, 'stop')
+        mocker.spy(ProviderForTesting, 'start')
+
+        commit('First message')
+        commits.enqueue(helpers.repo_data_dir(repo_dir), git.Repo(str(repo_dir)).head.commit.hexsha)
+        commit('Second message')
+
+        result, _ = cmd('hooks post-commit')
+        assert result.exit_code == 0
+
+        ProviderForTesting.stop.assert_called_once_with(mock.ANY, 'First message; Second message', force=False,
+                                                        task=None)
+        ProviderForTesting.start.assert_called_once_with(mock.ANY)
+
+
+class TestRewriteHooks:
+    REFERENCE = EntryReference('123', 1000.0, 2000.0)
+
+    @staticmethod
+    def amend(repo_dir, msg):
+        repo = git.Repo(str(repo_dir))
+        old_sha = repo.head.commit.hexsha
+        repo.git.execute(['git', '-c', 'user.name=Tester', '-c', 'user.email=tester@example.com',
+                          'commit', '--amend', '--no-verify', '-m', msg])
+        return old_sha, repo.head.commit.hexsha
+
+    def test_amend(self, cmd, mocker, commit, repo_dir):
+        result, _ = cmd('start', git_inited=True)
+        assert result.exit_code == 0
+
+        mocker.patch.object(ProviderForTesting, 'support_rewrite', True, create=True)
+        mocker.patch.object(ProviderForTesting, 'stop', return_value=self.REFERENCE)
+        mocker.patch.object(ProviderForTesting, 'rewrite', create=True)
+
+        post_rewrite = repo_dir / '.git' / 'hooks' / 'post-rewrite'
+        post_rewrite.write_text('#!/usr/bin/env bash\ngitrack hooks post-rewrite "$1"')
+
+        commit('Some message')
+        result, _ = cmd('hooks post-commit')
+        assert result.exit_code == 0
+
+        old_sha, new_sha = self.amend(repo_dir, 'Amended message')
+
+        # post-commit hook of the amended commit is skipped
+        result, _ = cmd('hooks post-commit')
+        assert result.exit_code == 0
+        assert ProviderForTesting.stop.call_count == 1
+
+        result, _ = cmd('hooks post-rewrite amend', input='{} {}\n'.format(old_sha, new_sha))
+        assert result.exit_code == 0
+
+        ProviderForTesting.rewrite.assert_called_once_with([EntryRewrite(self.REFERENCE, 'Amended message', [])])
+
+    def test_amend_without_rewrite_hook(self, cmd, mocker, commit, repo_dir):
+        result, _ = cmd('start', git_inited=True)
+        assert result.exit_code == 0
+
+        mocker.patch.object(ProviderForTesting, 'support_rewrite', True, create=True)
+        mocker.patch.object(ProviderForTesting, 'stop', return_value=self.REFERENCE)
+
+        commit('Some message')
+        result, _ = cmd('hooks post-commit')
+        assert result.exit_code == 0
+
+        # Repos initialized before the post-rewrite hook was introduced create entries for the amended commits
+        self.amend(repo_dir, 'Amended message')
+        result, _ = cmd('hooks post-commit')
+        assert result.exit_code == 0
+        assert ProviderForTesting.stop.call_count == 2
+
+    def test_unknown_commits(self, cmd, mocker, commit, repo_dir):
+        result, _ = cmd('start', git_inited=True)
+        assert result.exit_code == 0
+
+        mocker.patch.object(ProviderForTesting, 'support_rewrite', True, create=True)
+        mocker.patch.object(ProviderForTesting, 'stop', return_value=self.REFERENCE)
+        mocker.patch.object(ProviderForTesting, 'rewrite', create=True)
+
+        commit('Some message')
+        result, _ = cmd('hooks post-commit')
+        assert result.exit_code == 0
+
+        result, _ = cmd('hooks post-rewrite rebase', input='{} {}\n'.format('a' * 40, 'b' * 40))
+        assert result.exit_code == 0
+
+        assert ProviderForTesting.rewrite.call_count == 0
+
+
+class TestCheckoutHook:
+    @pytest.fixture(autouse=True)
+    def no_debounce(self, mocker):
+        mocker.patch.object(checkout, 'DEBOUNCE', 0)
+
+    def test_switch(self, cmd, mocker, commit, repo_dir):
+        result, _ = cmd('start', git_inited=True)
+        assert result.exit_code == 0
+
+        commit('Some message', branch='#123_Some_branch')
+        repo = git.Repo(str(repo_dir))
+        repo.git.checkout(b='#456_Other_branch')
+
+        mocker.spy(ProviderForTesting, 'stop')
+        mocker.spy(ProviderForTesting, 'start')
+
+        result, _ = cmd('hooks post-checkout aaa bbb 1', config='task_dynamic_branch.config')
+        assert result.exit_code == 0
+
+        ProviderForTesting.stop.assert_called_once_with(mock.ANY, None, task=123)
+        ProviderForTesting.start.assert_called_once_with(mock.ANY, project=None)
+
+    def test_same_task(self, cmd, mocker, commit, repo_dir):
+        result, _ = cmd('start', git_inited=True)
+        assert result.exit_code == 0
+
+        commit('Some message', branch='#123_Some_branch')
+        git.Repo(str(repo_dir)).git.checkout(b='#123_Same_task')
+
+        mocker.spy(ProviderForTesting, 'stop')
+
+        result, _ = cmd('hooks post-checkout aaa bbb 1', config='task_dynamic_branch.config')
+        assert result.exit_code == 0
+
+        assert ProviderForTesting.stop.call_count == 0
+
+    def test_ignored_file_checkout_and_modes(self, cmd, mocker, commit, repo_dir):
+        result, _ = cmd('start', git_inited=True)
+        assert result.exit_code == 0
+
+        commit('Some message', branch='#123_Some_branch')
+        git.Repo(str(repo_dir)).git.checkout(b='#456_Other_branch')
+
+        mocker.spy(ProviderForTesting, 'stop')
+
+        result, _ = cmd('hooks post-checkout aaa bbb 0', config='task_dynamic_branch.config')
+        assert result.exit_code == 0
+
+        result, _ = cmd('hooks post-checkout aaa bbb 1', config='task_dynamic_commit.config')
+        assert result.exit_code == 0
+
+        assert ProviderForTesting.stop.call_count == 0
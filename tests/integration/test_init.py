@@ -1,8 +1,16 @@
+import pathlib
 import shutil
+import subprocess
+import time
 
+import git
 import pytest
 
-from gitrack import helpers, exceptions
+from gitrack import config as config_module, helpers, exceptions
+
+from .helpers import ProviderForTesting
+
+CONFIG_TEMPLATE = pathlib.Path(__file__).parent.parent / 'configs' / 'default.config'
 
 
 class TestInit:
@@ -66,3 +74,193 @@ class TestInit:
         assert helpers.is_repo_initialized(repo_dir) is False
         assert (repo_dir / '.git' / 'hooks' / 'post-commit').exists() is True
         assert (repo_dir / '.git' / 'hooks' / 'post-commit.gitrack').exists() is True
+
+    def test_checkout_hook(self, repo_dir, cmd, mocker):
+        mocker.patch.object(shutil, 'which')
+        shutil.which.return_value = 'gitrack'
+
+        result, _ = cmd('init', repo_dir=repo_dir, inited=False)
+        assert result.exit_code == 0
+        assert (repo_dir / '.git' / 'hooks' / 'post-checkout').exists() is False
+
+        result, _ = cmd('init --install-hook --checkout-hook', repo_dir=repo_dir, inited=False)
+        assert result.exit_code == 0
+        assert (repo_dir / '.git' / 'hooks' / 'post-checkout').exists()
+        assert (repo_dir / '.git' / 'hooks' / 'post-checkout.gitrack').exists()
+
+
+class TestRecursiveInit:
+    @pytest.fixture()
+    def workspace(self, tmp_path):
+        workspace = tmp_path / 'workspace'
+        for name in ('a', 'b', 'nested/c'):
+            git.Repo.init(str(workspace / name))
+
+        (workspace / 'empty').mkdir()
+        return workspace
+
+    def test_init(self, workspace, repo_dir, cmd, mocker):
+        mocker.patch.object(shutil, 'which', return_value='gitrack')
+        (workspace / 'b' / '.gitrack').write_text('[gitrack]\nprovider = toggl\n')
+
+        result, _ = cmd('init --recursive {} --template {}'.format(workspace, CONFIG_TEMPLATE), inited=False)
+        assert result.exit_code == 0
+        assert 'Found 3 repos: 3 initialized, 0 already initialized, 0 failed.' in result.output
+
+        for name in ('a', 'b', 'nested/c'):
+            assert helpers.is_repo_initialized(workspace / name)
+            assert (workspace / name / '.git' / 'hooks' / 'post-commit.gitrack').exists()
+
+        assert (workspace / 'a' / '.gitrack').read_text() == CONFIG_TEMPLATE.read_text()
+        assert (workspace / 'b' / '.gitrack').read_text() == '[gitrack]\nprovider = toggl\n'
+
+    def test_idempotent(self, workspace, repo_dir, cmd, mocker):
+        mocker.patch.object(shutil, 'which', return_value='gitrack')
+
+        result, _ = cmd('init --recursive {} --template {}'.format(workspace, CONFIG_TEMPLATE), inited=False)
+        assert result.exit_code == 0
+
+        post_commit = (workspace / 'a' / '.git' / 'hooks' / 'post-commit').read_text()
+
+        result, _ = cmd('init --recursive {} --template {}'.format(workspace, CONFIG_TEMPLATE), inited=False)
+        assert result.exit_code == 0
+        assert 'Found 3 repos: 0 initialized, 3 already initialized, 0 failed.' in result.output
+        assert (workspace / 'a' / '.git' / 'hooks' / 'post-commit').read_text() == post_commit
+
+    def test_skips_initialized(self, workspace, repo_dir, cmd, mocker):
+        mocker.patch.object(shutil, 'which', return_value='gitrack')
+        config_module.Store.init_repo(workspace / 'a')
+
+        result, _ = cmd('init --recursive {} --template {}'.format(workspace, CONFIG_TEMPLATE), inited=False)
+        assert result.exit_code == 0
+        assert 'Found 3 repos: 2 initialized, 1 already initialized, 0 failed.' in result.output
+
+        assert not (workspace / 'a' / '.gitrack').exists()
+        assert not (workspace / 'a' / '.git' / 'hooks' / 'post-commit.gitrack').exists()
+
+    def test_invalid_credentials(self, workspace, repo_dir, cmd, mocker):
+        mocker.patch.object(shutil, 'which', return_value='gitrack')
+        (workspace / 'a' / '.gitrack').write_text('[gitrack]\nprovider = toggl\nproject_support = True\n')
+        is_running = mocker.patch.object(ProviderForTesting, 'is_running', autospec=True, side_effect=ValueError())
+
+        with pytest.raises(exceptions.ProviderException):
+            cmd('init --recursive {} --template {}'.format(workspace, CONFIG_TEMPLATE), inited=False)
+
+        # The template's config is validated, not the first repo's own one
+        assert is_running.call_count == 1
+        assert is_running.call_args[0][0].config.project_support is False
+        for name in ('a', 'b', 'nested/c'):
+            assert not helpers.is_repo_initialized(workspace / name)
+            assert not (workspace / name / '.git' / 'hooks' / 'post-commit.gitrack').exists()
+        assert not (workspace / 'b' / '.gitrack').exists()
+
+    def test_requires_template(self, workspace, repo_dir, cmd):
+        result, _ = cmd('init --recursive {}'.format(workspace), inited=False)
+        assert result.exit_code == 2
+
+    def test_invalid_template(self, workspace, repo_dir, cmd, tmp_path):
+        template = tmp_path / 'template'
+        template.write_text('[gitrack]\ntasks_support = False\n')
+
+        with pytest.raises(exceptions.ConfigException):
+            cmd('init --recursive {} --template {}'.format(workspace, template), inited=False)
+
+        assert not helpers.is_repo_initialized(workspace / 'a')
+
+
+class TestGlobalHook:
+    @pytest.fixture(autouse=True)
+    def home(self, tmp_path, monkeypatch):
+        # Isolates the global Git's config
+        monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+        monkeypatch.delenv('XDG_CONFIG_HOME', raising=False)
+        monkeypatch.setenv('GIT_CONFIG_NOSYSTEM', '1')
+        (tmp_path / 'home').mkdir()
+
+    @pytest.fixture()
+    def log(self, tmp_path, monkeypatch):
+        log = tmp_path / 'log'
+        binary = tmp_path / 'gitrack'
+        binary.write_text('#!/usr/bin/env bash\necho "$PWD $*" >> {}\n'.format(log))
+        binary.chmod(0o755)
+
+        monkeypatch.setattr(helpers, '_gitrack_binary', str(binary))
+        log.touch()
+        return log
+
+    @staticmethod
+    def git_commit(repo_dir):
+        subprocess.run(['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com', 'commit', '-q',
+                        '--allow-empty', '-m', 'Some message'], cwd=str(repo_dir), check=True)
+
+    def test_install(self, repo_dir, cmd, log):
+        result, _ = cmd('init --global-hook', inited=False)
+        assert result.exit_code == 0
+
+        hooks_dir = helpers.get_global_hooks_dir()
+        assert helpers.is_global_hook_installed()
+        assert (hooks_dir / 'post-commit').exists() and (hooks_dir / 'pre-commit').exists()
+
+        result, _ = cmd('init', repo_dir=repo_dir, inited=False)
+        assert result.exit_code == 0
+        assert helpers.is_repo_initialized(repo_dir)
+        assert (repo_dir / '.git' / 'hooks' / 'post-commit').exists() is False
+
+        result, _ = cmd('init --remove-global-hook', inited=False)
+        assert result.exit_code == 0
+        assert not helpers.is_global_hook_installed()
+        assert not hooks_dir.exists()
+
+    def test_push_to_checkout(self, tmp_path, log):
+        hooks_dir = helpers.get_global_hooks_dir()
+        hooks_dir.mkdir(parents=True)
+        (hooks_dir / 'push-to-checkout').write_text('#!/usr/bin/env bash\nexit 0\n')  # Installed by older versions
+
+        helpers.install_global_hook()
+        assert not any((hooks_dir / hook).exists() for hook in helpers.UNSAFE_GIT_HOOKS)
+
+        remote, local = (tmp_path / 'remote').resolve(), (tmp_path / 'local').resolve()
+        git.Repo.init(str(remote))
+        subprocess.run(['git', 'config', 'receive.denyCurrentBranch', 'updateInstead'], cwd=str(remote), check=True)
+        self.git_commit(remote)
+
+        subprocess.run(['git', 'clone', '-q', str(remote), str(local)], check=True)
+        (local / 'file').write_text('content')
+        subprocess.run(['git', 'add', 'file'], cwd=str(local), check=True)
+        self.git_commit(local)
+        subprocess.run(['git', 'push', '-q', 'origin', 'HEAD'], cwd=str(local), check=True)
+
+        assert (remote / 'file').read_text() == 'content'
+        assert subprocess.run(['git', 'status', '--porcelain'], cwd=str(remote), check=True,
+                              stdout=subprocess.PIPE).stdout == b''
+
+    def test_foreign_hooks_path(self, repo_dir, cmd, log):
+        subprocess.run(['git', 'config', '--global', 'core.hooksPath', '/some/hooks'], check=True)
+
+        with pytest.raises(exceptions.GitrackException):
+            cmd('init --global-hook', inited=False)
+
+    @pytest.mark.parametrize('name', ('repo', 'long-' + 'x' * 120 + '/' + 'y' * 120))
+    def test_dispatch(self, store, tmp_path, log, name):
+        tracked, untracked = (tmp_path / name).resolve(), (tmp_path / 'untracked').resolve()
+        for repo_dir in (tracked, untracked):
+            git.Repo.init(str(repo_dir))
+
+            local_hook = repo_dir / '.git' / 'hooks' / 'post-commit'
+            local_hook.write_text('#!/usr/bin/env bash\necho "$PWD local" >> {}\n'.format(log))
+            local_hook.chmod(0o755)
+
+        config_module.Store.init_repo(tracked)
+        helpers.install_global_hook()
+
+        self.git_commit(untracked)
+        self.git_commit(tracked)
+
+        expected = ['{} local'.format(untracked), '{} local'.format(tracked), '{} init --check'.format(tracked),
+                    '{} hooks post-commit'.format(tracked)]
+        for _ in range(50):
+            if len(log.read_text().splitlines()) >= len(expected):
+                break
+            time.sleep(0.1)
+
+        assert log.read_text().splitlines() == expected
@@ -0,0 +1,49 @@
+import json
+
+from .helpers import repo_data_dir
+
+
+class TestProfile:
+    def test_profile_option(self, cmd):
+        result, repo_dir = cmd('--profile start')
+        assert result.exit_code == 0
+
+        profiles_dir = repo_data_dir(repo_dir) / 'profiles'
+        assert len(list(profiles_dir.glob('*-start.pstats'))) == 1
+
+        run_file = next(profiles_dir.glob('*-start.json'))
+        run = json.loads(run_file.read_text())
+        assert run['command'] == 'start'
+        assert run['total'] > 0
+        assert {'repo discovery', 'config load', 'store load', 'store save'} <= {name for name, _ in run['phases']}
+
+    def test_profile_env_variable(self, cmd, monkeypatch):
+        monkeypatch.setenv('GITRACK_PROFILE', '1')
+
+        result, repo_dir = cmd('hooks post-commit')
+        assert result.exit_code == 0
+
+        profiles_dir = repo_data_dir(repo_dir) / 'profiles'
+        assert len(list(profiles_dir.glob('*-hooks_post-commit.pstats'))) == 1
+
+    def test_not_profiled_by_default(self, cmd):
+        result, repo_dir = cmd('start')
+        assert result.exit_code == 0
+
+        assert not (repo_data_dir(repo_dir) / 'profiles').exists()
+
+    def test_show(self, cmd):
+        cmd('--profile start')
+        cmd('--profile stop')
+
+        result, _ = cmd('profile show')
+        assert result.exit_code == 0
+        assert 'stop @' in result.output
+        assert 'start @' in result.output
+        assert 'config load' in result.output
+        assert 'function calls' in result.output
+
+    def test_show_without_profiles(self, cmd):
+        result, _ = cmd('profile show')
+        assert result.exit_code == 0
+        assert 'No profiles recorded' in result.output
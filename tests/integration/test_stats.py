@@ -0,0 +1,60 @@
+from gitrack import config, metrics
+
+
+class TestStats:
+    def test_samples_recorded(self, cmd, commit):
+        cmd('start', git_inited=True)
+        commit('Some message')
+        cmd('hooks post-commit')
+
+        samples = metrics.load(config.get_data_dir())
+        assert [sample['command'] for sample in samples] == ['start', 'hooks post-commit']
+
+        start_sample = samples[0]
+        assert start_sample['outcome'] == 'ok'
+        assert start_sample['duration'] > 0
+        assert start_sample['repo'] is not None
+        assert list(start_sample['provider_calls']) == ['start']
+
+        assert list(samples[1]['provider_calls']) == ['stop', 'start']
+
+    def test_failure_outcome(self, cmd):
+        result, _ = cmd('init --check', inited=False)
+        assert result.exit_code == 2
+
+        samples = metrics.load(config.get_data_dir())
+        assert samples[-1]['command'] == 'init'
+        assert samples[-1]['outcome'] == 'exit 2'
+
+    def test_show(self, cmd):
+        cmd('start')
+        cmd('stop')
+        cmd('start')
+
+        result, repo_dir = cmd('stats')
+        assert result.exit_code == 0
+        assert 'start' in result.output
+        assert 'stop' in result.output
+        assert str(repo_dir) in result.output
+
+        assert [sample['command'] for sample in metrics.load(config.get_data_dir())] == ['start', 'stop', 'start']
+
+    def test_prometheus_export(self, cmd, tmp_path):
+        cmd('start')
+
+        destination = tmp_path / 'gitrack.prom'
+        result, _ = cmd('stats --prometheus {}'.format(destination))
+        assert result.exit_code == 0
+
+        exported = destination.read_text()
+        assert 'gitrack_command_duration_seconds{command="start",quantile="0.95"}' in exported
+        assert 'gitrack_command_duration_seconds_count{command="start"} 1' in exported
+
+    def test_retention(self, store, tmp_path):
+        data_dir = tmp_path / 'metrics'
+        for i in range(30):
+            metrics.record(data_dir, {'command': 'start', 'duration': i, 'outcome': 'ok'})
+
+        metrics.trim(metrics.get_metrics_file(data_dir), keep=10)
+        samples = metrics.load(data_dir)
+        assert [sample['duration'] for sample in samples] == list(range(20, 30))
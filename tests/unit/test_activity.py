@@ -0,0 +1,177 @@
+import sys
+from unittest import mock
+
+import pytest
+
+from gitrack import activity
+
+
+def matcher(*patterns, base=''):
+    ignore_matcher = activity.IgnoreMatcher()
+    ignore_matcher.add_patterns(patterns, base)
+    return ignore_matcher
+
+
+class TestIgnoreMatcher:
+    def test_not_anchored(self):
+        ignore_matcher = matcher('*.pyc', '# comment', '', 'build')
+
+        assert ignore_matcher.is_ignored('some.pyc')
+        assert ignore_matcher.is_ignored('deep/folder/some.pyc')
+        assert ignore_matcher.is_ignored('build', is_dir=True)
+        assert ignore_matcher.is_ignored('src/build', is_dir=True)
+        assert ignore_matcher.is_ignored('build/some.py')
+        assert not ignore_matcher.is_ignored('some.py')
+        assert not ignore_matcher.is_ignored('builder', is_dir=True)
+
+    def test_anchored(self):
+        ignore_matcher = matcher('/dist', 'docs/_build')
+
+        assert ignore_matcher.is_ignored('dist', is_dir=True)
+        assert not ignore_matcher.is_ignored('src/dist', is_dir=True)
+        assert ignore_matcher.is_ignored('docs/_build', is_dir=True)
+        assert not ignore_matcher.is_ignored('other/docs/_build', is_dir=True)
+
+    def test_directory_only(self):
+        ignore_matcher = matcher('logs/')
+
+        assert ignore_matcher.is_ignored('logs', is_dir=True)
+        assert ignore_matcher.is_ignored('logs/today.log')
+        assert not ignore_matcher.is_ignored('logs')
+
+    def test_double_asterisk(self):
+        ignore_matcher = matcher('**/cache', 'tmp/**/*.bak')
+
+        assert ignore_matcher.is_ignored('cache', is_dir=True)
+        assert ignore_matcher.is_ignored('a/b/cache', is_dir=True)
+        assert ignore_matcher.is_ignored('tmp/file.bak')
+        assert ignore_matcher.is_ignored('tmp/a/b/file.bak')
+        assert not ignore_matcher.is_ignored('other/file.bak')
+
+    def test_negation(self):
+        ignore_matcher = matcher('*.log', '!important.log')
+
+        assert ignore_matcher.is_ignored('debug.log')
+        assert not ignore_matcher.is_ignored('important.log')
+
+    def test_base(self):
+        ignore_matcher = matcher('*.tmp', '/local', base='sub')
+
+        assert ignore_matcher.is_ignored('sub/some.tmp')
+        assert ignore_matcher.is_ignored('sub/deep/some.tmp')
+        assert not ignore_matcher.is_ignored('some.tmp')
+        assert ignore_matcher.is_ignored('sub/local', is_dir=True)
+        assert not ignore_matcher.is_ignored('sub/deep/local', is_dir=True)
+
+    def test_character_class(self):
+        ignore_matcher = matcher('file[0-9].txt', 'x[!a].txt')
+
+        assert ignore_matcher.is_ignored('file1.txt')
+        assert not ignore_matcher.is_ignored('filea.txt')
+        assert ignore_matcher.is_ignored('xb.txt')
+        assert not ignore_matcher.is_ignored('xa.txt')
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is available only on Linux')
+class TestActivityWatcher:
+    @pytest.fixture
+    def repo(self, tmp_path):
+        (tmp_path / '.git').mkdir()
+        (tmp_path / 'src' / 'package').mkdir(parents=True)
+        (tmp_path / 'build').mkdir()
+        (tmp_path / '.gitignore').write_text('build/\n*.swp\n')
+        return tmp_path
+
+    def test_watches(self, repo):
+        watcher = activity.ActivityWatcher(repo)
+
+        try:
+            assert sorted(watcher._watches.values()) == ['', 'src', 'src/package']
+        finally:
+            watcher.close()
+
+    def test_max_watches(self, repo):
+        watcher = activity.ActivityWatcher(repo, max_watches=2)
+
+        try:
+            assert sorted(watcher._watches.values()) == ['', 'src']
+            assert watcher.limit_reached
+        finally:
+            watcher.close()
+
+    def test_activity(self, repo):
+        watcher = activity.ActivityWatcher(repo)
+        watcher.last_activity -= 10
+
+        try:
+            (repo / 'build' / 'output.o').write_text('ignored folder')
+            (repo / 'src' / 'file.swp').write_text('ignored file')
+            assert not watcher.process_events(0.1)
+
+            (repo / 'src' / 'package' / 'module.py').write_text('activity')
+            assert watcher.process_events(0.1)
+        finally:
+            watcher.close()
+
+    def test_new_directory_watched(self, repo):
+        watcher = activity.ActivityWatcher(repo)
+
+        try:
+            (repo / 'src' / 'new').mkdir()
+            watcher.process_events(0.1)
+            assert 'src/new' in watcher._watches.values()
+        finally:
+            watcher.close()
+
+
+class TestAutoPauser:
+    def pauser(self, running, paused=False, last_activity_ago=0):
+        config = mock.MagicMock(events_workers=1, events_timeout=1)
+        config.store = mock.MagicMock(**{'__getitem__.side_effect': {'running': running, 'paused': paused}.get})
+        watcher = mock.Mock()
+        watcher.last_activity = activity.time.time() - last_activity_ago
+        return activity.AutoPauser(config, mock.Mock(), watcher, idle_timeout=60)
+
+    def test_pause_when_idle(self):
+        pauser = self.pauser(running=True, last_activity_ago=120)
+        pauser.watcher.process_events.return_value = False
+
+        pauser.run_once()
+
+        assert pauser.provider.pause.called
+        pauser.config.store.__setitem__.assert_called_with('paused', True)
+
+    def test_pause_includes_pending_commits(self):
+        pauser = self.pauser(running=True, last_activity_ago=120)
+        pauser.watcher.process_events.return_value = False
+        pauser.provider.pause.return_value = None
+
+        with mock.patch.object(activity.commits, 'take_pending', return_value=[['aaa', 'Deferred commit']]):
+            pauser.run_once()
+
+        assert pauser.provider.pause.call_args[0][1] == 'Deferred commit'
+
+    def test_no_pause_when_active(self):
+        pauser = self.pauser(running=True, last_activity_ago=10)
+        pauser.watcher.process_events.return_value = False
+
+        pauser.run_once()
+
+        assert not pauser.provider.pause.called
+
+    def test_resume(self):
+        pauser = self.pauser(running=False, paused=True)
+        pauser.watcher.process_events.return_value = True
+
+        pauser.run_once()
+
+        assert pauser.provider.start.called
+        pauser.config.store.__setitem__.assert_called_with('paused', False)
+
+    def test_not_resumed_when_stopped(self):
+        pauser = self.pauser(running=False, paused=False)
+        pauser.watcher.process_events.return_value = True
+
+        pauser.run_once()
+
+        assert not pauser.provider.start.called
@@ -0,0 +1,155 @@
+import collections
+import threading
+
+import git
+import pytest
+
+from gitrack import api, config, exceptions, profiling, transport
+
+LOCAL_CONFIG = """[gitrack]
+provider = local
+update_check = False
+
+[local]
+storage = jsonl
+"""
+
+
+@pytest.fixture()
+def session(tmp_path, monkeypatch):
+    monkeypatch.setenv('GITRACK_STORAGE', str(tmp_path / 'storage'))
+    return api.Session()
+
+
+@pytest.fixture()
+def make_repo(tmp_path):
+    def make(name, initialize=True):
+        repo_dir = tmp_path / name
+        git.Repo.init(str(repo_dir))
+
+        if initialize:
+            (repo_dir / '.gitrack').write_text(LOCAL_CONFIG)
+            config.Store.init_repo(repo_dir.resolve())
+
+        return repo_dir
+
+    return make
+
+
+def test_start_stop(session, make_repo):
+    repo_dir = make_repo('repo')
+    (repo_dir / 'folder').mkdir()
+
+    status = session.start(repo_dir / 'folder')
+    assert status.running
+    assert status.repo_dir == repo_dir.resolve()
+    assert status.provider == 'local'
+    assert status.since is not None
+
+    assert session.status(str(repo_dir), remote=True).entry is not None
+
+    stopped = session.stop(repo_dir, description='Some work')
+    assert not stopped.status.running
+    assert stopped.entry.start <= stopped.entry.stop
+
+    assert not session.status(repo_dir).running
+
+
+def test_long_running_process(session, make_repo, monkeypatch):
+    monkeypatch.setattr(profiling, '_phases', collections.deque(maxlen=10))
+    repo_dir = make_repo('repo')
+
+    for _ in range(10):
+        session.start(repo_dir)
+        session.stop(repo_dir)
+
+    assert len(profiling.get_phases()) == 10
+
+
+def test_network_limits_per_repo(session, make_repo, monkeypatch):
+    first_dir = make_repo('first')
+    second_dir = make_repo('second')
+    (second_dir / '.gitrack').write_text(LOCAL_CONFIG.replace('[local]', 'network_retries = 7\n'
+                                                                         'network_read_timeout = 1.5\n\n[local]'))
+
+    limits = {}
+
+    def start(provider, project=None, force=False):
+        limits[provider.config.repo_dir] = transport.current_limits()
+
+    monkeypatch.setattr(session._get(first_dir).provider.__class__, 'start', start)
+    session.start(first_dir)
+    session.start(second_dir)
+
+    assert limits[first_dir.resolve()]['retries'] == config.Config.network_retries
+    assert limits[second_dir.resolve()]['retries'] == 7
+    assert limits[second_dir.resolve()]['read_timeout'] == 1.5
+    assert transport.current_limits() == {}
+
+
+def test_rotate(session, make_repo):
+    repo_dir = make_repo('repo')
+
+    with pytest.raises(exceptions.NotRunningException):
+        session.rotate(repo_dir, 'Some work')
+
+    session.start(repo_dir)
+    first = session.rotate(repo_dir, 'Some work')
+    second = session.rotate(repo_dir, 'Other work')
+
+    assert first.status.running and second.status.running
+    assert first.entry.id != second.entry.id
+
+
+def test_cancel(session, make_repo):
+    repo_dir = make_repo('repo')
+    session.start(repo_dir)
+
+    assert not session.cancel(repo_dir).running
+    assert not session.status(repo_dir, remote=True).entry
+
+
+def test_state_changed_outside(session, make_repo):
+    repo_dir = make_repo('repo')
+    session.start(repo_dir)
+
+    store = config.Store.get_for_repo(repo_dir.resolve())
+    store['running'] = False
+    store.save()
+
+    assert not session.status(repo_dir).running
+
+
+def test_errors(session, make_repo, tmp_path):
+    with pytest.raises(exceptions.UninitializedRepoException):
+        session.status(make_repo('uninitialized', initialize=False))
+
+    (tmp_path / 'not-repo').mkdir()
+    with pytest.raises(exceptions.GitrackException):
+        session.status(tmp_path / 'not-repo')
+
+
+def test_threads(session, make_repo):
+    repos = [make_repo('repo-{}'.format(index)) for index in range(4)]
+    errors = []
+
+    def work(repo_dir, rotate):
+        try:
+            for _ in range(5):
+                session.start(repo_dir)
+                if rotate:
+                    session.rotate(repo_dir, 'Some work')
+                session.stop(repo_dir)
+        except Exception as e:  # noqa
+            errors.append(e)
+
+    # Half of the repos are used by two threads at once, their calls interleave so they can't rotate
+    threads = [threading.Thread(target=work, args=(repo_dir, True)) for repo_dir in repos[:2]]
+    threads += [threading.Thread(target=work, args=(repo_dir, False)) for repo_dir in repos[2:] * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert not any(session.status(repo_dir).running for repo_dir in repos)
@@ -0,0 +1,95 @@
+import json
+from unittest import mock
+
+import pytest
+import requests
+
+from gitrack import cassette, exceptions, transport
+
+TOKEN = 'abcdef0123456789abcdef'
+
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setenv('GITRACK_STORAGE', str(tmp_path))
+    (tmp_path / 'data').mkdir()
+    monkeypatch.setattr(cassette, '_sessions', {})
+    transport.configure(retries=0, rate_limit=0)
+
+
+def response(status, body):
+    result = requests.Response()
+    result.status_code = status
+    result.headers['Set-Cookie'] = 'session=secret'
+    result._content = json.dumps(body).encode('utf-8')
+    return result
+
+
+@pytest.fixture()
+def cassette_file(tmp_path, monkeypatch):
+    path = tmp_path / 'cassette.jsonl'
+    monkeypatch.setenv(cassette.RECORD_ENV_VARIABLE, str(path))
+
+    responses = [response(200, {'data': {'id': 1, 'api_token': TOKEN}}), response(200, {'data': {'id': 2}}),
+                 response(500, {})]
+    with mock.patch.object(requests, 'request', side_effect=responses):
+        transport.request('get', 'https://example.com/api/me', auth=(TOKEN, 'api_token'))
+        transport.request('post', 'https://example.com/api/entries?x=1', data='{"token": "abc"}',
+                          headers={'Authorization': 'Basic abc'})
+        transport.request('get', 'https://example.com/api/me', auth=(TOKEN, 'api_token'))
+
+    monkeypatch.delenv(cassette.RECORD_ENV_VARIABLE)
+    return path
+
+
+def test_record(cassette_file):
+    content = cassette_file.read_text()
+    interactions = [json.loads(line) for line in content.splitlines()]
+
+    assert TOKEN not in content and 'secret' not in content
+    assert [(interaction['method'], interaction['status']) for interaction in interactions] == [
+        ('GET', 200), ('POST', 200), ('GET', 500),
+    ]
+    assert json.loads(interactions[1]['request']['body']) == {'token': cassette.REDACTED}
+    assert interactions[1]['request']['headers'] == {'Authorization': cassette.REDACTED}
+
+
+def test_replay(cassette_file, monkeypatch):
+    monkeypatch.setenv(cassette.REPLAY_ENV_VARIABLE, str(cassette_file))
+    monkeypatch.setenv(cassette.REPLAY_SCALE_ENV_VARIABLE, '0')
+
+    with mock.patch.object(requests, 'request') as request_mock:
+        # Requests are matched regardless of the host, in the recorded order
+        assert transport.request('post', 'http://localhost/api/entries?x=1').json() == {'data': {'id': 2}}
+        assert transport.request('get', 'http://localhost/api/me').json()['data']['id'] == 1
+        assert transport.request('get', 'http://localhost/api/me').status_code == 500
+        assert transport.request('get', 'http://localhost/api/me').status_code == 500
+
+        with pytest.raises(exceptions.NetworkException):
+            transport.request('get', 'http://localhost/api/other')
+
+    assert request_mock.call_count == 0
+
+
+def test_replay_latency(tmp_path, monkeypatch):
+    path = tmp_path / 'cassette.jsonl'
+    path.write_text(json.dumps({'method': 'GET', 'url': 'http://example.com/slow', 'elapsed': 2.0,
+                                'error': 'ConnectionError'}) + '\n')
+    monkeypatch.setenv(cassette.REPLAY_ENV_VARIABLE, str(path))
+    monkeypatch.setenv(cassette.REPLAY_SCALE_ENV_VARIABLE, '0.5')
+
+    with mock.patch('time.sleep') as sleep_mock:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            cassette.get_active().send('get', 'http://example.com/slow', timeout=(1, 5))
+        sleep_mock.assert_called_once_with(1.0)
+
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            cassette.get_active().send('get', 'http://example.com/slow', timeout=(0.1, 0.2))
+
+
+def test_record_and_replay_exclusive(monkeypatch):
+    monkeypatch.setenv(cassette.RECORD_ENV_VARIABLE, 'a.jsonl')
+    monkeypatch.setenv(cassette.REPLAY_ENV_VARIABLE, 'b.jsonl')
+
+    with pytest.raises(exceptions.ConfigException):
+        cassette.get_active()
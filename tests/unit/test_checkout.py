@@ -0,0 +1,95 @@
+import datetime
+import json
+import time
+from unittest import mock
+
+import pytest
+
+from gitrack import checkout, TaskParsingModes
+
+
+@pytest.fixture()
+def switcher(tmp_path):
+    store = mock.MagicMock()
+    store_data = {'running': True, 'since': None}
+    store.__getitem__.side_effect = store_data.get
+    store.__setitem__.side_effect = store_data.__setitem__
+
+    config = mock.Mock(repo_data_dir=tmp_path, store=store, tasks_support=True,
+                       tasks_mode=TaskParsingModes.DYNAMIC_BRANCH, tasks_regex=r'#(?P<task>\d+)_.*',
+                       project_support=False, network_connect_timeout=1, network_read_timeout=1, network_deadline=1,
+                       network_retries=0, network_rate_limit=0, network_rate_burst=1, events_workers=1,
+                       events_timeout=1)
+    repo = mock.Mock()
+    repo.active_branch.name = '#456_new'
+
+    return checkout.BranchSwitcher(config, mock.Mock(), repo, debounce=0.05, max_wait=1)
+
+
+def test_record_checkout_keeps_first(tmp_path):
+    checkout.record_checkout(tmp_path, '#1_first')
+    checkout.record_checkout(tmp_path, '#2_second')
+
+    pending = json.loads((tmp_path / checkout.PENDING_FILENAME).read_text())
+    assert pending['from'] == '#1_first'
+    assert sorted(path.name for path in tmp_path.iterdir()) == [checkout.PENDING_FILENAME]
+
+
+def test_get_previous_branch(tmp_path):
+    (tmp_path / 'logs').mkdir()
+    (tmp_path / 'logs' / 'HEAD').write_text('0000 1111 Tester <t@e.com> 1 +0000\tcheckout: moving from master to dev\n')
+
+    assert checkout.get_previous_branch(tmp_path) == 'master'
+
+
+class TestBranchSwitcher:
+    def test_burst_is_coalesced(self, switcher, tmp_path):
+        checkout.record_checkout(tmp_path, '#123_old')
+        checkout.record_checkout(tmp_path, '#789_middle')
+
+        switcher.run()
+
+        switcher.provider.stop.assert_called_once_with(None, task=123)
+        switcher.provider.start.assert_called_once_with(project=None)
+        assert not (tmp_path / checkout.PENDING_FILENAME).exists()
+
+    def test_waits_for_quiet(self, switcher, tmp_path):
+        checkout.record_checkout(tmp_path, '#123_old')
+        started = time.time()
+
+        switcher.run()
+
+        assert time.time() - started >= 0.05
+
+    def test_same_task(self, switcher, tmp_path):
+        switcher.repo.active_branch.name = '#123_other'
+        checkout.record_checkout(tmp_path, '#123_old')
+
+        switcher.run()
+
+        assert switcher.provider.stop.call_count == 0
+
+    def test_entry_started_after_checkout(self, switcher, tmp_path):
+        checkout.record_checkout(tmp_path, '#123_old')
+        switcher.config.store['since'] = datetime.datetime.now() + datetime.timedelta(seconds=1)
+
+        switcher.run()
+
+        assert switcher.provider.stop.call_count == 0
+
+    def test_detached_head(self, switcher, tmp_path):
+        type(switcher.repo).active_branch = mock.PropertyMock(side_effect=TypeError)
+        checkout.record_checkout(tmp_path, '#123_old')
+
+        switcher.run()
+
+        assert switcher.provider.stop.call_count == 0
+
+    def test_locked_by_other_process(self, switcher, tmp_path):
+        checkout.record_checkout(tmp_path, '#123_old')
+
+        with checkout.locking.locked(tmp_path / checkout.LOCK_FILENAME):
+            switcher.run()
+
+        assert switcher.provider.stop.call_count == 0
+        assert (tmp_path / checkout.PENDING_FILENAME).exists()
@@ -0,0 +1,178 @@
+import collections
+import datetime
+import time
+from concurrent import futures
+from unittest import mock
+
+import pytest
+
+from gitrack import commits, locking
+from gitrack.providers import EntryReference
+
+
+@pytest.fixture()
+def processor(tmp_path):
+    store = mock.MagicMock()
+    store_data = {'running': True}
+    store.__getitem__.side_effect = store_data.get
+    store.__setitem__.side_effect = store_data.__setitem__
+
+    config = mock.Mock(repo_data_dir=tmp_path, store=store, tasks_support=False, commit_coalesce_window=0,
+                       commit_min_entry_length=0,
+                       network_connect_timeout=1, network_read_timeout=1, network_deadline=1, network_retries=0,
+                       network_rate_limit=0, network_rate_burst=1, events_workers=1, events_timeout=1)
+    provider = mock.Mock()
+    provider.stop.return_value = None
+
+    repo = mock.Mock()
+    repo.commit.side_effect = lambda sha: mock.Mock(hexsha=sha, message='Message of {}\n'.format(sha))
+
+    return commits.CommitProcessor(config, provider, repo, max_wait=1)
+
+
+def test_queue(tmp_path):
+    commits.enqueue(tmp_path, 'aaa')
+    commits.enqueue(tmp_path, 'bbb', force=True)
+
+    events = commits._take_queue(tmp_path / commits.QUEUE_FILENAME)
+    assert [(event.sha, event.force) for event in events] == [('aaa', False), ('bbb', True)]
+    assert list(tmp_path.iterdir()) == [tmp_path / commits.QUEUE_LOCK_FILENAME]
+
+
+def test_queue_taken_between_appends(tmp_path):
+    queue_file = tmp_path / commits.QUEUE_FILENAME
+    commits.enqueue(tmp_path, 'aaa')
+
+    with futures.ThreadPoolExecutor(max_workers=1) as executor:
+        # Hook which is in the middle of appending the commit
+        with locking.locked(tmp_path / commits.QUEUE_LOCK_FILENAME):
+            taken = executor.submit(commits._take_queue, queue_file)
+            time.sleep(0.1)
+            assert not taken.done()
+
+            with queue_file.open('a') as file:
+                file.write('{"sha":"bbb","at":1,"force":false}\n')
+
+        assert sorted(event.sha for event in taken.result(timeout=5)) == ['aaa', 'bbb']
+
+    assert not queue_file.exists()
+
+
+class TestCommitProcessor:
+    def test_single_commit(self, processor, tmp_path):
+        commits.enqueue(tmp_path, 'aaa')
+
+        assert processor.run()
+
+        processor.provider.stop.assert_called_once_with('Message of aaa', task=None, force=False)
+        processor.provider.start.assert_called_once_with()
+        assert not (tmp_path / commits.QUEUE_FILENAME).exists()
+
+    def test_burst_is_collapsed(self, processor, tmp_path):
+        for sha in ('aaa', 'bbb', 'ccc'):
+            commits.enqueue(tmp_path, sha, force=sha == 'bbb')
+
+        processor.run()
+
+        processor.provider.stop.assert_called_once_with('Message of aaa; Message of bbb; Message of ccc',
+                                                        task=None, force=True)
+        assert processor.provider.start.call_count == 1
+
+    def test_records_commit_entry(self, processor, tmp_path):
+        processor.provider.stop.return_value = EntryReference('1', 100, 200)
+        commits.enqueue(tmp_path, 'aaa')
+
+        processor.run()
+
+        assert processor.config.store['commit_entries'] == {'aaa': ('1', 100, 200)}
+
+    def test_window(self, processor, tmp_path):
+        processor.window = 0.1
+        commits.enqueue(tmp_path, 'aaa')
+        started = time.time()
+
+        processor.run()
+
+        assert time.time() - started >= 0.1
+        assert processor.provider.stop.call_count == 1
+
+    def test_min_entry_length(self, processor, tmp_path):
+        processor.min_length = 60
+        processor.config.store['since'] = datetime.datetime.now()
+
+        for sha in ('aaa', 'bbb'):
+            commits.enqueue(tmp_path, sha)
+            processor.run()
+
+        assert processor.provider.stop.call_count == 0
+        assert processor.config.store[commits.PENDING_STORE_KEY] == [['aaa', 'Message of aaa\n'],
+                                                                     ['bbb', 'Message of bbb\n']]
+
+        processor.config.store['since'] = datetime.datetime.now() - datetime.timedelta(seconds=60)
+        commits.enqueue(tmp_path, 'ccc')
+        processor.run()
+
+        processor.provider.stop.assert_called_once_with('Message of aaa; Message of bbb; Message of ccc',
+                                                        task=None, force=False)
+        assert processor.config.store[commits.PENDING_STORE_KEY] == []
+
+    def test_forced_commit_not_deferred(self, processor, tmp_path):
+        processor.min_length = 60
+        processor.config.store['since'] = datetime.datetime.now()
+        commits.enqueue(tmp_path, 'aaa', force=True)
+
+        processor.run()
+
+        assert processor.provider.stop.call_count == 1
+
+    def test_not_running(self, processor, tmp_path):
+        processor.config.store['running'] = False
+        commits.enqueue(tmp_path, 'aaa')
+
+        processor.run()
+
+        assert processor.provider.stop.call_count == 0
+        assert not (tmp_path / commits.QUEUE_FILENAME).exists()
+
+    def test_locked_by_other_process(self, processor, tmp_path):
+        commits.enqueue(tmp_path, 'aaa')
+
+        with locking.locked(tmp_path / commits.LOCK_FILENAME):
+            assert not processor.run()
+
+        assert processor.provider.stop.call_count == 0
+        assert (tmp_path / commits.QUEUE_FILENAME).exists()
+
+
+def test_describe():
+    assert commits.describe([]) is None
+    assert commits.describe(['Subject\n\nBody\n', None]) == 'Subject\n\nBody'
+    assert commits.describe(['First\n\nBody', 'Second']) == 'First; Second'
+
+
+def test_stop_entry():
+    store = collections.defaultdict(lambda: None, {commits.PENDING_STORE_KEY: [['aaa', 'Message of aaa']]})
+    config = mock.Mock(store=store, events_workers=1, events_timeout=1)
+    provider = mock.Mock()
+    provider.stop.return_value = EntryReference('1', 100, 200)
+
+    commits.stop_entry(config, provider, 'Finished')
+
+    provider.stop.assert_called_once_with('Message of aaa; Finished')
+    assert store[commits.PENDING_STORE_KEY] == []
+    assert store['commit_entries'] == {'aaa': ('1', 100, 200)}
+
+
+def test_stop_entry_paused():
+    store = collections.defaultdict(lambda: None, {commits.PENDING_STORE_KEY: [['aaa', 'Message of aaa']]})
+    config = mock.Mock(store=store, events_workers=1, events_timeout=1)
+    provider = mock.Mock()
+    provider.pause.return_value = EntryReference('1', 100, 150)
+    last_activity = datetime.datetime.fromtimestamp(150)
+
+    commits.stop_entry(config, provider, last_activity=last_activity)
+
+    provider.pause.assert_called_once_with(last_activity, 'Message of aaa')
+    assert not provider.stop.called
+    assert store[commits.PENDING_STORE_KEY] == []
+    assert store['commit_entries'] == {'aaa': ('1', 100, 150)}
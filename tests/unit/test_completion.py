@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+from unittest import mock
+
+import pytest
+
+from gitrack import cli, completion
+
+BASH_COMPLETE = '''
+source "$1"
+shift
+COMP_WORDS=("$@")
+COMP_CWORD=$(( ${#COMP_WORDS[@]} - 1 ))
+_gitrack_complete
+printf '%s\\n' "${COMPREPLY[@]}"
+'''
+
+
+@pytest.fixture()
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setenv('GITRACK_STORAGE', str(tmp_path / 'storage'))
+    return tmp_path / 'storage'
+
+
+@pytest.fixture()
+def bash_complete(storage, tmp_path):
+    script = tmp_path / 'gitrack.bash'
+    script.write_text(completion.generate('bash', cli.cli))
+
+    def complete(*words):
+        output = subprocess.check_output(['bash', '-c', BASH_COMPLETE, 'bash', str(script), 'gitrack'] + list(words),
+                                         universal_newlines=True, cwd=str(tmp_path))
+        return [line for line in output.splitlines() if line]
+
+    return complete
+
+
+class TestBashCompletion:
+    def test_commands(self, bash_complete):
+        assert bash_complete('st') == ['start', 'state', 'stats', 'status', 'stop']
+        assert bash_complete('state', '') == ['list', 'migrate']
+        assert bash_complete('-q', 'hooks', 'post-c') == ['post-checkout', 'post-commit']
+
+    def test_options(self, bash_complete):
+        assert bash_complete('export', '--f') == ['--format']
+        assert bash_complete('profile', 'show', '--') == ['--limit', '--functions', '--help']
+
+    def test_option_choices(self, bash_complete):
+        assert bash_complete('export', '--format', '') == ['jsonl', 'csv']
+        assert bash_complete('export', '-f', 'c') == ['csv']
+        assert bash_complete('stop', '--description', '') == []
+
+    def test_argument_choices(self, bash_complete):
+        assert bash_complete('completion', 'show', 'z') == ['zsh']
+
+    def test_dynamic_values(self, bash_complete, storage):
+        assert bash_complete('stats', '--repo', '') == []
+
+        values_dir = storage / 'data' / completion.VALUES_FOLDER
+        values_dir.mkdir(parents=True)
+        (values_dir / 'repos').write_text('/home/user/some repo\n/home/user/other\n')
+
+        assert bash_complete('stats', '--repo', '/home/user/s') == ['/home/user/some repo']
+
+
+def test_click_completion_imported_lazily():
+    code = 'import sys, gitrack.cli; print("click_completion" in sys.modules)'
+    output = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True,
+                                     env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(cli.__file__))))
+
+    assert output.strip() == 'False'
+
+
+def test_fish_script():
+    script = completion.generate('fish', cli.cli)
+
+    assert "complete -c gitrack -n 'test (__gitrack_path) = \\'export\\'' -l format -s f -x -a 'jsonl csv'" in script
+    assert "-l repo -s r -x -a '(__gitrack_values repos)'" in script
+
+
+def test_update_values(storage):
+    completion.update_values()
+    assert not (storage / 'data' / completion.VALUES_FOLDER).exists()
+
+    (storage / 'data' / completion.VALUES_FOLDER).mkdir(parents=True)
+    with mock.patch('gitrack.state.known_repos', return_value=['/b', '/a']):
+        completion.update_values()
+
+    assert (storage / 'data' / completion.VALUES_FOLDER / 'repos').read_text() == '/a\n/b\n'
+
+
+def test_install(storage, tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+
+    with mock.patch('gitrack.state.known_repos', return_value=[]):
+        path = completion.install('bash', cli.cli)
+        completion.install('bash', cli.cli)
+
+    assert path == storage / 'data' / completion.VALUES_FOLDER / 'gitrack.bash'
+    assert (tmp_path / '.bash_completion').read_text().count("source '{}'".format(path)) == 1
@@ -0,0 +1,149 @@
+import datetime
+import pathlib
+import time
+
+import git
+import pytest
+
+from gitrack import estimate
+
+HOUR = 3600
+START = int(time.mktime((2019, 10, 14, 9, 0, 0, 0, 0, -1)))  # Monday
+SETTINGS = estimate.Settings(2 * HOUR, HOUR // 2, r'^(?P<task>[A-Z]+-\d+)', None)
+
+
+@pytest.fixture()
+def repo(tmp_path, monkeypatch):
+    monkeypatch.setenv('GITRACK_STORAGE', str(tmp_path / 'storage'))
+    return git.Repo.init(str(tmp_path / 'repo'))
+
+
+def commit(repo, email, timestamp, message='Some work'):
+    actor = git.Actor(email.split('@')[0], email)
+    date = '{} +0000'.format(timestamp)
+    repo.index.commit(message, author=actor, committer=actor, author_date=date, commit_date=date)
+
+
+def run(repo, **kwargs):
+    repo_dir = pathlib.Path(repo.working_dir)
+    return estimate.estimate({repo_dir: SETTINGS}, **kwargs)[repo_dir]
+
+
+def test_sessions():
+    author = {'last': None, 'days': {}}
+    commits = [(START, ''), (START + HOUR, 'ABC-1'), (START + 5 * HOUR, 'ABC-1'), (START + 5 * HOUR + 60, 'ABC-2')]
+    estimate.add_commits(author, commits, SETTINGS)
+
+    assert author == {'last': START + 5 * HOUR + 60, 'days': {'2019-10-14': {
+        '': [HOUR // 2, 1], 'ABC-1': [HOUR + HOUR // 2, 2], 'ABC-2': [60, 1],
+    }}}
+
+
+def test_estimate(repo):
+    commit(repo, 'a@example.com', START, 'ABC-1 Start')
+    commit(repo, 'b@example.com', START + HOUR // 2)
+    commit(repo, 'a@example.com', START + HOUR, 'ABC-1 Finish')
+
+    authors = run(repo, jobs=1)
+    assert authors == run(repo, jobs=3, rebuild=True)
+
+    assert estimate.summarize([authors], estimate.PERIOD_TOTAL) == [
+        estimate.Row('a@example.com', 'ABC-1', 'total', 1.5, 2),
+        estimate.Row('b@example.com', None, 'total', 0.5, 1),
+    ]
+
+
+def test_incremental(repo, monkeypatch):
+    commit(repo, 'a@example.com', START)
+    run(repo, jobs=1)
+
+    commit(repo, 'a@example.com', START + HOUR)
+    commit(repo, 'b@example.com', START + HOUR)
+
+    read_commits = []
+    original_read_log = estimate._read_log
+
+    def read_log(repo_dir, exclude=None, authors=None):
+        for commit in original_read_log(repo_dir, exclude, authors):
+            read_commits.append(commit)
+            yield commit
+
+    monkeypatch.setattr(estimate, '_read_log', read_log)
+    authors = run(repo, jobs=1)
+
+    assert len(read_commits) == 2
+    assert authors == run(repo, jobs=1, rebuild=True)
+    assert authors['a@example.com']['days']['2019-10-14'][''] == [HOUR + HOUR // 2, 2]
+
+
+def test_out_of_order(repo):
+    commit(repo, 'a@example.com', START)
+    commit(repo, 'a@example.com', START + 4 * HOUR)
+    run(repo, jobs=1)
+
+    # Branch with commit made in between the already processed ones
+    repo.git.checkout('HEAD~1', b='feature')
+    commit(repo, 'a@example.com', START + 2 * HOUR)
+
+    authors = run(repo, jobs=1)
+    assert authors == run(repo, jobs=1, rebuild=True)
+    assert authors['a@example.com']['days']['2019-10-14'][''] == [HOUR // 2 + 4 * HOUR, 3]
+
+
+def test_history_streamed_once(repo, monkeypatch):
+    for i in range(10):
+        commit(repo, '{}@example.com'.format(i), START + i * 60)
+
+    streamed = []
+    original_read_log = estimate._read_log
+
+    def read_log(repo_dir, exclude=None, authors=None):
+        streamed.append(repo_dir)
+        return original_read_log(repo_dir, exclude, authors)
+
+    monkeypatch.setattr(estimate, '_read_log', read_log)
+    monkeypatch.setattr(estimate, 'BATCH_SIZE', 2)
+    authors = run(repo, jobs=3)
+
+    assert streamed == [repo.working_dir]
+    assert authors == run(repo, jobs=1, rebuild=True)
+    assert len(authors) == 10
+
+
+def test_amended(repo):
+    commit(repo, 'a@example.com', START)
+    commit(repo, 'a@example.com', START + HOUR, 'ABC-1 Some work')
+    run(repo, jobs=1)
+
+    # Amended commit keeps its author's time
+    repo.git.commit('--amend', '--allow-empty', '-m', 'ABC-2 Some work', '-m', 'Details',
+                    env={'GIT_COMMITTER_NAME': 'a', 'GIT_COMMITTER_EMAIL': 'a@example.com'})
+
+    authors = run(repo, jobs=1)
+    assert authors == run(repo, jobs=1, rebuild=True)
+    assert authors['a@example.com']['days']['2019-10-14'] == {'': [HOUR // 2, 1], 'ABC-2': [HOUR, 1]}
+
+
+def test_task_from_whole_message(repo):
+    settings = estimate.Settings(2 * HOUR, HOUR // 2, r'Refs: (?P<task>[A-Z]+-\d+)', None)
+    commit(repo, 'a@example.com', START, 'Some work\n\nRefs: ABC-1\n')
+
+    repo_dir = pathlib.Path(repo.working_dir)
+    authors = estimate.estimate({repo_dir: settings}, jobs=1)[repo_dir]
+    assert authors['a@example.com']['days']['2019-10-14'] == {'ABC-1': [HOUR // 2, 1]}
+
+
+def test_periods():
+    authors = {'a@example.com': {'last': None, 'days': {
+        '2019-10-13': {'': [HOUR, 1]},
+        '2019-10-14': {'': [HOUR, 1]},
+        '2019-11-01': {'': [HOUR, 1]},
+    }}}
+
+    assert [(row.period, row.hours) for row in estimate.summarize([authors, authors], estimate.PERIOD_WEEK)] == [
+        ('2019-W41', 2), ('2019-W42', 2), ('2019-W44', 2),
+    ]
+    assert [(row.period, row.hours) for row in estimate.summarize([authors], estimate.PERIOD_MONTH,
+                                                                  since=datetime.date(2019, 10, 14))] == [
+        ('2019-10', 1), ('2019-11', 1),
+    ]
@@ -0,0 +1,137 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from gitrack import events, metrics, plugins, transport
+
+
+@pytest.fixture(autouse=True)
+def reset(monkeypatch):
+    monkeypatch.setattr(events, '_pipeline', None)
+    metrics.reset()
+
+
+def event(name=events.COMMIT):
+    return events.Event(name, None, time.time(), {})
+
+
+def test_concurrent_handlers():
+    def slow(_):
+        time.sleep(0.2)
+
+    pipeline = events.Pipeline([('a', slow), ('b', slow), ('c', slow)], workers=3)
+
+    started = time.monotonic()
+    pipeline.publish(event(), timeout=5)
+    pipeline.drain()
+
+    assert time.monotonic() - started < 0.4
+
+
+def test_finished_tasks_are_released():
+    pipeline = events.Pipeline([('a', lambda _: None), ('b', lambda _: None)], workers=2)
+
+    for _ in range(200):
+        pipeline.publish(event(), timeout=5)
+
+    for _ in range(50):
+        if not pipeline._pending:
+            break
+        time.sleep(0.01)
+
+    assert not pipeline._pending
+
+
+def test_network_limits_passed():
+    received = []
+    pipeline = events.Pipeline([('a', lambda _: received.append(transport.current_limits()))], workers=1)
+
+    with transport.budget(10, retries=5):
+        pipeline.publish(event(), timeout=5)
+    pipeline.drain()
+
+    assert received == [{'retries': 5}]
+
+
+def test_hanging_handler_replaced():
+    release = threading.Event()
+    received = []
+
+    @events.subscribe(timeout=0.1)
+    def hanging(e):
+        release.wait(5)
+        raise RuntimeError('Failed after its timeout')
+
+    pipeline = events.Pipeline([('hanging', hanging)], workers=1)
+    pipeline.publish(event(), timeout=5)
+    pipeline.drain()
+    assert metrics._counters['handler_failures'] == 1
+
+    # The only worker is still blocked by the hanging handler
+    pipeline.handlers = [('ok', received.append)]
+    pipeline.publish(event(events.START), timeout=5)
+    pipeline.drain()
+    assert [e.name for e in received] == [events.START]
+
+    release.set()
+    for _ in range(50):
+        if not pipeline._running:
+            break
+        time.sleep(0.01)
+
+    assert metrics._counters['handler_failures'] == 1
+    assert len(pipeline._threads) == 1
+
+
+def test_subscribe():
+    received = []
+
+    @events.subscribe(events.START, events.STOP)
+    def handler(e):
+        received.append(e.name)
+
+    pipeline = events.Pipeline([('handler', handler)], workers=1)
+    for name in (events.START, events.COMMIT, events.STOP):
+        pipeline.publish(event(name), timeout=5)
+    pipeline.drain()
+
+    assert received == [events.START, events.STOP]
+
+
+def test_timeout_and_failure():
+    release = threading.Event()
+
+    @events.subscribe(timeout=0.1)
+    def hanging(_):
+        release.wait(5)
+
+    def failing(_):
+        raise RuntimeError('Broken handler')
+
+    received = []
+    pipeline = events.Pipeline([('hanging', hanging), ('failing', failing), ('ok', received.append)], workers=2)
+
+    started = time.monotonic()
+    pipeline.publish(event(), timeout=5)
+    pipeline.drain()
+    release.set()
+
+    assert time.monotonic() - started < 1
+    assert len(received) == 1
+    assert metrics._counters['handler_failures'] == 2
+
+
+def test_publish(tmp_path):
+    received = []
+    config = mock.Mock(repo_dir=tmp_path, events_workers=2, events_timeout=1)
+
+    with mock.patch.object(plugins, 'load_handlers', return_value=[('test', received.append),
+                                                                     ('metrics', metrics.count_event)]):
+        events.publish(config, events.STOP, description='Some work', task=None, entry=None)
+        events.drain()
+
+    assert received[0].repo_dir == tmp_path
+    assert received[0].data == {'description': 'Some work', 'task': None, 'entry': None}
+    assert metrics._counters['events'] == 1
@@ -0,0 +1,97 @@
+import datetime
+import time
+from unittest import mock
+
+import pytest
+
+from gitrack import exceptions
+from gitrack.providers import EntryReference, EntryRewrite
+from gitrack.providers.local import LocalProvider
+
+
+@pytest.fixture(params=['sqlite', 'jsonl'])
+def provider(request, tmp_path, monkeypatch):
+    monkeypatch.setenv('GITRACK_STORAGE', str(tmp_path))
+    (tmp_path / 'repo_data').mkdir()
+
+    config = mock.Mock(repo_dir=tmp_path / 'repo', repo_data_dir=tmp_path / 'repo_data', store={})
+    config.get_providers_config.return_value = {'storage': request.param, 'tags': "['gitrack']"}
+    return LocalProvider(config)
+
+
+class TestLocalProvider:
+    def test_start_stop(self, provider):
+        provider.start(project=123)
+        assert provider.is_running()
+        assert provider.config.store['running']
+
+        provider.stop('Some message', task='abc')
+        assert not provider.is_running()
+
+        entries = list(provider.export())
+        assert len(entries) == 1
+        assert entries[0]['description'] == 'Some message'
+        assert entries[0]['project'] == '123'
+        assert entries[0]['task'] == 'abc'
+        assert entries[0]['tags'] == ['gitrack']
+        assert entries[0]['stop'] is not None
+
+    def test_running_entry(self, provider):
+        provider.start()
+
+        with pytest.raises(exceptions.RunningEntry):
+            provider.start()
+
+        provider.start(force=True)
+        entries = list(provider.export())
+        assert len(entries) == 2
+        assert entries[0]['stop'] is not None
+        assert entries[1]['stop'] is None
+
+    def test_cancel(self, provider):
+        provider.start()
+        provider.cancel()
+
+        assert not provider.is_running()
+        assert list(provider.export()) == []
+
+    def test_pause(self, provider):
+        provider.start()
+        last_activity = datetime.datetime.now()
+        time.sleep(0.01)
+
+        provider.pause(last_activity)
+
+        entry = list(provider.export())[0]
+        assert entry['stop'] == last_activity.isoformat()
+        assert not provider.config.store['running']
+
+    def test_pause_described(self, provider):
+        provider.start()
+        last_activity = datetime.datetime.now()
+
+        reference = provider.pause(last_activity, 'Deferred commit')
+
+        entry = list(provider.export())[0]
+        assert entry['description'] == 'Deferred commit'
+        assert reference.id == entry['id']
+
+    def test_export_since(self, provider):
+        provider.start()
+        provider.stop('first')
+
+        assert list(provider.export(since=datetime.datetime.now() + datetime.timedelta(hours=1))) == []
+
+    def test_rewrite(self, provider):
+        provider.start()
+        first = provider.stop('first')
+        provider.start()
+        second = provider.stop('second')
+
+        provider.rewrite([EntryRewrite(EntryReference(first.id, first.start, second.stop), 'squashed', [second])])
+
+        entries = list(provider.export())
+        assert len(entries) == 1
+        assert entries[0]['id'] == first.id
+        assert entries[0]['description'] == 'squashed'
+        assert entries[0]['stop'] == datetime.datetime.fromtimestamp(second.stop).isoformat()
@@ -0,0 +1,22 @@
+import pytest
+
+from gitrack import metrics
+
+
+@pytest.mark.parametrize('count,percent,expected', (
+    (10, 50, 5),
+    (10, 90, 9),
+    (20, 95, 19),
+    (100, 50, 50),
+    (100, 95, 95),
+    (100, 99, 99),
+    (100, 100, 100),
+    (3, 0, 1),
+    (1, 99, 1),
+))
+def test_percentile(count, percent, expected):
+    assert metrics.percentile(list(range(1, count + 1)), percent) == expected
+
+
+def test_percentile_empty():
+    assert metrics.percentile([], 95) == 0.0
@@ -0,0 +1,122 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from gitrack import exceptions, transport, Providers
+from gitrack.providers import STATUS_FILENAME
+from gitrack.providers.local import LocalProvider
+from gitrack.providers.multi import MultiProvider
+
+
+class MirrorProvider(LocalProvider):
+    NAME = 'mirror'
+
+
+class FakeStore(dict):
+    def __init__(self):
+        super().__init__()
+        self.writers = set()
+
+    def __getitem__(self, item):
+        return self.get(item)
+
+    def __setitem__(self, key, value):
+        self.writers.add(threading.get_ident())
+        super().__setitem__(key, value)
+
+
+@pytest.fixture()
+def provider(tmp_path, monkeypatch):
+    monkeypatch.setenv('GITRACK_STORAGE', str(tmp_path))
+    (tmp_path / 'repo_data').mkdir()
+
+    config = mock.Mock(repo_dir=tmp_path / 'repo', repo_data_dir=tmp_path / 'repo_data', store=FakeStore())
+    config.get_providers_config.side_effect = lambda name: {'storage': 'jsonl',
+                                                            'path': str(tmp_path / '{}.jsonl'.format(name))}
+
+    return MultiProvider.bind('local, mirror', [LocalProvider, MirrorProvider])(config)
+
+
+def entries(provider):
+    return [list(member.export()) for member in provider.providers]
+
+
+class TestMultiProvider:
+    def test_mirrored(self, provider):
+        provider.start(project='abc')
+        assert provider.is_running()
+        assert provider.config.store['running']
+
+        reference = provider.stop('Some message')
+        assert not provider.config.store['running']
+
+        primary_entries, mirror_entries = entries(provider)
+        assert reference.id == primary_entries[0]['id']
+        assert [entry['description'] for entry in mirror_entries] == ['Some message']
+        assert mirror_entries[0]['project'] == 'abc'
+
+    def test_failing_mirror(self, provider):
+        with mock.patch.object(MirrorProvider, 'start', side_effect=exceptions.ProviderException('mirror', 'Down')):
+            provider.start()
+
+        assert provider.config.store['running']
+        assert [len(member_entries) for member_entries in entries(provider)] == [1, 0]
+
+        provider.stop('Some message')
+        assert [len(member_entries) for member_entries in entries(provider)] == [1, 0]
+
+    def test_failing_primary(self, provider):
+        provider.primary.start()
+        (provider.config.repo_data_dir / STATUS_FILENAME).write_text('')
+        provider.config.store.clear()
+
+        with pytest.raises(exceptions.RunningEntry):
+            provider.start()
+
+        # The mirror's entry is rolled back and the state follows the primary provider
+        assert [len(member_entries) for member_entries in entries(provider)] == [1, 0]
+        assert provider.config.store == {}
+        assert (provider.config.repo_data_dir / STATUS_FILENAME).read_text() == ''
+
+        provider.start(force=True)
+        assert [len(member_entries) for member_entries in entries(provider)] == [2, 1]
+
+    def test_state_written_by_primary(self, provider):
+        provider.start()
+        assert provider.config.store['running']
+        assert (provider.config.repo_data_dir / STATUS_FILENAME).read_text()
+
+        provider.stop('Some message')
+        assert not provider.config.store['running']
+        assert (provider.config.repo_data_dir / STATUS_FILENAME).read_text() == ''
+
+        # The mirror runs in another thread, but only the primary provider writes the tracking state
+        assert provider.config.store.writers == {threading.get_ident()}
+        assert [len(member_entries) for member_entries in entries(provider)] == [1, 1]
+
+    def test_budget_propagated(self, provider):
+        budgets = {}
+
+        def start(member, project=None, force=False):
+            budgets[threading.get_ident()] = transport.remaining_budget(), transport.current_limits()
+
+        with mock.patch.object(LocalProvider, 'start', start), mock.patch.object(MirrorProvider, 'start', start):
+            with transport.budget(100, retries=5):
+                provider.start()
+
+        assert len(budgets) == 2
+        assert all(budget > 90 for budget, _ in budgets.values())
+        assert all(limits == {'retries': 5} for _, limits in budgets.values())
+
+
+def test_providers_list():
+    assert Providers('local ,mirror').names == ['local', 'mirror']
+    assert Providers('local').klass() is LocalProvider
+
+    with pytest.raises(exceptions.ConfigException):
+        Providers('local, local').klass()
+
+    provider_class = Providers('local, toggl').klass()
+    assert issubclass(provider_class, MultiProvider)
+    assert provider_class.support_rewrite and provider_class.support_export
@@ -0,0 +1,97 @@
+import importlib
+import json
+import sys
+from unittest import mock
+
+import pytest
+
+from gitrack import plugins, exceptions, Providers
+from gitrack.providers.toggl import TogglProvider
+
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setenv('GITRACK_STORAGE', str(tmp_path))
+    monkeypatch.setattr(plugins, '_registry', None)
+    monkeypatch.setattr(plugins, '_handlers_registry', None)
+    monkeypatch.setattr(plugins, '_environment_key', lambda: [['/site-packages', 1.0]])
+
+
+def entry_points(*pairs):
+    return mock.patch.object(plugins, '_iter_entry_points', return_value=iter(pairs))
+
+
+class TestRegistry:
+    def test_builtin_fallback(self):
+        with entry_points():
+            assert plugins.get_registry() == plugins.BUILTIN_PROVIDERS
+
+    def test_entry_points(self):
+        with entry_points(('other', 'other_package:OtherProvider')):
+            assert plugins.get_registry()['other'] == 'other_package:OtherProvider'
+
+    def test_cached(self, monkeypatch):
+        with entry_points(('other', 'other_package:OtherProvider')):
+            plugins.get_registry()
+
+        monkeypatch.setattr(plugins, '_registry', None)
+        with entry_points() as discovery_mock:
+            assert 'other' in plugins.get_registry()
+            assert not discovery_mock.called
+
+        cached = json.loads(plugins._get_cache_file().read_text())
+        assert cached['key'] == [['/site-packages', 1.0]]
+
+    def test_cache_invalidated(self, monkeypatch):
+        with entry_points(('other', 'other_package:OtherProvider')):
+            plugins.get_registry()
+
+        monkeypatch.setattr(plugins, '_registry', None)
+        monkeypatch.setattr(plugins, '_environment_key', lambda: [['/site-packages', 2.0]])
+        with entry_points():
+            assert 'other' not in plugins.get_registry()
+
+
+    def test_discovery_unavailable(self, monkeypatch):
+        monkeypatch.delattr(importlib, 'metadata', raising=False)
+        monkeypatch.setitem(sys.modules, 'importlib.metadata', None)
+        monkeypatch.setitem(sys.modules, 'pkg_resources', None)
+
+        assert plugins.get_registry() == plugins.BUILTIN_PROVIDERS
+        assert plugins.load_provider('toggl') is TogglProvider
+
+
+class TestLoadProvider:
+    def test_load(self):
+        with entry_points():
+            assert plugins.load_provider('toggl') is TogglProvider
+            assert Providers('toggl').klass() is TogglProvider
+
+    def test_unknown(self):
+        with entry_points():
+            with pytest.raises(exceptions.ConfigException):
+                plugins.load_provider('unknown')
+
+    def test_uninstalled(self):
+        with mock.patch.object(plugins, '_iter_entry_points', side_effect=[
+            iter([('other', 'not_existing_package:Provider')]), iter([])
+        ]):
+            with pytest.raises(exceptions.ConfigException):
+                plugins.load_provider('other')
+
+
+class TestLoadHandlers:
+    def test_load(self):
+        with entry_points(('broken', 'not_existing_package:handler'), ('dump', 'json:dumps')):
+            assert plugins.get_handlers_registry()['metrics'] == plugins.BUILTIN_HANDLERS['metrics']
+            assert [name for name, _ in plugins.load_handlers()] == ['dump', 'metrics']
+
+        # Providers are cached separately
+        assert plugins._get_cache_file(plugins.HANDLERS_ENTRY_POINT_GROUP) != plugins._get_cache_file()
+
+
+def test_providers_compatibility():
+    with entry_points():
+        assert Providers.TOGGL == Providers('toggl')
+        assert str(Providers.TOGGL) == 'toggl'
+        assert list(Providers) == [Providers('local'), Providers.TOGGL]
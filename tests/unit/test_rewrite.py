@@ -0,0 +1,68 @@
+import collections
+
+from gitrack import helpers
+from gitrack.providers import EntryReference, EntryRewrite
+
+
+def test_parse_rewritten_commits():
+    lines = ['aaa 111\n', 'bbb 222 extra\n', 'ccc 222\n', '\n']
+
+    assert helpers.parse_rewritten_commits(lines) == {'111': ['aaa'], '222': ['bbb', 'ccc']}
+
+
+def test_record_commit_entry(monkeypatch):
+    monkeypatch.setattr(helpers, 'MAX_COMMIT_ENTRIES', 2)
+    store = {helpers.COMMIT_ENTRIES_STORE_KEY: None}
+
+    for i in range(3):
+        helpers.record_commit_entry(store, str(i), EntryReference(i, i, i + 1))
+
+    assert list(store[helpers.COMMIT_ENTRIES_STORE_KEY].items()) == [('1', (1, 1, 2)), ('2', (2, 2, 3))]
+
+
+class TestPlanRewrites:
+    def test_amend(self):
+        commit_entries = collections.OrderedDict([('aaa', ('1', 100, 200))])
+
+        rewrites = helpers.plan_rewrites(commit_entries, {'bbb': ['aaa']}, lambda sha: 'New message')
+
+        assert rewrites == [EntryRewrite(EntryReference('1', 100, 200), 'New message', [])]
+        assert commit_entries == {'bbb': ('1', 100, 200)}
+
+    def test_squash_contiguous(self):
+        commit_entries = collections.OrderedDict([('aaa', ('1', 100, 200)), ('bbb', ('2', 210, 300))])
+
+        rewrites = helpers.plan_rewrites(commit_entries, {'ccc': ['aaa', 'bbb']}, lambda sha: 'Squashed')
+
+        assert rewrites == [EntryRewrite(EntryReference('1', 100, 300), 'Squashed', [EntryReference('2', 210, 300)])]
+        assert commit_entries == {'ccc': ('1', 100, 300)}
+
+    def test_squash_with_gap(self):
+        commit_entries = collections.OrderedDict([('aaa', ('1', 100, 200)), ('bbb', ('2', 1000, 1100))])
+
+        rewrites = helpers.plan_rewrites(commit_entries, {'ccc': ['aaa', 'bbb']}, lambda sha: 'Squashed')
+
+        assert [rewrite.entry.id for rewrite in rewrites] == ['1', '2']
+        assert all(rewrite.merged == [] for rewrite in rewrites)
+
+    def test_unknown_commits(self):
+        commit_entries = collections.OrderedDict()
+
+        assert helpers.plan_rewrites(commit_entries, {'bbb': ['aaa']}, lambda sha: 'Message') == []
+        assert commit_entries == {}
+
+
+def test_is_rewriting_commit(tmp_path):
+    (tmp_path / 'logs').mkdir()
+    reflog = tmp_path / 'logs' / 'HEAD'
+
+    reflog.write_text('0000 1111 Tester <t@e.com> 1 +0000\tcommit (initial): First\n')
+    assert not helpers.is_rewriting_commit(tmp_path)
+
+    with reflog.open('a') as file:
+        file.write('1111 2222 Tester <t@e.com> 2 +0000\tcommit (amend): First\n')
+    assert helpers.is_rewriting_commit(tmp_path)
+
+    with reflog.open('a') as file:
+        file.write('2222 3333 Tester <t@e.com> 3 +0000\trebase -i (pick): Second\n')
+    assert helpers.is_rewriting_commit(tmp_path)
@@ -0,0 +1,87 @@
+import os
+import pathlib
+import subprocess
+import sys
+import sysconfig
+
+import pytest
+
+import gitrack
+
+# Modules that are slow to import and are needed only to resolve the version when running from the source tree,
+# or only when the invocation is profiled
+HEAVY_MODULES = ('pkg_resources', 'pbr', 'cProfile', 'pstats')
+
+
+@pytest.mark.parametrize('module', ('gitrack', 'gitrack.main'))
+def test_heavy_modules_not_imported(module):
+    code = 'import sys, {}; print(",".join(name for name in {!r} if name in sys.modules))'.format(module, HEAVY_MODULES)
+    # Other tests change the working directory, so the tested package is explicitly put on the path
+    env = dict(os.environ, PYTHONPATH=str(pathlib.Path(gitrack.__file__).parent.parent))
+    output = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True, env=env)
+
+    assert output.strip() == ''
+
+
+def test_release_launcher(tmp_path):
+    import setup_commands
+
+    root = tmp_path / 'release'
+    (root / 'bin').mkdir(parents=True)
+    (root / 'lib' / 'gitrack').mkdir(parents=True)
+    (root / 'lib' / 'gitrack' / '__init__.py').write_text('')
+    (root / 'lib' / 'gitrack' / 'main.py').write_text(
+        'import sys\n'
+        'def main():\n'
+        '    print(sys.flags.isolated, sys.flags.no_site, sys.argv[0], " ".join(sys.argv[1:]), __file__, sep="|")\n'
+    )
+
+    python = 'python{}.{}'.format(*sys.version_info[:2])
+    setup_commands.write_launcher(str(root / 'bin' / 'gitrack'), python)
+
+    # Installed as symlink on the $PATH
+    (tmp_path / 'path').mkdir()
+    (tmp_path / 'path' / 'gitrack').symlink_to(root / 'bin' / 'gitrack')
+
+    env = dict(os.environ, PATH='{}:{}'.format(pathlib.Path(sys.executable).parent, os.environ['PATH']),
+               PYTHONPATH=str(pathlib.Path(gitrack.__file__).parent.parent))
+    output = subprocess.check_output([str(tmp_path / 'path' / 'gitrack'), 'status', '--verbose'],
+                                     universal_newlines=True, env=env, cwd=str(tmp_path))
+
+    isolated, no_site, prog_name, args, main_file = output.strip().split('|')
+    assert (isolated, no_site, prog_name) == ('1', '1', 'gitrack')
+    assert args == 'status --verbose'
+    assert pathlib.Path(main_file).resolve() == (root / 'lib' / 'gitrack' / 'main.py').resolve()
+
+
+# Not vendored by 'pip install --target' used for the release's lib/
+NOT_VENDORED = ('setuptools', 'pkg_resources', '_distutils_hack')
+
+
+def test_release_launcher_command(tmp_path):
+    import setup_commands
+
+    root = tmp_path / 'release'
+    (root / 'bin').mkdir(parents=True)
+    (root / 'lib').mkdir()
+    (root / 'lib' / 'gitrack').symlink_to(pathlib.Path(gitrack.__file__).parent)
+
+    site_packages = pathlib.Path(sysconfig.get_paths()['purelib'])
+    for path in site_packages.iterdir():
+        if not path.name.startswith(NOT_VENDORED) and path.suffix != '.pth':
+            (root / 'lib' / path.name).symlink_to(path)
+
+    python = 'python{}.{}'.format(*sys.version_info[:2])
+    setup_commands.write_launcher(str(root / 'bin' / 'gitrack'), python)
+
+    repo_dir = tmp_path / 'repo'
+    subprocess.check_call(['git', 'init', '-q', str(repo_dir)])
+    (repo_dir / '.gitrack').write_text('[gitrack]\nprovider = local\nupdate_check = False\n')
+
+    env = dict(os.environ, PATH='{}:{}'.format(pathlib.Path(sys.executable).parent, os.environ['PATH']),
+               GITRACK_STORAGE=str(tmp_path / 'storage'))
+    launcher = str(root / 'bin' / 'gitrack')
+
+    # The provider is looked up, with discovery of the entry points, inside of the isolated archive
+    for command in (['init', '--no-hook'], ['start'], ['status']):
+        subprocess.check_call([launcher] + command, env=env, cwd=str(repo_dir))
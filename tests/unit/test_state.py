@@ -0,0 +1,100 @@
+import datetime
+import pickle
+
+import pytest
+
+from gitrack import exceptions, state, config as config_module
+
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setenv('GITRACK_STORAGE', str(tmp_path))
+    monkeypatch.setattr(state.StateDatabase, '_instances', {})
+
+
+@pytest.fixture
+def database():
+    return state.StateDatabase.get_default()
+
+
+def pickled_repo(repo_dir, data):
+    folder = config_module.get_data_dir() / 'repos' / config_module.repo_name(repo_dir)
+    folder.mkdir(parents=True)
+    with (folder / 'data.pickle').open('wb') as file:
+        pickle.dump(data, file)
+
+
+class TestStateDatabase:
+    def test_save_load(self, database, tmp_path):
+        data = {'running': True, 'since': datetime.datetime.now(), 'provider': 'toggl', 'toggl': {'api_token': 'x'}}
+        database.save(tmp_path, data)
+
+        assert database.exists(tmp_path)
+        assert database.load(tmp_path) == data
+        assert database.load(tmp_path / 'other') is None
+
+    def test_running_repos(self, database, tmp_path):
+        database.save(tmp_path / 'a', {'running': True})
+        database.save(tmp_path / 'b', {'running': False})
+
+        assert [repo.path for repo in database.repos(running=True)] == [str(tmp_path / 'a')]
+        assert len(database.repos()) == 2
+
+
+class TestMigration:
+    def test_migrate_all(self, database, tmp_path):
+        pickled_repo(tmp_path / 'a', {'repo_dir': str(tmp_path / 'a'), 'running': True})
+        pickled_repo(tmp_path / 'not_reversible', {})
+
+        migrated, unknown = state.migrate_all(database)
+
+        assert migrated == [tmp_path / 'a']
+        assert len(unknown) == 1
+        assert database.load(tmp_path / 'a')['running'] is True
+
+    def test_lazy_migration(self, tmp_path, monkeypatch):
+        repo_dir = tmp_path / 'some_repo'
+        pickled_repo(repo_dir, {'running': True})
+        monkeypatch.setenv(config_module.STATE_BACKEND_ENV_VARIABLE, config_module.STATE_BACKEND_SQLITE)
+
+        assert config_module.is_repo_initialized(repo_dir)
+        store = config_module.Store.get_for_repo(repo_dir)
+        assert isinstance(store, config_module.DatabaseStore)
+        assert store['running'] is True
+        assert store['repo_dir'] == str(repo_dir)
+
+
+class TestRepoIdentity:
+    def test_colliding_data_folders(self, tmp_path):
+        first, second = tmp_path / 'some_repo', tmp_path / 'some' / 'repo'
+        assert config_module.repo_name(first) == config_module.repo_name(second)
+
+        config_module.Store.init_repo(first)
+
+        with pytest.raises(exceptions.GitrackException):
+            config_module.Store.init_repo(second)
+
+        assert config_module.is_repo_initialized(first)
+        assert not config_module.is_repo_initialized(second)
+
+    def test_provider_indexed(self, database, tmp_path, monkeypatch):
+        monkeypatch.setenv(config_module.STATE_BACKEND_ENV_VARIABLE, config_module.STATE_BACKEND_SQLITE)
+        repo_dir = tmp_path / 'repo'
+        repo_dir.mkdir()
+        (repo_dir / '.gitrack').write_text('[gitrack]\nprovider = local\n')
+        config_module.Store.init_repo(repo_dir)
+
+        config = config_module.Config(repo_dir)
+        config.store['running'] = True
+        config.store.save()
+
+        assert [(repo.path, repo.provider) for repo in database.repos()] == [(str(repo_dir), 'local')]
+
+    def test_local_state_backend_rejected(self, tmp_path):
+        repo_dir = tmp_path / 'repo'
+        repo_dir.mkdir()
+        (repo_dir / '.gitrack').write_text('[gitrack]\nprovider = local\nstate_backend = sqlite\n')
+        config_module.Store.init_repo(repo_dir)
+
+        with pytest.raises(exceptions.ConfigException):
+            config_module.Config(repo_dir)
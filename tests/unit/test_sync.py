@@ -0,0 +1,166 @@
+import datetime
+import time
+from unittest import mock
+
+import pytest
+
+from gitrack import sync
+from gitrack.providers import RemoteEntry, STATUS_FILENAME
+
+
+class FakeStore(dict):
+    def __init__(self, **data):
+        super().__init__(data)
+        self.modified = False
+        self.save = mock.Mock()
+
+    def __getitem__(self, item):
+        return self.get(item)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.modified = True
+
+
+def make_config(tmp_path, name, running=False, since=None):
+    repo_data_dir = tmp_path / name
+    repo_data_dir.mkdir()
+    (repo_data_dir / STATUS_FILENAME).write_text(str(int(since.timestamp())) if running else '')
+
+    return mock.Mock(repo_dir=name, repo_data_dir=repo_data_dir, remote_state_ttl=30,
+                     store=FakeStore(running=running, paused=False, since=since), network_connect_timeout=1,
+                     network_read_timeout=1, network_deadline=1, network_retries=0, network_rate_limit=0,
+                     network_rate_burst=1)
+
+
+@pytest.fixture()
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(sync.config_module, 'get_data_dir', lambda: tmp_path)
+    return tmp_path
+
+
+class TestRemoteStateCache:
+    def test_get_put(self, tmp_path):
+        cache = sync.RemoteStateCache(tmp_path / sync.CACHE_FILENAME)
+        entry = RemoteEntry(123, 1500000000.0, 'Some work')
+
+        assert cache.get('key', 30) == (False, None)
+
+        cache.put('key', entry)
+        assert cache.get('key', 30) == (True, entry)
+        assert cache.get('other', 30) == (False, None)
+
+        cache.put('other', None)
+        assert cache.get('other', 30) == (True, None)
+
+    def test_ttl(self, tmp_path):
+        cache = sync.RemoteStateCache(tmp_path / sync.CACHE_FILENAME)
+        cache.put('key', RemoteEntry(123, 1500000000.0, None))
+
+        with mock.patch.object(sync.time, 'time', return_value=time.time() + 31):
+            assert cache.get('key', 30) == (False, None)
+
+    def test_invalidate(self, tmp_path):
+        cache = sync.RemoteStateCache(tmp_path / sync.CACHE_FILENAME)
+        cache.put('key', None)
+        cache.put('other', None)
+
+        cache.invalidate('key')
+        cache.invalidate('missing')
+
+        assert cache.get('key', 30) == (False, None)
+        assert cache.get('other', 30) == (True, None)
+
+
+class TestGetCurrentEntry:
+    def test_cached(self, data_dir, tmp_path):
+        config = make_config(tmp_path, 'repo')
+        provider = mock.Mock(state_key='account')
+        provider.current_entry.return_value = RemoteEntry(123, 1500000000.0, None)
+
+        assert sync.get_current_entry(config, provider) == RemoteEntry(123, 1500000000.0, None)
+        assert sync.get_current_entry(config, provider) == RemoteEntry(123, 1500000000.0, None)
+        assert provider.current_entry.call_count == 1
+
+    def test_without_key(self, data_dir, tmp_path):
+        config = make_config(tmp_path, 'repo')
+        provider = mock.Mock(state_key=None)
+        provider.current_entry.return_value = None
+
+        sync.get_current_entry(config, provider)
+        sync.get_current_entry(config, provider)
+
+        assert provider.current_entry.call_count == 2
+        assert not (data_dir / sync.CACHE_FILENAME).exists()
+
+    def test_disabled(self, data_dir, tmp_path):
+        config = make_config(tmp_path, 'repo')
+        config.remote_state_ttl = 0
+        provider = mock.Mock(state_key='account')
+        provider.current_entry.return_value = None
+
+        sync.get_current_entry(config, provider)
+        sync.get_current_entry(config, provider)
+
+        assert provider.current_entry.call_count == 2
+
+
+class TestReconcile:
+    def test_stopped_at_provider(self, tmp_path):
+        since = datetime.datetime.now()
+        config = make_config(tmp_path, 'repo', running=True, since=since)
+
+        fixes = sync._reconcile_group(None, [config])
+
+        assert config.store['running'] is False
+        assert config.store['since'] is None
+        assert (config.repo_data_dir / STATUS_FILENAME).read_text() == ''
+        assert [fix.message for fix in fixes] == ['the entry was stopped at the provider, tracking stopped',
+                                                  'status file corrected']
+        config.store.save.assert_called_once_with()
+
+    def test_in_sync(self, tmp_path):
+        since = datetime.datetime.now()
+        config = make_config(tmp_path, 'repo', running=True, since=since)
+
+        fixes = sync._reconcile_group(RemoteEntry(123, since.timestamp(), None), [config])
+
+        assert fixes == []
+        assert config.store.save.call_count == 0
+
+    def test_only_one_repo_owns_entry(self, tmp_path):
+        now = datetime.datetime.now()
+        owner = make_config(tmp_path, 'owner', running=True, since=now)
+        other = make_config(tmp_path, 'other', running=True, since=now - datetime.timedelta(hours=1))
+
+        fixes = sync._reconcile_group(RemoteEntry(123, now.timestamp(), None), [other, owner])
+
+        assert owner.store['running'] is True
+        assert other.store['running'] is False
+        assert fixes[0] == sync.Fix('other', 'the running entry belongs to owner, tracking stopped')
+
+    def test_since_corrected(self, tmp_path):
+        since = datetime.datetime.now()
+        config = make_config(tmp_path, 'repo', running=True, since=since)
+        start = since.timestamp() - 600
+
+        sync._reconcile_group(RemoteEntry(123, start, None), [config])
+
+        assert config.store['since'].timestamp() == pytest.approx(start)
+        assert (config.repo_data_dir / STATUS_FILENAME).read_text() == str(int(start))
+
+    def test_single_request_per_account(self, data_dir, tmp_path):
+        configs = {name: make_config(tmp_path, name) for name in ('first', 'second', 'third')}
+        providers = {name: mock.Mock(state_key='account' if name != 'third' else None) for name in configs}
+        for provider in providers.values():
+            provider.current_entry.return_value = None
+
+        for name, config in configs.items():
+            config.provider.klass.return_value = lambda config, name=name: providers[name]
+
+        with mock.patch.object(sync.config_module, 'Config', side_effect=configs.get):
+            sync.reconcile(['first', 'second', 'third'])
+
+        assert providers['first'].current_entry.call_count + providers['second'].current_entry.call_count == 1
+        assert providers['third'].current_entry.call_count == 1
+        assert sync.RemoteStateCache().get('account', 30) == (True, None)
@@ -0,0 +1,74 @@
+from unittest import mock
+
+import git
+import pytest
+import requests
+from toggl import utils
+from toggl.utils import others as toggl_utils
+
+from gitrack import api, config, transport
+from gitrack.providers import EntryReference, EntryRewrite
+
+TOGGL_CONFIG = """[gitrack]
+provider = toggl
+update_check = False
+
+[toggl]
+api_token = {token}
+api_url = {url}
+"""
+
+
+def response(data):
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = data.encode('utf-8')
+    return resp
+
+
+@pytest.fixture()
+def make_repo(tmp_path, monkeypatch):
+    monkeypatch.setenv('GITRACK_STORAGE', str(tmp_path / 'storage'))
+    monkeypatch.delenv('GITRACK_TOGGL_URL', raising=False)
+
+    def make(name, token, url):
+        repo_dir = tmp_path / name
+        git.Repo.init(str(repo_dir))
+        (repo_dir / '.gitrack').write_text(TOGGL_CONFIG.format(token=token, url=url))
+        config.Store.init_repo(repo_dir.resolve())
+        return repo_dir
+
+    return make
+
+
+def test_api_url_per_repo(make_repo):
+    session = api.Session()
+    first = session._get(make_repo('first', 'aaa', 'http://first.example.com/api/v8')).provider
+    second = session._get(make_repo('second', 'bbb', 'http://second.example.com/api/v8/')).provider
+
+    with mock.patch.object(transport, 'request', return_value=response('{"data": null}')) as request_mock:
+        assert not first.is_running()
+        assert not second.is_running()
+        assert not first.is_running()
+
+    assert [(call[0][1], call[1]['auth'].username) for call in request_mock.call_args_list] == [
+        ('http://first.example.com/api/v8/time_entries/current', 'aaa'),
+        ('http://second.example.com/api/v8/time_entries/current', 'bbb'),
+        ('http://first.example.com/api/v8/time_entries/current', 'aaa'),
+    ]
+    assert first.state_key != second.state_key
+
+
+def test_patches_restored(make_repo):
+    original_request, original_toggl = toggl_utils._toggl_request, utils.toggl
+    provider = api.Session()._get(make_repo('repo', 'aaa', 'http://first.example.com/api/v8')).provider
+
+    with mock.patch.object(transport, 'request', return_value=response('{"data": null}')) as request_mock:
+        provider.rewrite([EntryRewrite(EntryReference(1, 0, 10), 'Message', [EntryReference(2, 5, 10)])])
+
+    assert sorted((call[0][0], call[0][1]) for call in request_mock.call_args_list) == [
+        ('delete', 'http://first.example.com/api/v8/time_entries/2'),
+        ('put', 'http://first.example.com/api/v8/time_entries/1'),
+    ]
+    assert toggl_utils._toggl_request is original_request
+    assert utils.toggl is original_toggl
@@ -0,0 +1,198 @@
+from unittest import mock
+
+import pytest
+import requests
+
+from gitrack import transport, exceptions
+
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setenv('GITRACK_STORAGE', str(tmp_path))
+    (tmp_path / 'data').mkdir()
+    monkeypatch.setattr(transport, 'BACKOFF_BASE', 0.001)
+    transport.configure()
+
+
+def response(status, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers or {})
+    return resp
+
+
+class TestTransport:
+    def test_timeouts_passed(self):
+        transport.configure(connect_timeout=1, read_timeout=2)
+
+        with mock.patch.object(requests, 'request', return_value=response(200)) as request_mock:
+            transport.request('get', 'http://example.com/some')
+
+        request_mock.assert_called_once_with('GET', 'http://example.com/some', timeout=(1, 2))
+
+    def test_idempotent_retried(self):
+        responses = [response(503), requests.exceptions.ReadTimeout(), response(200)]
+
+        with mock.patch.object(requests, 'request', side_effect=responses) as request_mock:
+            assert transport.request('get', 'http://example.com/some').status_code == 200
+
+        assert request_mock.call_count == 3
+
+    def test_non_idempotent_not_retried(self):
+        with mock.patch.object(requests, 'request', return_value=response(503)) as request_mock:
+            assert transport.request('post', 'http://example.com/some').status_code == 503
+
+        assert request_mock.call_count == 1
+
+    def test_retry_after_honored(self, monkeypatch):
+        sleep_mock = mock.Mock()
+        monkeypatch.setattr(transport.time, 'sleep', sleep_mock)
+
+        with mock.patch.object(requests, 'request', side_effect=[response(429, {'Retry-After': '2'}), response(200)]):
+            assert transport.request('get', 'http://example.com/some').status_code == 200
+
+        sleep_mock.assert_called_once_with(2)
+
+    def test_deadline(self):
+        transport.configure(deadline=0)
+
+        with mock.patch.object(requests, 'request') as request_mock:
+            with pytest.raises(exceptions.DeadlineExceeded):
+                transport.request('get', 'http://example.com/some')
+
+        assert request_mock.call_count == 0
+
+    def test_budget(self):
+        transport.configure(deadline=0)
+
+        with transport.budget(10):
+            assert transport.remaining_budget() > 9
+
+            with mock.patch.object(requests, 'request', return_value=response(200)):
+                assert transport.request('get', 'http://example.com/some').status_code == 200
+
+        assert transport.remaining_budget() <= 0
+
+    def test_budget_limits(self):
+        transport.configure(retries=2, read_timeout=10)
+
+        with transport.budget(100, retries=0):
+            assert transport.current_limits() == {'retries': 0}
+
+            with mock.patch.object(requests, 'request', return_value=response(503)) as request_mock:
+                assert transport.request('get', 'http://example.com/some').status_code == 503
+
+            assert request_mock.call_count == 1
+            assert request_mock.call_args[1]['timeout'][1] == 10
+
+        assert transport.current_limits() == {}
+
+        with pytest.raises(TypeError):
+            with transport.budget(10, deadline=5):
+                pass
+
+    def test_circuit_breaker(self):
+        transport.configure(retries=0)
+
+        with mock.patch.object(requests, 'request', side_effect=requests.exceptions.ConnectionError()):
+            for _ in range(transport.CIRCUIT_BREAKER_THRESHOLD):
+                with pytest.raises(exceptions.ServiceUnavailable):
+                    transport.request('get', 'http://example.com/some')
+
+        # Circuit is open, no request is made and other processes see it as well
+        assert transport.CircuitBreaker('example.com').is_open()
+        with mock.patch.object(requests, 'request') as request_mock:
+            with pytest.raises(exceptions.ServiceUnavailable):
+                transport.request('get', 'http://example.com/other')
+
+        assert request_mock.call_count == 0
+        assert not transport.CircuitBreaker('other.com').is_open()
+
+    def test_circuit_breaker_reset_on_success(self):
+        transport.configure(retries=0)
+
+        with mock.patch.object(requests, 'request', side_effect=requests.exceptions.ConnectionError()):
+            for _ in range(transport.CIRCUIT_BREAKER_THRESHOLD - 1):
+                with pytest.raises(exceptions.ServiceUnavailable):
+                    transport.request('get', 'http://example.com/some')
+
+        with mock.patch.object(requests, 'request', return_value=response(200)):
+            transport.request('get', 'http://example.com/some')
+
+        with mock.patch.object(requests, 'request', side_effect=requests.exceptions.ConnectionError()):
+            with pytest.raises(exceptions.ServiceUnavailable):
+                transport.request('get', 'http://example.com/some')
+
+        assert not transport.CircuitBreaker('example.com').is_open()
+
+
+class TestRateLimiter:
+    AUTH = ('token', 'api_token')
+
+    def test_burst_then_throttled(self, monkeypatch):
+        sleep_mock = mock.Mock()
+        monkeypatch.setattr(transport.time, 'sleep', sleep_mock)
+        transport.configure(rate_limit=2, rate_burst=2)
+
+        with mock.patch.object(requests, 'request', return_value=response(200)):
+            for _ in range(3):
+                transport.request('get', 'http://example.com/some', auth=self.AUTH)
+
+        sleep_mock.assert_called_once_with(pytest.approx(0.5, abs=0.05))
+
+    def test_shared_by_credentials(self):
+        transport.configure(rate_limit=1, rate_burst=1)
+
+        first = transport.RateLimiter.for_request('example.com', self.AUTH)
+        second = transport.RateLimiter.for_request('example.com', requests.auth.HTTPBasicAuth(*self.AUTH))
+        other = transport.RateLimiter.for_request('example.com', ('other', 'api_token'))
+
+        assert first.key == second.key != other.key
+
+        assert first.reserve(10) == 0
+        assert second.reserve(10) == pytest.approx(1, abs=0.05)
+        assert other.reserve(10) == 0
+
+        # The credentials are not stored
+        state = (transport.config_module.get_data_dir() / transport.RATE_LIMITER_FILENAME).read_text()
+        assert 'api_token' not in state
+
+    def test_unauthenticated_and_disabled(self):
+        assert transport.RateLimiter.for_request('example.com', None) is None
+
+        transport.configure(rate_limit=0)
+        assert transport.RateLimiter.for_request('example.com', self.AUTH) is None
+
+    def test_wait_over_budget(self):
+        transport.configure(rate_limit=0.1, rate_burst=1)
+        limiter = transport.RateLimiter.for_request('example.com', self.AUTH)
+
+        assert limiter.reserve(1) == 0
+        with pytest.raises(exceptions.DeadlineExceeded):
+            limiter.reserve(1)
+
+    def test_retry_after_blocks_all(self, monkeypatch):
+        sleep_mock = mock.Mock()
+        monkeypatch.setattr(transport.time, 'sleep', sleep_mock)
+        transport.configure(rate_limit=100, rate_burst=10)
+
+        responses = [response(429, {'Retry-After': '3'}), response(200)]
+        with mock.patch.object(requests, 'request', side_effect=responses) as request_mock:
+            assert transport.request('post', 'http://example.com/some', auth=self.AUTH).status_code == 200
+
+        # Throttled non-idempotent request is retried
+        assert request_mock.call_count == 2
+
+        # Other processes using the same token wait as well
+        assert transport.RateLimiter.for_request('example.com', self.AUTH).reserve(10) == pytest.approx(3, abs=0.1)
+
+    def test_wait_recorded(self, monkeypatch):
+        monkeypatch.setattr(transport.time, 'sleep', mock.Mock())
+        transport.configure(rate_limit=1, rate_burst=1)
+        transport.metrics.reset()
+
+        with mock.patch.object(requests, 'request', return_value=response(200)):
+            for _ in range(2):
+                transport.request('get', 'http://example.com/some', auth=self.AUTH)
+
+        assert transport.metrics.build_sample('test', None, 'ok')['rate_limit_wait'] == pytest.approx(1, abs=0.05)
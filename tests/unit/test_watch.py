@@ -0,0 +1,67 @@
+from unittest import mock
+
+import pytest
+
+from gitrack import watch
+from gitrack.providers import STATUS_FILENAME
+
+
+@pytest.fixture(params=[None, 0.01], ids=['inotify', 'polling'])
+def watcher(request, tmp_path):
+    (tmp_path / 'tmp_repo').mkdir()
+    (tmp_path / 'tmp_repo' / STATUS_FILENAME).write_text('')
+
+    with mock.patch('gitrack.state.known_repos', return_value=[]):
+        status_watcher = watch.StatusWatcher(tmp_path, poll_interval=request.param)
+        yield status_watcher
+        status_watcher.close()
+
+
+def test_initial_state(watcher):
+    assert watcher.statuses == {'tmp_repo': watch.RepoStatus('tmp_repo', False, None)}
+
+
+def test_changes(watcher, tmp_path):
+    watcher.changes(0.01)  # Polling reports all the files first time
+
+    (tmp_path / 'tmp_repo' / STATUS_FILENAME).write_text('1500000000')
+    assert watcher.changes(1) == [watch.RepoStatus('tmp_repo', True, 1500000000)]
+
+    (tmp_path / 'tmp_repo' / 'data.pickle').write_text('unrelated')
+    assert watcher.changes(0.05) == []
+
+
+def test_new_repo(watcher, tmp_path):
+    watcher.changes(0.01)
+
+    (tmp_path / 'tmp_other').mkdir()
+    watcher.changes(0.05)
+    (tmp_path / 'tmp_other' / STATUS_FILENAME).write_text('1500000000')
+
+    assert watcher.changes(1) == [watch.RepoStatus('tmp_other', True, 1500000000)]
+
+
+def test_unknown_repo_cached(tmp_path):
+    (tmp_path / 'tmp_repo').mkdir()
+
+    with mock.patch('gitrack.state.known_repos', return_value=[]) as known_repos:
+        status_watcher = watch.StatusWatcher(tmp_path, poll_interval=0.01)
+
+        for i in range(5):
+            (tmp_path / 'tmp_repo' / STATUS_FILENAME).write_text(str(1500000000 + i))
+            status_watcher.changes(0.05)
+
+        assert known_repos.call_count == 1
+
+    status_watcher.close()
+
+
+def test_events():
+    status = watch.RepoStatus('/repo', True, 1000)
+
+    assert watch.state_event(status, now=1060) == {
+        'event': 'state', 'repo': '/repo', 'running': True, 'since': 1000, 'elapsed': 60, 'time': 1060,
+    }
+    assert watch.heartbeat_event([status, watch.RepoStatus('/other', False, None)], now=1060)['running'] == [
+        {'repo': '/repo', 'since': 1000, 'elapsed': 60},
+    ]